@@ -0,0 +1,20 @@
+from django.db import connections, router
+
+
+def bulk_upsert(model, objs, unique_fields, update_fields, batch_size=None):
+    """
+    إدراج مجمّع مع تحديث السجلات الموجودة مسبقاً (upsert) باستعلام واحد لكل دفعة.
+    بعض قواعد البيانات (مثل MySQL) تعتمد على المفاتيح الفريدة للجدول ولا تقبل تمرير
+    unique_fields، بينما تتطلبها أخرى (مثل SQLite وPostgreSQL)، لذلك تُمرَّر فقط عند دعمها.
+    """
+    if not objs:
+        return []
+    connection = connections[router.db_for_write(model)]
+    options = {
+        'update_conflicts': True,
+        'update_fields': update_fields,
+        'batch_size': batch_size,
+    }
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = unique_fields
+    return model.objects.bulk_create(objs, **options)
@@ -0,0 +1,48 @@
+# Schoolo/cache.py
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+class CacheVersion:
+    """
+    رقم نسخة في الكاش لكل كائن (مثلاً فصل دراسي أو اختبار)، يدخل في مفاتيح البيانات المخزنة له.
+    رفع النسخة يُهمل كل ما خُزن بالنسخة السابقة دون البحث عن مفاتيحه وحذفها،
+    وتنتهي صلاحية المفاتيح القديمة وحدها بعد مدة تخزينها.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def key(self, object_id):
+        return f'{self.prefix}:{object_id}'
+
+    def get(self, object_id):
+        """
+        يعيد رقم النسخة. إذا لم يكن مخزناً (أول مرة أو بعد حذفه من الكاش) يبدأ من الوقت الحالي
+        بدلاً من 1 حتى لا تعود نسخة قديمة ما زالت بياناتها في الكاش.
+        """
+        key = self.key(object_id)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, time.time_ns(), None)
+            version = cache.get(key)
+        return version
+
+    def _bump(self, object_id):
+        key = self.key(object_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+    def bump(self, object_ids):
+        """
+        يرفع نسخة الكائنات المعطاة فوراً، ويُكرر بعد نجاح المعاملة
+        حتى لا تُخزن بيانات قُرئت قبل الحفظ النهائي بالنسخة الجديدة.
+        """
+        object_ids = {pk for pk in object_ids if pk is not None}
+        for object_id in object_ids:
+            self._bump(object_id)
+        transaction.on_commit(lambda: [self._bump(pk) for pk in object_ids])
@@ -0,0 +1,110 @@
+# Schoolo/exports.py
+import csv
+import io
+import tempfile
+
+import xlsxwriter
+from django.http import FileResponse
+
+EXPORT_FORMATS = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+}
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def iter_queryset(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    يمر على نتائج الاستعلام على دفعات دون تحميلها كاملة في الذاكرة.
+    """
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def get_export_format(request, default='xlsx'):
+    """
+    يقرأ صيغة التصدير من معامل file_format (xlsx أو csv).
+    لا يُستخدم المعامل format لأنه محجوز في DRF لاختيار الـ renderer.
+    """
+    export_format = (request.query_params.get('file_format') or default).lower()
+    return export_format if export_format in EXPORT_FORMATS else None
+
+
+class ExportWriter:
+    """
+    كاتب تقارير مشترك يكتب إلى ملف مؤقت على القرص بدلاً من الذاكرة، ثم يُرسل الملف عبر FileResponse.
+    - xlsx: باستخدام xlsxwriter في وضع constant_memory.
+    - csv: بديل أخف، يتجاهل التنسيق ويحافظ على ترتيب الأسطر.
+    يجب كتابة الأسطر بترتيب تصاعدي (نفس قيد constant_memory)، ويمكن كتابة عدة خلايا في نفس السطر.
+    """
+
+    def __init__(self, export_format='xlsx', sheet_name='Report'):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+        self.export_format = export_format
+        self._file = tempfile.TemporaryFile()
+        self._row_index = None
+        self._row_cells = {}
+        self._written_rows = 0
+
+        if export_format == 'xlsx':
+            self._workbook = xlsxwriter.Workbook(self._file, {'constant_memory': True})
+            self._worksheet = self._workbook.add_worksheet(sheet_name)
+            self._bold = self._workbook.add_format({'bold': True})
+        else:
+            # utf-8-sig حتى يتعرف Excel على النصوص العربية بشكل صحيح
+            self._text = io.TextIOWrapper(self._file, encoding='utf-8-sig', newline='')
+            self._csv = csv.writer(self._text)
+
+    def write(self, row, column, value, bold=False):
+        self.write_row(row, column, [value], bold=bold)
+
+    def write_row(self, row, column, values, bold=False):
+        if self.export_format == 'xlsx':
+            self._worksheet.write_row(row, column, values, self._bold if bold else None)
+            return
+
+        if self._row_index is not None and row < self._row_index:
+            raise ValueError("Rows must be written in ascending order.")
+        if row != self._row_index:
+            self._flush_csv_row()
+            self._row_index = row
+        for offset, value in enumerate(values):
+            self._row_cells[column + offset] = value
+
+    def _flush_csv_row(self):
+        if self._row_index is None:
+            return
+        # الحفاظ على الأسطر الفارغة بين أقسام التقرير
+        while self._written_rows < self._row_index:
+            self._csv.writerow([])
+            self._written_rows += 1
+        first_column = min(self._row_cells) if self._row_cells else 0
+        last_column = max(self._row_cells) if self._row_cells else -1
+        self._csv.writerow([self._row_cells.get(col, '') for col in range(first_column, last_column + 1)])
+        self._written_rows += 1
+        self._row_cells = {}
+
+    def close(self):
+        """
+        ينهي الكتابة ويعيد الملف المؤقت (بصيغة ثنائية) جاهزاً للقراءة من البداية.
+        """
+        if self.export_format == 'xlsx':
+            self._workbook.close()
+        else:
+            self._flush_csv_row()
+            self._text.flush()
+            self._text.detach()
+        self._file.seek(0)
+        return self._file
+
+    def response(self, filename):
+        """
+        ينهي الملف ويعيد FileResponse يقرأ من الملف المؤقت على دفعات.
+        filename بدون امتداد، ويُضاف الامتداد حسب الصيغة.
+        """
+        return FileResponse(
+            self.close(),
+            as_attachment=True,
+            filename=f'{filename}.{self.export_format}',
+            content_type=EXPORT_FORMATS[self.export_format],
+        )
@@ -0,0 +1,28 @@
+# Schoolo/mixins.py
+
+
+def apply_query_profile(queryset, serializer_class):
+    """
+    يطبّق على الـ queryset ملف الجلب المعلن في الـ serializer:
+    - select_related_fields: علاقات ForeignKey/OneToOne التي يقرؤها الـ serializer لكل سجل.
+    - prefetch_related_fields: علاقات متعددة تُجلب دفعة واحدة لكل الصفحة.
+    بذلك يبقى عدد الاستعلامات ثابتاً مهما كان عدد السجلات المعروضة.
+    """
+    select_fields = getattr(serializer_class, 'select_related_fields', None)
+    prefetch_fields = getattr(serializer_class, 'prefetch_related_fields', None)
+    if select_fields:
+        queryset = queryset.select_related(*select_fields)
+    if prefetch_fields:
+        queryset = queryset.prefetch_related(*prefetch_fields)
+    return queryset
+
+
+class SerializerQueryProfileMixin:
+    """
+    يطبّق ملف الجلب الخاص بالـ serializer تلقائياً على كل queryset يمر عبر filter_queryset،
+    أي على القوائم وعلى get_object، دون الحاجة لتعديل get_queryset في كل view.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return apply_query_profile(queryset, self.get_serializer_class())
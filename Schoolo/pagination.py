@@ -0,0 +1,157 @@
+# Schoolo/pagination.py
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+def _model_cursor_ordering(model):
+    """
+    يعيد ترتيب النموذج الافتراضي (Meta.ordering) إذا كان صالحاً للترقيم بالمؤشر، أي مكوّناً من
+    حقول محلية غير علائقية فقط، مع إضافة المفتاح الأساسي لضمان ترتيب ثابت. وإلا يعيد None.
+    """
+    ordering = list(model._meta.ordering or [])
+    if not ordering:
+        return None
+    for field_name in ordering:
+        if not isinstance(field_name, str):
+            return None
+        name = field_name.lstrip('-')
+        if '__' in name:
+            return None
+        if name in ('pk', 'id'):
+            continue
+        try:
+            field = model._meta.get_field(name)
+        except Exception:
+            return None
+        if field.is_relation or field.null:
+            return None
+    return _ensure_unique_ordering(ordering)
+
+
+def _ensure_unique_ordering(ordering):
+    """
+    يضيف المفتاح الأساسي في آخر الترتيب إذا لم يكن موجوداً، فيصبح كل موضع في الترتيب فريداً.
+    """
+    ordering = tuple(ordering)
+    if not any(field_name.lstrip('-') in ('pk', 'id') for field_name in ordering):
+        ordering += ('-pk' if ordering[0].startswith('-') else 'pk',)
+    return ordering
+
+
+class DefaultCursorPagination(CursorPagination):
+    """
+    ترقيم الصفحات بالمؤشر (keyset) لجميع القوائم: كل صفحة تُجلب بشرط على قيمة آخر سجل
+    بدلاً من OFFSET، فتبقى تكلفة الصفحة ثابتة مهما كبر حجم البيانات.
+    - حجم الصفحة الافتراضي من PAGE_SIZE ويمكن تغييره عبر ?page_size= (بحد أقصى max_page_size).
+    - الترتيب من خاصية cursor_ordering في الـ view، ثم ترتيب النموذج إذا كان صالحاً، ثم '-pk'.
+    - المؤشر مركّب: يحفظ قيم كل حقول الترتيب (وآخرها المفتاح الأساسي) ويقارنها معاً،
+      بينما CursorPagination في DRF يقارن الحقل الأول فقط ويتخطى المكرر بـ OFFSET (بحد offset_cutoff).
+      لذلك يجب أن تكون حقول الترتيب غير قابلة لـ NULL.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-pk'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering:
+            ordering = (ordering,) if isinstance(ordering, str) else tuple(ordering)
+            return _ensure_unique_ordering(ordering)
+        if not any(hasattr(backend, 'get_ordering') for backend in getattr(view, 'filter_backends', [])):
+            model_ordering = _model_cursor_ordering(queryset.model)
+            if model_ordering:
+                return model_ordering
+        return _ensure_unique_ordering(super().get_ordering(request, queryset, view))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field_name in ordering:
+            name = field_name.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(str(value))
+        return json.dumps(values)
+
+    def _decode_position(self, position):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def _after_position(self, values, reverse):
+        """
+        شرط "بعد الموضع" بالمقارنة المعجمية على كل حقول الترتيب:
+        (a > x) OR (a = x AND b > y) OR ...، مع شرط a >= x في البداية حتى يُستخدم فهرس الحقل الأول كمدى.
+        """
+        condition, equal = Q(), Q()
+        for field_name, value in zip(self.ordering, values):
+            name = field_name.lstrip('-')
+            # (اتجاه المؤشر معكوس) XOR (الحقل تنازلي)
+            lookup = 'lt' if reverse != field_name.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        first = self.ordering[0].lstrip('-')
+        first_lookup = 'lte' if reverse != self.ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{first}__{first_lookup}': values[0]}) & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        نفس CursorPagination.paginate_queryset مع استبدال شرط الحقل الأول بالشرط المركّب.
+        المواضع فريدة دائماً، فلا تحتاج الروابط التالية إلى OFFSET.
+        """
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(self._after_position(self._decode_position(current_position), reverse))
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from datetime import timedelta
 from pathlib import Path
 import os
+import sys
 from django.utils.translation import gettext_lazy as _
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -54,6 +55,7 @@ INSTALLED_APPS = [
     'attendance',
     'contents',
     'enrollment.apps.EnrollmentConfig',
+    'reports',
     'rest_framework',
     'rest_framework_simplejwt',
     'rest_framework.authtoken',
@@ -72,8 +74,44 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.locale.LocaleMiddleware',
+    'academic.context.AcademicContextMiddleware',
 ]
 
+# الكاش المشترك: الأدوار والعام الحالي ونسخ الشبكات والإحصائيات والترتيب تُلغى بالكتابة في الكاش،
+# فيجب أن تراه كل العمليات (عمال الويب و run_report_worker و run_promotion_worker).
+# يُختار عبر SCHOOLO_CACHE: db (الافتراضي، يتطلب python manage.py createcachetable) أو redis (REDIS_URL)
+# أو memcached (MEMCACHED_LOCATION). الذاكرة المحلية locmem للاختبارات فقط (انظر accounts/checks.py).
+TESTING = sys.argv[1:2] == ['test']
+CACHE_BACKEND = os.environ.get('SCHOOLO_CACHE', 'locmem' if TESTING else 'db')
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        }
+    }
+elif CACHE_BACKEND == 'memcached':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ.get('MEMCACHED_LOCATION', '127.0.0.1:11211'),
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'schoolo-default',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'schoolo_cache',
+        }
+    }
+
 USE_I18N = True
 USE_L10N = True
 USE_TZ = True
@@ -115,7 +153,7 @@ TRACCAR_SMS_URL = "https://www.traccar.org/sms/"
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication', # استخدم JWTAuthentication هنا
+        'accounts.authentication.RoleCacheJWTAuthentication', # JWTAuthentication مع أدوار المستخدم من الكاش
         'rest_framework.authentication.SessionAuthentication', # اختياري: إذا كنت تستخدم الجلسات أيضاً
         'rest_framework.authentication.BasicAuthentication',    # اختياري: إذا كنت تستخدم Basic Auth
     ),
@@ -125,6 +163,9 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
+    # ترقيم صفحات بالمؤشر لجميع القوائم (انظر Schoolo/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'Schoolo.pagination.DefaultCursorPagination',
+    'PAGE_SIZE': 50,
 }
 
 SIMPLE_JWT = {
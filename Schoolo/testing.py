@@ -0,0 +1,87 @@
+# Schoolo/testing.py
+import datetime
+
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from academic.models import AcademicTerm, AcademicYear
+from accounts.models import User
+from classes.models import Class, Section
+from students.models import Student
+
+
+class SchoolTestDataMixin:
+    """
+    بيانات مشتركة لاختبارات التطبيقات: مجموعات الأدوار، عام وفصل دراسيان حاليان، صف وشعبة، ومستخدم مدير.
+    setUp يفرغ الكاش وينشئ APIClient موثقاً بالمدير، ويمكن تغيير المستخدم عبر authenticate().
+    assertConstantListQueries يتحقق أن عدد استعلامات قائمة لا يتغير مع عدد السجلات.
+    يُستخدم قبل TestCase في الوراثة: class MyTests(SchoolTestDataMixin, TestCase).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for name in ['Student', 'Teacher', 'Manager']:
+            Group.objects.get_or_create(name=name)
+        cls.year = AcademicYear.objects.create(
+            name='2025-2026', start_date=datetime.date(2025, 9, 1),
+            end_date=datetime.date(2026, 6, 30), is_current=True,
+        )
+        cls.term = AcademicTerm.objects.create(
+            academic_year=cls.year, name='T1', start_date=datetime.date(2025, 9, 1),
+            end_date=datetime.date(2026, 1, 30), is_current=True,
+        )
+        cls.class_obj = Class.objects.create(name='C1')
+        cls.section = cls.create_section('A')
+        cls.admin_user = User.objects.create_admin_user('0911111111', 'pass', is_active=True)
+
+    @classmethod
+    def create_section(cls, name, class_obj=None, academic_year=None):
+        return Section.objects.create(
+            name=name, stream_type='General', academic_year=academic_year or cls.year,
+            class_obj=class_obj or cls.class_obj, capacity=50, is_active=True,
+        )
+
+    @classmethod
+    def create_student(cls, index, section=None):
+        section = section or cls.section
+        return Student.objects.create(
+            user=User.objects.create_student_user(f'08{index:08d}'), section=section,
+            student_class=section.class_obj, father_name='F', gender='Male', address='A', parent_phone='1',
+        )
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+        self.authenticate(self.admin_user)
+
+    def authenticate(self, user):
+        self.client.force_authenticate(user)
+        # تحميل أدوار المستخدم مسبقاً حتى لا يُحسب استعلامها في الطلب الأول فقط
+        user.get_role_names()
+
+    def list_queries(self, url):
+        """
+        يطلب صفحة القائمة ويعيد (عدد السجلات في الصفحة، عدد الاستعلامات).
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(response.data['results']), len(queries)
+
+    def assertConstantListQueries(self, url, add_rows, small=2, large=10):
+        """
+        يضيف small سجلاً عبر add_rows(count) ثم large سجلاً آخر، ويتحقق أن القائمة تعرضها كلها
+        بنفس عدد الاستعلامات في الحالتين (لا استعلام لكل سجل).
+        """
+        add_rows(small)
+        small_rows, small_queries = self.list_queries(url)
+        add_rows(large)
+        large_rows, large_queries = self.list_queries(url)
+
+        self.assertEqual((small_rows, large_rows), (small, small + large))
+        self.assertEqual(small_queries, large_queries)
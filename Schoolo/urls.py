@@ -38,6 +38,7 @@ urlpatterns += i18n_patterns(
     path('api/contents/', include('contents.urls')),
     path('api/communication/', include('communication.urls')),
     path('api/progression/', include('progression.urls')),
+    path('api/reports/', include('reports.urls')),
     path('api/', include('grading.urls')), 
     path('api/', include('schedules.urls')),
     path('api/', include('attendance.urls')),
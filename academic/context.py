@@ -0,0 +1,96 @@
+# academic/context.py
+from collections import namedtuple
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import AcademicTerm, AcademicYear
+
+CACHE_KEY = 'academic:current_context'
+CACHE_TIMEOUT = 60 * 60
+
+AcademicContext = namedtuple('AcademicContext', ['year', 'term'])
+
+_NOT_IN_REQUEST = object()
+_request_context = ContextVar('academic_request_context', default=_NOT_IN_REQUEST)
+
+
+def _load_from_db():
+    year = AcademicYear.objects.filter(is_current=True).first()
+    term = None
+    if year:
+        term = AcademicTerm.objects.select_related('academic_year').filter(
+            is_current=True, academic_year=year
+        ).first()
+    return AcademicContext(year, term)
+
+
+def get_current():
+    """
+    يعيد العام والفصل الدراسيين الحاليين على شكل AcademicContext(year, term).
+    القيمة تُحفظ في الكاش المشترك، وتُحفظ أيضاً طوال مدة الطلب الواحد
+    (عند تفعيل AcademicContextMiddleware) فلا يتكرر البحث داخل نفس الطلب.
+    أي من القيمتين قد تكون None إذا لم يتم تحديد عام أو فصل حالي.
+    """
+    memo = _request_context.get()
+    if memo is not _NOT_IN_REQUEST and memo is not None:
+        return memo
+
+    context = cache.get(CACHE_KEY)
+    if context is None:
+        context = _load_from_db()
+        cache.set(CACHE_KEY, context, CACHE_TIMEOUT)
+
+    if memo is not _NOT_IN_REQUEST:
+        _request_context.set(context)
+    return context
+
+
+def get_current_year():
+    """
+    يعيد العام الدراسي الحالي، أو يرفع AcademicYear.DoesNotExist إذا لم يوجد.
+    """
+    year = get_current().year
+    if year is None:
+        raise AcademicYear.DoesNotExist("لا يوجد عام دراسي حالي.")
+    return year
+
+
+def get_current_term():
+    """
+    يعيد الفصل الدراسي الحالي ضمن العام الحالي، أو يرفع DoesNotExist
+    (للعام أو للفصل) إذا لم يوجد.
+    """
+    get_current_year()
+    term = get_current().term
+    if term is None:
+        raise AcademicTerm.DoesNotExist("لا يوجد فصل دراسي حالي.")
+    return term
+
+
+def invalidate():
+    """
+    يحذف السياق المخزن في الكاش وفي الطلب الحالي. يُستدعى عند تعديل الأعوام أو الفصول،
+    ويُكرر بعد نجاح المعاملة حتى لا تُخزن قيمة قديمة قُرئت قبل الحفظ النهائي.
+    """
+    cache.delete(CACHE_KEY)
+    if _request_context.get() is not _NOT_IN_REQUEST:
+        _request_context.set(None)
+    transaction.on_commit(lambda: cache.delete(CACHE_KEY))
+
+
+class AcademicContextMiddleware:
+    """
+    يفعّل حفظ السياق الأكاديمي الحالي طوال مدة الطلب الواحد.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _request_context.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            _request_context.reset(token)
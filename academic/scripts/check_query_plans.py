@@ -0,0 +1,91 @@
+import os
+import sys
+import django
+
+# يجب أن تحدد مكان إعدادات جانغو
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Schoolo.settings')
+django.setup()
+
+from django.db import connection
+
+from academic.context import get_current
+from attendance.models import Attendance
+from communication.models import NewsActivity
+from grading.models import Exam, Grade
+from schedules.models import ClassSchedule
+
+PAGE_SIZE = 51
+
+
+def _hot_queries(year, term):
+    """
+    الاستعلامات الأساسية لنقاط القوائم الرئيسية بنفس شكل التصفية والترتيب المستخدم في الـ views.
+    """
+    queries = [
+        ('attendance list', Attendance.objects.filter(
+            academic_year=year, academic_term=term).order_by('-date', 'id')[:PAGE_SIZE]),
+        ('exam list', Exam.objects.filter(
+            academic_year=year, academic_term=term).order_by('-exam_date', 'id')[:PAGE_SIZE]),
+        ('news list', NewsActivity.objects.filter(
+            academic_year=year, academic_term=term, target_audience='all').order_by('-created_at', '-id')[:PAGE_SIZE]),
+    ]
+
+    student_id = Attendance.objects.values_list('student_id', flat=True).first()
+    if student_id:
+        queries.append(('student attendance', Attendance.objects.filter(
+            student_id=student_id).order_by('-date')[:PAGE_SIZE]))
+
+    schedule = ClassSchedule.objects.filter(academic_year=year, academic_term=term).first()
+    if schedule:
+        queries.append(('teacher schedule', ClassSchedule.objects.filter(
+            teacher_id=schedule.teacher_id, day_of_week_id=schedule.day_of_week_id)))
+        queries.append(('section schedule', ClassSchedule.objects.filter(
+            section_id=schedule.section_id, day_of_week_id=schedule.day_of_week_id)))
+
+    exam_id = Grade.objects.values_list('exam_id', flat=True).first()
+    if exam_id:
+        queries.append(('exam grades', Grade.objects.filter(exam_id=exam_id)))
+    return queries
+
+
+def _full_scans(queryset):
+    """
+    تنفيذ EXPLAIN على الاستعلام وإرجاع الجداول التي تُقرأ بمسح كامل حسب محرك قاعدة البيانات.
+    """
+    sql, params = queryset.query.sql_with_params()
+    vendor = connection.vendor
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            details = [row[-1] for row in cursor.fetchall()]
+            return [d for d in details if d.startswith('SCAN') and 'USING' not in d]
+        cursor.execute(f'EXPLAIN {sql}', params)
+        rows = cursor.fetchall()
+        if vendor == 'mysql':
+            columns = [col[0] for col in cursor.description]
+            table_index, type_index = columns.index('table'), columns.index('type')
+            return [f'{row[table_index]} (type=ALL)' for row in rows if row[type_index] == 'ALL']
+        return [row[0].strip() for row in rows if 'Seq Scan' in row[0]]
+
+
+def run():
+    print("فحص خطط تنفيذ الاستعلامات الأساسية...")
+    year, term = get_current()
+    if not year or not term:
+        print("لا يوجد عام أو فصل دراسي حالي، لا يمكن بناء الاستعلامات.")
+        return
+
+    flagged = 0
+    for name, queryset in _hot_queries(year, term):
+        scans = _full_scans(queryset)
+        if scans:
+            flagged += 1
+            print(f"[FULL SCAN] {name}: {', '.join(scans)}")
+        else:
+            print(f"[OK] {name}")
+
+    if flagged:
+        # على الجداول الصغيرة قد يفضّل المحسّن المسح الكامل، لذا يُفضّل التشغيل على بيانات بحجم الإنتاج
+        print(f"\n{flagged} استعلام/استعلامات تستخدم مسحاً كاملاً للجدول.")
+        sys.exit(1)
+    print("\nجميع الاستعلامات تستخدم الفهارس.")
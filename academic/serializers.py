@@ -1,6 +1,7 @@
 # your_app_name/serializers.py
 from rest_framework import serializers
 from .models import AcademicYear, AcademicTerm
+from .context import get_current_year
 
 class AcademicYearSerializer(serializers.ModelSerializer):
     class Meta:
@@ -17,7 +18,7 @@ class AcademicTermSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         try:
-            current_academic_year = AcademicYear.objects.get(is_current=True)
+            current_academic_year = get_current_year()
         except AcademicYear.DoesNotExist:
             raise serializers.ValidationError({"academic_year": "لا يوجد عام دراسي حالي محدد."})
         except AcademicYear.MultipleObjectsReturned:
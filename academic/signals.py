@@ -1,7 +1,8 @@
 
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.dispatch import receiver
-from .models import DayOfWeek
+from .context import invalidate
+from .models import AcademicTerm, AcademicYear, DayOfWeek
 
 @receiver(post_migrate)
 def create_default_days_of_week(sender, **kwargs):
@@ -23,4 +24,10 @@ def create_default_days_of_week(sender, **kwargs):
     for day_data in days:
         DayOfWeek.objects.get_or_create(id=day_data['id'], defaults=day_data)
     
-    print("days of week created successfully")
\ No newline at end of file
+    print("days of week created successfully")
+
+@receiver([post_save, post_delete], sender=AcademicYear)
+@receiver([post_save, post_delete], sender=AcademicTerm)
+def invalidate_academic_context(sender, **kwargs):
+    # أي تعديل على الأعوام أو الفصول قد يغيّر العام/الفصل الحالي
+    invalidate()
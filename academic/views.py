@@ -53,11 +53,15 @@ class AcademicTermViewSet(viewsets.ModelViewSet):
 
 
 class TimeSlotViewSet(viewsets.ModelViewSet):
+    # جدول مرجعي صغير ثابت الحجم، يُعاد كاملاً دون ترقيم
+    pagination_class = None
     queryset = TimeSlot.objects.all()
     serializer_class = TimeSlotSerializer
     permission_classes = [CustomPermission]
 
 class DayOfWeekViewSet(viewsets.ModelViewSet):
+    # جدول مرجعي صغير ثابت الحجم، يُعاد كاملاً دون ترقيم
+    pagination_class = None
     queryset = DayOfWeek.objects.all()
     serializer_class = DayOfWeekSerializer
     permission_classes = [CustomPermission]
@@ -0,0 +1,14 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+
+class RoleCacheJWTAuthentication(JWTAuthentication):
+    """
+    مصادقة JWT تحدد أدوار المستخدم مسبقاً: من الكاش المشترك (لأنه يُحدَّث عند تغيير المجموعات)،
+    وعند عدم وجودها فيه تُقرأ من قاعدة البيانات وتُكتب في الكاش (انظر User.get_role_names).
+    لا يُعتمد على أدوار محفوظة في التوكن، لأنها تبقى قديمة حتى انتهاء صلاحية توكن التحديث.
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        user.get_role_names()
+        return user
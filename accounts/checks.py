@@ -0,0 +1,25 @@
+# accounts/checks.py
+from django.conf import settings
+from django.core.checks import Error, register
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """
+    أدوار المستخدمين تُقرأ من الكاش وتُلغى عند تغيير المجموعات (accounts/roles.py)،
+    فيجب أن يكون الكاش مشتركاً بين العمليات وإلا بقيت صلاحية أُزيلت صالحة في العمليات الأخرى.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in LOCAL_CACHE_BACKENDS and not getattr(settings, 'TESTING', False):
+        return [Error(
+            "أدوار المستخدمين تتطلب كاشاً مشتركاً بين العمليات.",
+            hint="اختر SCHOOLO_CACHE=db أو redis أو memcached (انظر CACHES في Schoolo/settings.py).",
+            obj='CACHES',
+            id='accounts.E001',
+        )]
+    return []
@@ -5,6 +5,7 @@ from django.contrib.auth.models import Group
 from django.conf import settings # لاستخدام AUTH_USER_MODEL في OTP
 from django.utils import timezone # للتعامل مع الوقت
 from datetime import timedelta
+from .roles import get_cached_roles, set_cached_roles
 import random
 import string
 
@@ -91,6 +92,8 @@ class User(AbstractBaseUser, PermissionsMixin , AutoCreateAndAutoUpdateTimeStamp
     USERNAME_FIELD = 'phone_number'
     REQUIRED_FIELDS = [] # يمكنك إضافة 'first_name', 'last_name' هنا إذا أردتها مطلوبة عند create_superuser
 
+    _role_names = None
+
     class Meta:
         verbose_name = _('المستخدم')
         verbose_name_plural = _('المستخدمون')
@@ -113,14 +116,27 @@ class User(AbstractBaseUser, PermissionsMixin , AutoCreateAndAutoUpdateTimeStamp
         "Does the user have permissions to view the app `app_label`?"
         return self.is_active and self.is_superuser
     
+    def get_role_names(self):
+        """
+        يعيد أسماء مجموعات المستخدم (أدواره). تُحفظ على الكائن نفسه طوال مدة الطلب،
+        وفي الكاش المشترك، فلا يُستعلم من قاعدة البيانات إلا عند عدم وجودها.
+        """
+        if self._role_names is None:
+            roles = get_cached_roles(self.pk)
+            if roles is None:
+                roles = frozenset(self.groups.values_list('name', flat=True))
+                set_cached_roles(self.pk, roles)
+            self._role_names = roles
+        return self._role_names
+
     def is_student(self):
-        return self.groups.filter(name='Student').exists() 
+        return 'Student' in self.get_role_names()
 
     def is_teacher(self):
-        return self.groups.filter(name='Teacher').exists() 
+        return 'Teacher' in self.get_role_names()
 
     def is_admin(self):
-        return self.groups.filter(name='Manager').exists() 
+        return 'Manager' in self.get_role_names()
     
     
 class OTP(models.Model):
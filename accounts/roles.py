@@ -0,0 +1,38 @@
+# accounts/roles.py
+from django.core.cache import cache
+from django.db import transaction
+
+# مدة قصيرة حتى لا تبقى صلاحية أُزيلت صالحة طويلاً إذا فات الإلغاء أي عملية (مثلاً قراءة متزامنة قديمة)
+ROLES_CACHE_TIMEOUT = 60 * 5
+
+
+def roles_cache_key(user_id):
+    return f'accounts:user_roles:{user_id}'
+
+
+def get_cached_roles(user_id):
+    """
+    يعيد أدوار المستخدم (أسماء المجموعات) من الكاش، أو None إذا لم تكن مخزنة.
+    """
+    return cache.get(roles_cache_key(user_id))
+
+
+def set_cached_roles(user_id, roles):
+    """
+    يخزن الأدوار بعد نجاح المعاملة الحالية (أو فوراً خارج المعاملات)،
+    فأدوار قُرئت داخل معاملة تراجعت لا تصل إلى الكاش.
+    """
+    roles = frozenset(roles)
+    transaction.on_commit(lambda: cache.set(roles_cache_key(user_id), roles, ROLES_CACHE_TIMEOUT))
+
+
+def invalidate_cached_roles(user_ids):
+    """
+    يحذف الأدوار المخزنة للمستخدمين فوراً وبعد نجاح المعاملة، فتُقرأ من قاعدة البيانات في الطلب التالي.
+    الحذف بعد النجاح يمنع بقاء أدوار قُرئت قبل الحفظ النهائي، والتراجع عن المعاملة لا يترك أدواراً لم تُحفظ.
+    """
+    keys = [roles_cache_key(user_id) for user_id in set(user_ids)]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -268,9 +268,9 @@ class SetPasswordSerializer(serializers.Serializer):
             'refresh': str(refresh), 
             'user_id': user.id,
             'phone_number': user.phone_number,
-            'user_role': 'admin' if user.groups.filter(name='Manager').exists() else (
-            'teacher' if user.groups.filter(name='Teacher').exists() else (
-            'student' if user.groups.filter(name='Student').exists() else 'user'
+            'user_role': 'admin' if user.is_admin() else (
+            'teacher' if user.is_teacher() else (
+            'student' if user.is_student() else 'user'
         )
     )}
 
@@ -339,9 +339,9 @@ class BaseLoginSerializer(serializers.Serializer):
         tokens = get_tokens_for_user(user)
 
         user_role = '' 
-        if user.groups.filter(name='Manager').exists():
+        if user.is_admin():
             user_role = 'admin'
-        elif user.groups.filter(name='Teacher').exists():
+        elif user.is_teacher():
             user_role = 'teacher'
 
         return {
@@ -361,7 +361,7 @@ class AdminLoginSerializer(BaseLoginSerializer):
         data = super().validate(data)
         
         user = self.user 
-        if not user.groups.filter(name='Manager').exists():
+        if not user.is_admin():
             raise serializers.ValidationError(_("هذا الحساب ليس حساب مدير."))
             
         return data
@@ -377,7 +377,7 @@ class AdminOrSuperuserLoginSerializer(TokenObtainPairSerializer):
 
         if user.is_superuser:
             token['role'] = 'superuser'
-        elif user.groups.filter(name='Manager').exists():
+        elif user.is_admin():
             token['role'] = 'admin'
         else:
             return "you can not access this" 
@@ -415,7 +415,7 @@ class TeacherLoginSerializer(BaseLoginSerializer):
         data = super().validate(data)
         
         user = self.user 
-        if not user.groups.filter(name='Teacher').exists():
+        if not user.is_teacher():
             raise serializers.ValidationError(_("هذا الحساب ليس حساب معلم."))
         data['first_name'] = user.first_name
         data['last_name'] = user.last_name
@@ -444,13 +444,13 @@ class OTPSendSerializer(serializers.Serializer):
 
         else:
             
-            if user.groups.filter(name='Manager').exists():
+            if user.is_admin():
                 self.user_role = 'admin'
                 print('Manager')
-            elif user.groups.filter(name='Teacher').exists():
+            elif user.is_teacher():
                 self.user_role = 'teacher'
                 print('Teacher')
-            elif user.groups.filter(name='Student').exists():
+            elif user.is_student():
                 self.user_role = 'student'            
             elif user.is_superuser:
                 self.user_role = 'manager'
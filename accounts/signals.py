@@ -1,6 +1,9 @@
 
-from django.db.models.signals import post_migrate
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import Group
+from .models import User
+from .roles import invalidate_cached_roles
 
 def create_default_groups(sender, **kwargs):
     if sender.label != 'accounts':
@@ -18,4 +21,43 @@ def create_default_groups(sender, **kwargs):
         print("manager")
 
 
-post_migrate.connect(create_default_groups)
\ No newline at end of file
+post_migrate.connect(create_default_groups)
+
+@receiver(m2m_changed, sender=User.groups.through)
+def refresh_roles_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    إلغاء الأدوار المخزنة في الكاش عند إضافة/إزالة مستخدم من مجموعة،
+    سواء من جهة المستخدم (user.groups.add) أو من جهة المجموعة (group.custom_user_groups.add).
+    """
+    if action == 'pre_clear' and reverse:
+        # بعد المسح لا يمكن معرفة المستخدمين المتأثرين، لذلك نحفظهم قبله
+        instance._cleared_user_ids = set(instance.custom_user_groups.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        instance._role_names = None
+        user_ids = {instance.pk}
+    elif action == 'post_clear':
+        user_ids = getattr(instance, '_cleared_user_ids', set())
+    else:
+        user_ids = pk_set or set()
+    invalidate_cached_roles(user_ids)
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_members(sender, instance, **kwargs):
+    instance._member_ids = set(instance.custom_user_groups.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def refresh_roles_on_group_update(sender, instance, created=False, **kwargs):
+    # إعادة تسمية مجموعة أو حذفها يغيّر أدوار جميع أعضائها
+    if created:
+        return
+    member_ids = getattr(instance, '_member_ids', None)
+    if member_ids is None:
+        member_ids = set(instance.custom_user_groups.values_list('pk', flat=True))
+    invalidate_cached_roles(member_ids)
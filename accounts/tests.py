@@ -1,3 +1,35 @@
+from django.contrib.auth.models import Group
+from django.db import transaction
 from django.test import TestCase
 
-# Create your tests here.
+from Schoolo.testing import SchoolTestDataMixin
+from .models import User
+from .roles import get_cached_roles
+
+
+class RoleCacheTests(SchoolTestDataMixin, TestCase):
+    """
+    الأدوار المخزنة تُلغى بعد نجاح تغيير المجموعات، والتراجع عن المعاملة لا يترك أدواراً غير محفوظة.
+    """
+
+    def _roles(self):
+        return User.objects.get(pk=self.admin_user.pk).get_role_names()
+
+    def test_removed_role_is_dropped_after_commit(self):
+        self.assertEqual(self._roles(), {'Manager'})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin_user.groups.clear()
+            self.assertEqual(self._roles(), set())
+        self.assertNotIn('Manager', get_cached_roles(self.admin_user.pk) or ())
+        self.assertFalse(User.objects.get(pk=self.admin_user.pk).is_admin())
+
+    def test_rolled_back_change_is_not_cached(self):
+        self.assertEqual(self._roles(), {'Manager'})
+        try:
+            with transaction.atomic():
+                self.admin_user.groups.add(Group.objects.get(name='Teacher'))
+                self.assertEqual(self._roles(), {'Manager', 'Teacher'})
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(self._roles(), {'Manager'})
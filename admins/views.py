@@ -43,6 +43,8 @@ class ManagerAdminDeleteView(generics.DestroyAPIView):
             return Response({"detail": f"حدث خطأ أثناء الحذف: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
         
 class AdminListView(generics.ListAPIView):
+    # الترتيب بالاسم عبر OrderingFilter لا يتوافق مع الترقيم بالمؤشر
+    pagination_class = None
     permission_classes = [IsSuperuser] 
     queryset = Admin.objects.all()
     filterset_class = TeacherFilter
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 08:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0004_timeslot_name'),
+        ('attendance', '0003_alter_attendance_status'),
+        ('students', '0008_alter_student_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['academic_year', 'academic_term', 'date'], name='attendance_year_term_date_idx'),
+        ),
+    ]
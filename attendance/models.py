@@ -64,6 +64,11 @@ class Attendance(AutoCreateAndAutoUpdateTimeStampedModel):
         unique_together = [
             ['student', 'date', 'academic_term','academic_year'] 
         ]
+        indexes = [
+            # قائمة الحضور وتقارير الفصل: تصفية بالعام والفصل ثم نطاق تاريخ
+            models.Index(fields=['academic_year', 'academic_term', 'date'], name='attendance_year_term_date_idx'),
+            # سجل حضور طالب معين مرتباً بالتاريخ يستخدم بداية فهرس unique_together (student, date)
+        ]
 
     def __str__(self):
         return f"{self.student.user.get_full_name()} - {self.date} - {self.get_status_display()}"
@@ -0,0 +1,86 @@
+# attendance/reports.py
+from django.db.models import Case, Count, When
+
+from Schoolo.exports import iter_queryset
+
+ATTENDANCE_STATUS_KEYS = ['present', 'absent', 'late', 'excused']
+
+
+def status_count_annotations():
+    """
+    تجميعات عدد سجلات كل حالة حضور، تُستخدم مع aggregate أو annotate.
+    """
+    annotations = {
+        f'{key}_count': Count(Case(When(status=key, then=1)))
+        for key in ATTENDANCE_STATUS_KEYS
+    }
+    annotations['total_count'] = Count('id')
+    return annotations
+
+
+def attendance_percentages(stats):
+    """
+    يحوّل أعداد الحالات إلى نسب مئوية من إجمالي السجلات.
+    """
+    total = stats.get('total_count') or 0
+    return {
+        key: (stats.get(f'{key}_count', 0) / total) * 100 if total > 0 else 0
+        for key in ATTENDANCE_STATUS_KEYS
+    }
+
+
+def student_attendance_stats(attendance_queryset, students_queryset):
+    """
+    يحسب إحصائيات الحضور لجميع الطلاب المطلوبين باستعلام مجمّع واحد.
+    يعيد قاموساً {student_id: {'present_count': ..., ..., 'total_count': ...}}.
+    """
+    rows = (
+        attendance_queryset
+        .filter(student__in=students_queryset.values('pk'))
+        .values('student_id')
+        .annotate(**status_count_annotations())
+        .order_by()
+    )
+    return {row.pop('student_id'): row for row in rows}
+
+
+def iter_student_attendance_rows(attendance_queryset, students_queryset):
+    """
+    يمر على الطلاب (مرتبين حسب الصف والشعبة والاسم) مع إحصائيات حضورهم دون استعلام لكل طالب:
+    استعلام مجمّع واحد للإحصائيات، واستعلام واحد يُقرأ على دفعات لأسماء الطلاب.
+    الطلاب بدون أي سجل حضور يظهرون بنسب صفرية.
+    """
+    stats_by_student = student_attendance_stats(attendance_queryset, students_queryset)
+    students = students_queryset.values(
+        'pk', 'user__first_name', 'user__last_name', 'student_class__name', 'section__name',
+    ).order_by('student_class__name', 'section__name', 'user__first_name', 'user__last_name')
+
+    for student in iter_queryset(students):
+        yield student, stats_by_student.get(student['pk'], {})
+
+
+def write_students_attendance_table(writer, row, column, attendance_queryset, students_queryset,
+                                    include_placement=False):
+    """
+    يكتب جدول نسب الحضور لكل طالب صفاً بعد صف عبر ExportWriter (xlsx بوضع constant_memory أو csv).
+    include_placement يضيف عمودي الصف والشعبة لتقارير الصف الكامل أو المدرسة.
+    يعيد رقم السطر التالي بعد الجدول.
+    """
+    headers = ['Student Name', 'Present %', 'Absent %', 'Late %', 'Excused %']
+    if include_placement:
+        headers = ['Class', 'Section'] + headers
+    writer.write_row(row, column, headers, bold=True)
+    row += 1
+
+    for student, stats in iter_student_attendance_rows(attendance_queryset, students_queryset):
+        percentages = attendance_percentages(stats)
+        full_name = f"{student['user__first_name']} {student['user__last_name']}".strip()
+        row_data = [full_name] + [f"{percentages[key]:.2f}%" for key in ATTENDANCE_STATUS_KEYS]
+        if include_placement:
+            row_data = [
+                student['student_class__name'] or "غير محدد",
+                student['section__name'] or "غير محدد",
+            ] + row_data
+        writer.write_row(row, column, row_data)
+        row += 1
+    return row
@@ -6,6 +6,9 @@ class AttendanceSerializer(serializers.ModelSerializer):
     recorded_by_name = serializers.SerializerMethodField()
     status_display = serializers.SerializerMethodField()
 
+    # العلاقات التي تُقرأ لكل سجل، تُجلب مع القائمة في نفس الاستعلام (انظر Schoolo/mixins.py)
+    select_related_fields = ('student__user', 'recorded_by')
+
     class Meta:
         model = Attendance
         fields = [
@@ -1,3 +1,65 @@
+import datetime
+
 from django.test import TestCase
+from django.urls import reverse
+
+from Schoolo.testing import SchoolTestDataMixin
+from students.models import Student
+from .models import Attendance
+
+
+class AttendanceListQueryCountTests(SchoolTestDataMixin, TestCase):
+    """
+    عدد استعلامات قائمة الحضور يجب أن يبقى ثابتاً مهما كان عدد السجلات في الصفحة.
+    """
+
+    def _add_records(self, count):
+        start = Student.objects.count()
+        for i in range(start, start + count):
+            Attendance.objects.create(
+                student=self.create_student(i), date=datetime.date(2025, 10, 1), status='present',
+                academic_year=self.year, academic_term=self.term, recorded_by=self.admin_user,
+            )
+
+    def test_query_count_is_constant(self):
+        self.assertConstantListQueries(reverse('attendance-list'), self._add_records)
+
+    def test_cursor_pages_through_equal_dates(self):
+        # كل السجلات في نفس التاريخ: المؤشر المركّب (date, id) يتقدم دون OFFSET
+        self._add_records(12)
+        url, seen = f"{reverse('attendance-list')}?page_size=5", []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data['results'])
+            previous, url = response.data['previous'], response.data['next']
+        self.assertEqual(seen, sorted(Attendance.objects.values_list('id', flat=True)))
+
+        response = self.client.get(previous)
+        self.assertEqual([row['id'] for row in response.data['results']], seen[5:10])
+
+
+class AttendanceBatchRecordTests(SchoolTestDataMixin, TestCase):
+    """
+    الإدخال الجماعي للحضور يرفض الطلبات ذات البنية الخاطئة بـ 400 مع رقم السجل بدلاً من خطأ 500.
+    """
+
+    def _post(self, entries):
+        return self.client.post(reverse('attendance-batch-record'), {'entries': entries}, format='json')
+
+    def test_malformed_entries_are_rejected(self):
+        student = self.create_student(1)
+        entry = {
+            'section_id': self.section.pk, 'date': '2025-10-01',
+            'students_attendance': [{'student_id': student.pk, 'status': 'present'}],
+        }
+        self.assertEqual(self._post({'section_id': self.section.pk}).status_code, 400)
+
+        for bad_entry in ['x', {**entry, 'students_attendance': 'present'}, {**entry, 'students_attendance': [1]}]:
+            with self.subTest(bad_entry=bad_entry):
+                response = self._post([entry, bad_entry])
+                self.assertEqual((response.status_code, response.data['index']), (400, 1))
+        self.assertFalse(Attendance.objects.exists())
 
-# Create your tests here.
+        self.assertLess(self._post([entry]).status_code, 300)
+        self.assertEqual(Attendance.objects.get().student_id, student.pk)
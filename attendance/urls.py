@@ -7,5 +7,6 @@ router.register(r'attendance', AttendanceViewSet, basename='attendance')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('attendance/record/batch/', AttendanceBatchRecordView.as_view(), name='attendance-batch-record'),
     path('attendance/record/<int:section_id>/<str:date_str>/', AttendanceBulkRecordView.as_view(), name='attendance-bulk-record'),
 ]
\ No newline at end of file
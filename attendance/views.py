@@ -1,8 +1,11 @@
 from rest_framework import viewsets, permissions
 from django.db.models import Q
 from academic.models import  AcademicYear, AcademicTerm
-from classes.models import Section
+from academic.context import get_current, get_current_year, get_current_term
+from classes.models import Class, Section
 from .models import Attendance
+from .reports import attendance_percentages, status_count_annotations, write_students_attendance_table
+from Schoolo.bulk import bulk_upsert
 from students.models import Student
 from .serializers import AttendanceSerializer
 from rest_framework.views import APIView
@@ -12,16 +15,15 @@ from rest_framework import status, permissions
 import datetime
 from rest_framework.decorators import action
 from rest_framework import serializers
-import io
-import pandas as pd
-from django.http import HttpResponse
-import xlsxwriter
+from Schoolo.exports import ExportWriter, get_export_format, iter_queryset
+from Schoolo.mixins import SerializerQueryProfileMixin
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(SerializerQueryProfileMixin, viewsets.ModelViewSet):
 
     """
     مجموعة طرق عرض لإدارة سجلات الحضور.
     """
+    cursor_ordering = ('-date', 'id')
     serializer_class = AttendanceSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -60,11 +62,8 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         else:
             # إذا لم يتم تحديد أي منهما، استخدم القيم الحالية (is_current=True)
             try:
-                current_academic_year = AcademicYear.objects.get(is_current=True)
-                current_academic_term = AcademicTerm.objects.get(
-                    is_current=True,
-                    academic_year=current_academic_year
-                )
+                current_academic_year = get_current_year()
+                current_academic_term = get_current_term()
                 filters &= Q(academic_year=current_academic_year, academic_term=current_academic_term)
             except (AcademicYear.DoesNotExist, AcademicTerm.DoesNotExist):
                 # إذا لم يتم العثور على سنة أو فصل دراسي حالي، لا تُرجع أي بيانات
@@ -124,8 +123,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         date = serializer.validated_data.get('date')
         status = serializer.validated_data.get('status')
         
-        current_academic_year = AcademicYear.objects.filter(is_current=True).first()
-        current_academic_term = AcademicTerm.objects.filter(is_current=True, academic_year=current_academic_year).first()
+        current_academic_year, current_academic_term = get_current()
 
         # استخدام update_or_create لتجنب التكرار
         try:
@@ -148,8 +146,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         if not (user.is_superuser or user.is_admin()):
             raise permissions.exceptions.PermissionDenied("You must be authenticated to create a record.")
 
-        current_academic_year = AcademicYear.objects.filter(is_current=True).first()
-        current_academic_term = AcademicTerm.objects.filter(is_current=True, academic_year=current_academic_year).first()
+        current_academic_year, current_academic_term = get_current()
 
         serializer.save(
             recorded_by=user,
@@ -234,12 +231,24 @@ class AttendanceViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def download_excel_report(self, request):
+        """
+        تقرير حضور لطالب (student_id) أو لشعبة (section_id) أو لصف كامل (class_id)
+        أو للمدرسة كاملة (scope=school)، بصيغة xlsx (افتراضياً) أو csv عبر file_format=csv.
+        تقارير الشعبة والصف والمدرسة تُبنى باستعلامات مجمّعة ثابتة العدد، وجميع التقارير
+        تُكتب صفاً بعد صف إلى ملف مؤقت وتُرسل عبر FileResponse.
+        """
         student_id = request.query_params.get('student_id')
         section_id = request.query_params.get('section_id')
+        class_id = request.query_params.get('class_id')
+        is_school_scope = request.query_params.get('scope') == 'school'
         user = request.user
         
-        if not (student_id or section_id):
-            return Response({"error": "يجب توفير معرف الطالب (student_id) أو معرف الشعبة (section_id)."}, status=status.HTTP_400_BAD_REQUEST)
+        if not (student_id or section_id or class_id or is_school_scope):
+            return Response({"error": "يجب توفير معرف الطالب (student_id) أو معرف الشعبة (section_id) أو معرف الصف (class_id) أو scope=school."}, status=status.HTTP_400_BAD_REQUEST)
+
+        export_format = get_export_format(request)
+        if not export_format:
+            return Response({"error": "صيغة الملف غير مدعومة. الصيغ المتاحة: xlsx, csv."}, status=status.HTTP_400_BAD_REQUEST)
         
         if not (user.is_superuser or user.is_admin()):
             if student_id:
@@ -249,152 +258,212 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                         return Response({"error": "لا تملك الصلاحية للوصول إلى هذا التقرير."}, status=status.HTTP_403_FORBIDDEN)
                 except Student.DoesNotExist:
                     return Response({"error": "الطالب غير موجود."}, status=status.HTTP_404_NOT_FOUND)
-            elif section_id:
+            else:
                 return Response({"error": "لا تملك الصلاحية للوصول إلى هذا التقرير."}, status=status.HTTP_403_FORBIDDEN)
-        
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-        worksheet = workbook.add_worksheet('Attendance Report')
-        bold = workbook.add_format({'bold': True})
 
         # تحديد العمود الذي سيبدأ منه التقرير ليظهر في المنتصف
         start_column_index = 3 # العمود D
 
         if student_id:
             try:
-                student_obj = Student.objects.get(pk=student_id)
+                student_obj = Student.objects.select_related('user', 'student_class', 'section').get(pk=student_id)
             except Student.DoesNotExist:
                 return Response({"error": "الطالب غير موجود."}, status=status.HTTP_404_NOT_FOUND)
             
             queryset = self.get_queryset().filter(student_id=student_id).order_by('date')
             if not queryset.exists():
                 return Response({"message": "لا توجد سجلات حضور لهذا الطالب."}, status=status.HTTP_200_OK)
+
+            writer = ExportWriter(export_format, sheet_name='Attendance Report')
             
             # كتابة معلومات الطالب العامة
-            worksheet.write(1, start_column_index, 'Student Name:', bold)
-            worksheet.write(1, start_column_index + 1, student_obj.user.get_full_name())
-            worksheet.write(2, start_column_index, 'Student Enrollment Number:', bold)
-            worksheet.write(2, start_column_index + 1, student_obj.enrollment_number)
-            worksheet.write(3, start_column_index, 'Class:', bold)
-            worksheet.write(3, start_column_index + 1, student_obj.student_class.name if hasattr(student_obj, 'student_class') and student_obj.student_class else "غير محدد")
-            worksheet.write(4, start_column_index, 'Section:', bold)
-            worksheet.write(4, start_column_index + 1, student_obj.section.name if hasattr(student_obj, 'section') and student_obj.section else "غير محدد")
+            writer.write(1, start_column_index, 'Student Name:', bold=True)
+            writer.write(1, start_column_index + 1, student_obj.user.get_full_name())
+            writer.write(2, start_column_index, 'Student Enrollment Number:', bold=True)
+            writer.write(2, start_column_index + 1, student_obj.enrollment_number)
+            writer.write(3, start_column_index, 'Class:', bold=True)
+            writer.write(3, start_column_index + 1, student_obj.student_class.name if student_obj.student_class else "غير محدد")
+            writer.write(4, start_column_index, 'Section:', bold=True)
+            writer.write(4, start_column_index + 1, student_obj.section.name if student_obj.section else "غير محدد")
             
             # حساب الإحصائيات
-            stats = queryset.aggregate(
-                present_count=Count(Case(When(status='present', then=1))),
-                absent_count=Count(Case(When(status='absent', then=1))),
-                late_count=Count(Case(When(status='late', then=1))),
-                excused_count=Count(Case(When(status='excused', then=1))),
-                total_count=Count('id')
-            )
+            stats = queryset.aggregate(**status_count_annotations())
             total = stats['total_count'] or 0
-            
-            percentages = {
-                "present": (stats['present_count'] / total) * 100 if total > 0 else 0,
-                "absent": (stats['absent_count'] / total) * 100 if total > 0 else 0,
-                "late": (stats['late_count'] / total) * 100 if total > 0 else 0,
-                "excused": (stats['excused_count'] / total) * 100 if total > 0 else 0,
-            }
+            percentages = attendance_percentages(stats)
 
             # كتابة جدول الملخص
-            summary_data = {
-                'Status': ['Present', 'Absent', 'Late', 'Excused', 'Total'],
-                'Count': [stats['present_count'], stats['absent_count'], 
-                          stats['late_count'], stats['excused_count'], total],
-                'Percentage': [f"{percentages['present']:.2f}%", f"{percentages['absent']:.2f}%", 
-                               f"{percentages['late']:.2f}%", f"{percentages['excused']:.2f}%", '100.00%']
-            }
-            df_summary = pd.DataFrame(summary_data)
-            worksheet.write(6, start_column_index, 'Attendance Summary:', bold)
-            worksheet.write_row(7, start_column_index, df_summary.columns, bold)
-            for row_num, row_data in enumerate(df_summary.values):
-                worksheet.write_row(row_num + 8, start_column_index, row_data)
-
-            # جلب البيانات التفصيلية للتقرير
-            data = list(queryset.values(
-                'date', 'status', 'academic_year__name', 'academic_term__name'
-            ))
-
-            df_report = pd.DataFrame(data)
+            writer.write(6, start_column_index, 'Attendance Summary:', bold=True)
+            writer.write_row(7, start_column_index, ['Status', 'Count', 'Percentage'], bold=True)
+            summary_rows = [
+                ['Present', stats['present_count'], f"{percentages['present']:.2f}%"],
+                ['Absent', stats['absent_count'], f"{percentages['absent']:.2f}%"],
+                ['Late', stats['late_count'], f"{percentages['late']:.2f}%"],
+                ['Excused', stats['excused_count'], f"{percentages['excused']:.2f}%"],
+                ['Total', total, '100.00%'],
+            ]
+            for row_num, row_data in enumerate(summary_rows):
+                writer.write_row(row_num + 8, start_column_index, row_data)
+
+            # كتابة البيانات التفصيلية للتقرير على دفعات
             report_start_row = 15
-            df_report.rename(columns={'date': 'Date', 'status': 'Status', 'academic_year__name': 'Academic Year', 'academic_term__name': 'Academic Term'}, inplace=True)
-            worksheet.write(report_start_row - 2, start_column_index, 'Detailed Report:', bold)
-            worksheet.write_row(report_start_row, start_column_index, df_report.columns, bold)
-            for row_num, row_data in enumerate(df_report.values):
-                row_data_str = [str(item) for item in row_data]
-                worksheet.write_row(row_num + report_start_row + 1, start_column_index, row_data_str)
+            writer.write(report_start_row - 2, start_column_index, 'Detailed Report:', bold=True)
+            writer.write_row(report_start_row, start_column_index, ['Date', 'Status', 'Academic Year', 'Academic Term'], bold=True)
+            details = queryset.values_list('date', 'status', 'academic_year__name', 'academic_term__name')
+            for row_num, row_data in enumerate(iter_queryset(details)):
+                writer.write_row(row_num + report_start_row + 1, start_column_index, [str(item) for item in row_data])
             
-            filename = f'Student_Attendance_Report_{student_obj.user.get_full_name()}.xlsx'
+            filename = f'Student_Attendance_Report_{student_obj.user.get_full_name()}'
 
         elif section_id:
             try:
-                section_obj = Section.objects.get(pk=section_id)
+                section_obj = Section.objects.select_related('class_obj').get(pk=section_id)
                 student_class_obj = section_obj.class_obj
             except Section.DoesNotExist:
                 return Response({"error": "الشعبة غير موجودة."}, status=status.HTTP_404_NOT_FOUND)
 
-            # كتابة معلومات الصف والشعبة العامة في الأعلى
-            worksheet.write(1, start_column_index, 'Class:', bold)
-            worksheet.write(1, start_column_index + 1, student_class_obj.name if student_class_obj else "غير محدد")
-            worksheet.write(2, start_column_index, 'Section:', bold)
-            worksheet.write(2, start_column_index + 1, section_obj.name)
-
             students_in_section = Student.objects.filter(section=section_obj)
             if not students_in_section.exists():
                 return Response({"message": "لا يوجد طلاب في هذه الشعبة."}, status=status.HTTP_200_OK)
-            
-            # تحديد سطر بداية الجدول
-            current_row = 5
-            
-            # كتابة رأس الجدول
-            headers = ['Student Name', 'Present %', 'Absent %', 'Late %', 'Excused %']
-            worksheet.write_row(current_row, start_column_index, headers, bold)
-            current_row += 1
-
-            for student_obj in students_in_section:
-                queryset = self.get_queryset().filter(student=student_obj).order_by('date')
-                
-                stats = queryset.aggregate(
-                    present_count=Count(Case(When(status='present', then=1))),
-                    absent_count=Count(Case(When(status='absent', then=1))),
-                    late_count=Count(Case(When(status='late', then=1))),
-                    excused_count=Count(Case(When(status='excused', then=1))),
-                    total_count=Count('id')
-                )
-                total = stats['total_count'] or 0
-                
-                percentages = {
-                    "present": (stats['present_count'] / total) * 100 if total > 0 else 0,
-                    "absent": (stats['absent_count'] / total) * 100 if total > 0 else 0,
-                    "late": (stats['late_count'] / total) * 100 if total > 0 else 0,
-                    "excused": (stats['excused_count'] / total) * 100 if total > 0 else 0,
-                }
-                
-                # إعداد البيانات لسطر واحد
-                row_data = [
-                    student_obj.user.get_full_name(),
-                    f"{percentages['present']:.2f}%",
-                    f"{percentages['absent']:.2f}%",
-                    f"{percentages['late']:.2f}%",
-                    f"{percentages['excused']:.2f}%",
-                ]
-                
-                worksheet.write_row(current_row, start_column_index, row_data)
-                current_row += 1
-            
-            filename = f'Section_Attendance_Report_{section_obj.name}.xlsx'
 
-        workbook.close()
-        output.seek(0)
-        
-        response = HttpResponse(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            writer = ExportWriter(export_format, sheet_name='Attendance Report')
+
+            # كتابة معلومات الصف والشعبة العامة في الأعلى
+            writer.write(1, start_column_index, 'Class:', bold=True)
+            writer.write(1, start_column_index + 1, student_class_obj.name if student_class_obj else "غير محدد")
+            writer.write(2, start_column_index, 'Section:', bold=True)
+            writer.write(2, start_column_index + 1, section_obj.name)
+
+            write_students_attendance_table(
+                writer, 5, start_column_index, self.get_queryset(), students_in_section,
+            )
+            filename = f'Section_Attendance_Report_{section_obj.name}'
+
+        elif class_id:
+            try:
+                class_obj = Class.objects.get(pk=class_id)
+            except Class.DoesNotExist:
+                return Response({"error": "الصف غير موجود."}, status=status.HTTP_404_NOT_FOUND)
+
+            students_in_class = Student.objects.filter(student_class=class_obj)
+            if not students_in_class.exists():
+                return Response({"message": "لا يوجد طلاب في هذا الصف."}, status=status.HTTP_200_OK)
+
+            writer = ExportWriter(export_format, sheet_name='Attendance Report')
+            writer.write(1, start_column_index, 'Class:', bold=True)
+            writer.write(1, start_column_index + 1, class_obj.name)
+
+            write_students_attendance_table(
+                writer, 5, start_column_index, self.get_queryset(), students_in_class, include_placement=True,
+            )
+            filename = f'Class_Attendance_Report_{class_obj.name}'
+
+        else:
+            all_students = Student.objects.all()
+            if not all_students.exists():
+                return Response({"message": "لا يوجد طلاب."}, status=status.HTTP_200_OK)
+
+            writer = ExportWriter(export_format, sheet_name='Attendance Report')
+            writer.write(1, start_column_index, 'School Attendance Report', bold=True)
+
+            write_students_attendance_table(
+                writer, 5, start_column_index, self.get_queryset(), all_students, include_placement=True,
+            )
+            filename = 'School_Attendance_Report'
+
+        return writer.response(filename)
+
+ATTENDANCE_STATUSES = {choice for choice, _label in Attendance.ATTENDANCE_STATUS_CHOICES}
+
+
+def _is_records_list(students_attendance):
+    """
+    هل قائمة الحضور المرسلة قائمة كائنات (سجل لكل طالب)؟
+    """
+    return isinstance(students_attendance, list) and all(isinstance(record, dict) for record in students_attendance)
+
+
+def _student_sections(attendance_lists):
+    """
+    يجلب شعب جميع الطلاب الواردين في قوائم الحضور باستعلام واحد.
+    """
+    student_ids = set()
+    for students_attendance in attendance_lists:
+        for student_record in students_attendance:
+            try:
+                student_ids.add(int(student_record.get('student_id')))
+            except (TypeError, ValueError):
+                pass
+    return dict(Student.objects.filter(pk__in=student_ids).values_list('pk', 'section_id'))
+
+
+def _collect_attendance(section, date_obj, students_attendance, student_sections, user,
+                        academic_year, academic_term, records, errors, error_context=None):
+    """
+    يتحقق من سجلات حضور شعبة واحدة في الذاكرة ويضيف السجلات الصالحة إلى records
+    (مفتاحها الطالب والتاريخ، فتُعتمد آخر حالة عند التكرار). يعيد عدد السجلات الصالحة.
+    """
+    error_context = error_context or {}
+    success_count = 0
+    for student_record in students_attendance:
+        student_id = student_record.get('student_id')
+        attendance_status = student_record.get('status')
+
+        if not student_id or not attendance_status:
+            errors.append({"error": "يجب توفير معرف الطالب والحالة لكل سجل.", "record": student_record, **error_context})
+            continue
+
+        try:
+            student_pk = int(student_id)
+        except (TypeError, ValueError):
+            student_pk = None
+        if student_pk not in student_sections:
+            errors.append({"error": f"الطالب بالمعرف {student_id} غير موجود.", "record": student_record, **error_context})
+            continue
+
+        if student_sections[student_pk] != section.id:
+            errors.append({"error": f"الطالب بالمعرف {student_id} لا ينتمي إلى هذه الشعبة.", "record": student_record, **error_context})
+            continue
+
+        if attendance_status not in ATTENDANCE_STATUSES:
+            errors.append({"error": f"حالة الحضور ({attendance_status}) غير صالحة.", "record": student_record, **error_context})
+            continue
+
+        records[(student_pk, date_obj)] = Attendance(
+            student_id=student_pk,
+            date=date_obj,
+            status=attendance_status,
+            recorded_by=user,
+            academic_year=academic_year,
+            academic_term=academic_term,
         )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
+        success_count += 1
+    return success_count
+
+
+def _save_attendance(records):
+    """
+    يحفظ سجلات الحضور باستعلام upsert واحد على المفتاح الفريد للجدول.
+    """
+    bulk_upsert(
+        Attendance,
+        list(records.values()),
+        unique_fields=['student', 'date', 'academic_term', 'academic_year'],
+        update_fields=['status', 'recorded_by', 'updated_at'],
+    )
+
+
+def _bulk_response(success_count, errors):
+    if errors:
+        return Response({
+            "message": f"تم تسجيل {success_count} سجل بنجاح. توجد أخطاء في {len(errors)} سجل.",
+            "errors": errors
+        }, status=status.HTTP_207_MULTI_STATUS)
+
+    return Response(
+        {"message": "تم تسجيل جميع سجلات الحضور بنجاح.", "count": success_count},
+        status=status.HTTP_201_CREATED
+    )
+
 
 class AttendanceBulkRecordView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -422,7 +491,7 @@ class AttendanceBulkRecordView(APIView):
             )
         
         # التحقق من البيانات المرسلة
-        if not students_attendance:
+        if not students_attendance or not _is_records_list(students_attendance):
             return Response(
                 {"error": "يجب توفير حالة الحضور للطلاب."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -437,49 +506,105 @@ class AttendanceBulkRecordView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        current_academic_year, current_academic_term = get_current()
+        if not current_academic_year or not current_academic_term:
+            return Response(
+                {"error": "لا يوجد عام أو فصل دراسي حالي."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        current_academic_year = AcademicYear.objects.filter(is_current=True).first()
-        current_academic_term = AcademicTerm.objects.filter(is_current=True, academic_year=current_academic_year).first()
-
-        success_count = 0
+        records = {}
         errors = []
+        student_sections = _student_sections([students_attendance])
+        success_count = _collect_attendance(
+            section_obj, date_obj, students_attendance, student_sections, user,
+            current_academic_year, current_academic_term, records, errors,
+        )
+        _save_attendance(records)
 
-        # حلقة على كل طالب في القائمة
-        for student_record in students_attendance:
-            student_id = student_record.get('student_id')
-            attendance_status  = student_record.get('status')
-            
-            if not student_id or not status:
-                errors.append({"error": "يجب توفير معرف الطالب والحالة لكل سجل.", "record": student_record})
-                continue
-            
-            try:
-                student_obj = Student.objects.get(pk=student_id)
-                
-                # استخدام update_or_create لتجنب التكرار ولتحديث السجل إذا كان موجوداً
-                attendance_record, created = Attendance.objects.update_or_create(
-                    student=student_obj,
-                    date=date_obj,
-                    defaults={
-                        'status': attendance_status ,
-                        'recorded_by': user,
-                        'academic_year': current_academic_year,
-                        'academic_term': current_academic_term
-                    }
+        return _bulk_response(success_count, errors)
+
+
+class AttendanceBatchRecordView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        """
+        تسجيل الحضور لعدة شعب وعدة تواريخ في طلب واحد (مثلاً لصف كامل).
+        البيانات المطلوبة في الـ Body:
+        {
+          "entries": [
+            {
+              "section_id": 1,
+              "date": "2025-10-01",
+              "students_attendance": [
+                {"student_id": 101, "status": "present"},
+                ...
+              ]
+            },
+            ...
+          ]
+        }
+        عدد الاستعلامات ثابت مهما كان عدد الشعب أو الطلاب.
+        """
+        user = request.user
+        entries = request.data.get('entries', [])
+
+        if not (user.is_superuser or user.is_admin()):
+            return Response(
+                {"error": "You do not have permission to record attendance."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        if not entries or not isinstance(entries, list):
+            return Response(
+                {"error": "يجب توفير قائمة الشعب والتواريخ ('entries')."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        for idx, entry in enumerate(entries):
+            if not isinstance(entry, dict) or not _is_records_list(entry.get('students_attendance') or []):
+                return Response(
+                    {"error": f"السجل رقم {idx} في 'entries' غير صالح: يجب أن يكون كائناً يحتوي قائمة 'students_attendance' من الكائنات.", "index": idx},
+                    status=status.HTTP_400_BAD_REQUEST
                 )
-                success_count += 1
-            except Student.DoesNotExist:
-                errors.append({"error": f"الطالب بالمعرف {student_id} غير موجود.", "record": student_record})
-            except Exception as e:
-                errors.append({"error": str(e), "record": student_record})
-        
-        if errors:
-            return Response({
-                "message": f"تم تسجيل {success_count} سجل بنجاح. توجد أخطاء في {len(errors)} سجل.",
-                "errors": errors
-            }, status=status.HTTP_207_MULTI_STATUS)
 
-        return Response(
-            {"message": "تم تسجيل جميع سجلات الحضور بنجاح.", "count": success_count},
-            status=status.HTTP_201_CREATED
-        )
\ No newline at end of file
+        current_academic_year, current_academic_term = get_current()
+        if not current_academic_year or not current_academic_term:
+            return Response(
+                {"error": "لا يوجد عام أو فصل دراسي حالي."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        section_ids = set()
+        for entry in entries:
+            try:
+                section_ids.add(int(entry.get('section_id')))
+            except (TypeError, ValueError):
+                pass
+        sections = Section.objects.in_bulk(section_ids)
+        student_sections = _student_sections(
+            [entry.get('students_attendance') or [] for entry in entries]
+        )
+
+        records = {}
+        errors = []
+        success_count = 0
+        for entry in entries:
+            section_id = entry.get('section_id')
+            date_str = entry.get('date')
+            error_context = {"section_id": section_id, "date": date_str}
+            try:
+                date_obj = datetime.date.fromisoformat(date_str)
+                section_obj = sections[int(section_id)]
+            except (TypeError, ValueError, KeyError):
+                errors.append({"error": "صيغة التاريخ أو معرف الشعبة غير صالح.", **error_context})
+                continue
+
+            success_count += _collect_attendance(
+                section_obj, date_obj, entry.get('students_attendance') or [], student_sections, user,
+                current_academic_year, current_academic_term, records, errors, error_context,
+            )
+
+        _save_attendance(records)
+
+        return _bulk_response(success_count, errors)
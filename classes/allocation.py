@@ -0,0 +1,126 @@
+# classes/allocation.py
+import heapq
+from collections import Counter
+
+from django.db.models import Count, Q
+
+from .models import Section
+
+GENDERS = ('Male', 'Female', 'Other')
+
+
+class SectionAllocator:
+    """
+    توزيع دفعة من الطلاب على شعب الصف في مسار واحد باستخدام heap لكل (صف، مسار، جنس):
+    كل طالب يذهب إلى الشعبة الأقل ازدحاماً التي لديها مكان شاغر.
+    - balance_gender: المفاضلة أولاً بعدد طلاب نفس الجنس في الشعبة.
+    - balance_average: توزيع الطلاب من الأعلى معدلاً إلى الأدنى، والمفاضلة بمجموع المعدلات
+      عند تساوي العدد، فلا تتجمع المعدلات المرتفعة في شعبة واحدة.
+    الشعبة بلا سعة محددة (capacity فارغة) لا حد لعدد طلابها.
+    يستخدمه الترفيع والقبول الجماعي ونقل الطالب يدوياً.
+    """
+
+    def __init__(self, sections, counts=None, gender_counts=None, balance_gender=False, balance_average=False):
+        self.sections = {section.pk: section for section in sections}
+        self.counts = Counter({pk: 0 for pk in self.sections})
+        self.counts.update(counts or {})
+        self.gender_counts = Counter(gender_counts or {})
+        self.average_sums = Counter()
+        self.balance_gender = balance_gender
+        self.balance_average = balance_average
+        self._heaps = {}
+
+    @classmethod
+    def for_sections(cls, sections, **options):
+        """
+        يبني الموزّع لشعب محددة مع أعداد طلابها الحالية (استعلام واحد).
+        """
+        sections = list(sections)
+        counts, gender_counts = {}, {}
+        annotations = {'student_total': Count('students')}
+        for gender in GENDERS:
+            annotations[f'student_{gender}'] = Count('students', filter=Q(students__gender=gender))
+        rows = Section.objects.filter(pk__in=[section.pk for section in sections]).annotate(
+            **annotations
+        ).values('pk', *annotations)
+        for row in rows:
+            counts[row['pk']] = row['student_total']
+            for gender in GENDERS:
+                gender_counts[(row['pk'], gender)] = row[f'student_{gender}']
+        return cls(sections, counts, gender_counts, **options)
+
+    @classmethod
+    def for_classes(cls, class_ids, academic_year, **options):
+        """
+        يبني الموزّع لكل الشعب النشطة في صفوف العام المحدد.
+        """
+        sections = Section.objects.filter(
+            class_obj_id__in=class_ids, academic_year=academic_year, is_active=True,
+        ).select_related('class_obj').order_by('id')
+        return cls.for_sections(sections, **options)
+
+    def has_room(self, section, seats=1):
+        capacity = self.sections[section.pk].capacity
+        return capacity is None or self.counts[section.pk] + seats <= capacity
+
+    def _key(self, section_pk, gender):
+        key = ()
+        if self.balance_gender:
+            key += (self.gender_counts[(section_pk, gender)],)
+        key += (self.counts[section_pk],)
+        if self.balance_average:
+            key += (self.average_sums[section_pk],)
+        return key + (section_pk,)
+
+    def _heap(self, class_id, stream_type, gender):
+        group = (class_id, stream_type, gender if self.balance_gender else None)
+        heap = self._heaps.get(group)
+        if heap is None:
+            heap = [
+                self._key(section.pk, gender) for section in self.sections.values()
+                if section.class_obj_id == class_id and (stream_type is None or section.stream_type == stream_type)
+            ]
+            heapq.heapify(heap)
+            self._heaps[group] = heap
+        return heap
+
+    def take(self, class_id, stream_type=None, gender=None, average=None):
+        """
+        يحجز مقعداً لطالب واحد في أفضل شعبة ويعيدها، أو None إذا امتلأت كل الشعب.
+        مفاتيح الـ heap لا تنقص أبداً، فالمفتاح القديم يُصحح عند سحبه (lazy update).
+        """
+        heap = self._heap(class_id, stream_type, gender)
+        while heap:
+            entry = heap[0]
+            section_pk = entry[-1]
+            section = self.sections[section_pk]
+            if not self.has_room(section):
+                heapq.heappop(heap)
+                continue
+            current = self._key(section_pk, gender)
+            if entry != current:
+                heapq.heapreplace(heap, current)
+                continue
+            self.counts[section_pk] += 1
+            self.gender_counts[(section_pk, gender)] += 1
+            if average is not None:
+                self.average_sums[section_pk] += average
+            heapq.heapreplace(heap, self._key(section_pk, gender))
+            return section
+        return None
+
+    def allocate(self, students, class_id, stream_type=None, averages=None):
+        """
+        يوزع دفعة طلاب على شعب الصف ويعيد {student_pk: الشعبة أو None}.
+        averages: {student_pk: المعدل} ويُستخدم عند تفعيل balance_average.
+        """
+        averages = averages or {}
+        students = list(students)
+        if self.balance_average:
+            students.sort(key=lambda student: averages.get(student.pk) or 0, reverse=True)
+        return {
+            student.pk: self.take(
+                class_id, stream_type, gender=student.gender, average=averages.get(student.pk),
+            )
+            for student in students
+        }
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from academic.models import AcademicYear 
+from academic.context import get_current_year
 from .models import Class, Section
 from django.utils.translation import gettext_lazy as _
 
@@ -45,7 +46,7 @@ class SectionSerializer(serializers.ModelSerializer):
         
         # جلب العام الدراسي الحالي
         try:
-            current_academic_year = AcademicYear.objects.get(is_current=True)
+            current_academic_year = get_current_year()
         except AcademicYear.DoesNotExist:
             raise serializers.ValidationError({"academic_year": _("لا يوجد عام دراسي حالي محدد. الرجاء تحديد عام دراسي حالي أولاً.")})
         except AcademicYear.MultipleObjectsReturned:
@@ -92,7 +93,7 @@ class SectionSerializer(serializers.ModelSerializer):
         
         # جلب العام الدراسي الحالي
         try:
-            current_academic_year = AcademicYear.objects.get(is_current=True)
+            current_academic_year = get_current_year()
         except (AcademicYear.DoesNotExist, AcademicYear.MultipleObjectsReturned) as e:
             raise serializers.ValidationError({"academic_year": str(e)})
 
@@ -116,6 +117,11 @@ class TaughtClassSerializer(serializers.ModelSerializer):
         fields = ['id', 'name','description','sections_count']
 
     def get_sections_count(self, obj):
+        # العدد محسوب مسبقاً في الـ view من نطاق تدريس المعلم (TeacherScope)
+        taught_sections = self.context.get('taught_sections_per_class')
+        if taught_sections is not None:
+            return taught_sections.get(obj.pk, 0)
+
         teacher_instance = self.context.get('teacher_instance')
         
         # إذا كان المعلم موجودًا، قم بالعد بناءً على الشعب التي يدرسها
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 08:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0004_timeslot_name'),
+        ('classes', '0004_class_next_class'),
+        ('communication', '0003_newsactivity_academic_term_and_more'),
+        ('subject', '0010_remove_subject_unique_subject_per_class_and_stream_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='newsactivity',
+            index=models.Index(fields=['academic_year', 'academic_term', 'target_audience'], name='news_year_term_audience_idx'),
+        ),
+    ]
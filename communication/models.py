@@ -106,6 +106,10 @@ class NewsActivity(AutoCreateAndAutoUpdateTimeStampedModel):
         verbose_name = _("إعلان/نشاط")
         verbose_name_plural = _("الإعلانات والأنشطة")
         ordering = ['-created_at']
+        indexes = [
+            # قائمة الإعلانات: تصفية بالعام والفصل ثم الجمهور المستهدف
+            models.Index(fields=['academic_year', 'academic_term', 'target_audience'], name='news_year_term_audience_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.get_type_display()}) - {self.get_target_audience_display()}"
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework import permissions
 from django.utils.translation import gettext_lazy as _
 from .models import NewsActivity
+from academic.context import get_current_year, get_current_term
 from .serializers import NewsActivitySerializer
 from django.db.models import Q
 from accounts.models import User
@@ -14,18 +15,19 @@ from academic.models import AcademicYear, AcademicTerm
 
 
 class NewsActivityViewSet(viewsets.ModelViewSet):
+    cursor_ordering = ('-created_at', '-id')
     serializer_class = NewsActivitySerializer
     queryset = NewsActivity.objects.all().order_by('-created_at')
     permission_classes = [CustomPermission]
 
     def perform_create(self, serializer):
         try:
-            current_academic_year = AcademicYear.objects.get(is_current=True)
+            current_academic_year = get_current_year()
         except AcademicYear.DoesNotExist:
             raise ValueError(_("لا يوجد عام دراسي نشط حالياً لإنشاء الإعلان/النشاط."))
         
         try:
-            current_academic_term = AcademicTerm.objects.get(is_current=True, academic_year=current_academic_year)
+            current_academic_term = get_current_term()
         except AcademicTerm.DoesNotExist:
             raise ValueError(_("لا يوجد فصل دراسي نشط حالياً ضمن العام الدراسي النشط لإنشاء الإعلان/النشاط."))
             
@@ -43,12 +45,12 @@ class NewsActivityViewSet(viewsets.ModelViewSet):
 
         # جلب العام والفصل الدراسي الحاليين
         try:
-            current_academic_year = AcademicYear.objects.get(is_current=True)
+            current_academic_year = get_current_year()
         except AcademicYear.DoesNotExist:
             current_academic_year = None
         
         try:
-            current_academic_term = AcademicTerm.objects.get(is_current=True, academic_year=current_academic_year)
+            current_academic_term = get_current_term()
         except AcademicTerm.DoesNotExist:
             current_academic_term = None
 
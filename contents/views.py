@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from .serializers import SubjectContentSerializer,ContentAttachmentSerializer
 from .models import ContentAttachment,SubjectContent
+from academic.context import get_current_year, get_current_term
 from rest_framework.permissions import AllowAny
 from rest_framework import permissions 
 from accounts.permissions import *
@@ -31,12 +32,12 @@ class SubjectContentViewSet(viewsets.ModelViewSet):
         is_admin_or_superuser = user.is_superuser or user.is_admin()
 
         try:
-            current_academic_year = AcademicYear.objects.get(is_current=True)
+            current_academic_year = get_current_year()
         except AcademicYear.DoesNotExist:
             current_academic_year = None
         
         try:
-            current_academic_term = AcademicTerm.objects.get(is_current=True, academic_year=current_academic_year)
+            current_academic_term = get_current_term()
         except AcademicTerm.DoesNotExist:
             current_academic_term = None
 
@@ -96,12 +97,12 @@ class SubjectContentViewSet(viewsets.ModelViewSet):
             raise ValueError(_("المستخدم الحالي ليس لديه حساب معلم مرتبط."))
 
         try:
-            current_academic_year = AcademicYear.objects.get(is_current=True)
+            current_academic_year = get_current_year()
         except AcademicYear.DoesNotExist:
             raise ValueError(_("لا يوجد عام دراسي نشط حالياً لإنشاء المحتوى."))
         
         try:
-            current_academic_term = AcademicTerm.objects.get(is_current=True, academic_year=current_academic_year)
+            current_academic_term = get_current_term()
         except AcademicTerm.DoesNotExist:
             raise ValueError(_("لا يوجد فصل دراسي نشط حالياً ضمن العام الدراسي النشط لإنشاء المحتوى."))
             
@@ -0,0 +1,123 @@
+# grading/aggregates.py
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from Schoolo.bulk import bulk_upsert
+from .models import Grade, StudentSubjectAggregate
+from .rankings import bump_rankings_version
+
+AGGREGATE_UNIQUE_FIELDS = ['student', 'subject', 'academic_year', 'academic_term']
+AGGREGATE_UPDATE_FIELDS = ['total_score', 'total_marks', 'grades_count', 'updated_at']
+
+
+def _summary_rows(grades_queryset):
+    """
+    يجمّع العلامات حسب (الطالب، المادة، العام، الفصل) باستعلام واحد.
+    """
+    return grades_queryset.values(
+        'student_id',
+        'exam__subject_id',
+        'exam__academic_year_id',
+        'exam__academic_term_id',
+    ).annotate(
+        total_score=Sum('score'),
+        total_marks=Sum('exam__total_marks'),
+        grades_count=Count('id'),
+    ).order_by()
+
+
+def _aggregate_from_row(row):
+    return StudentSubjectAggregate(
+        student_id=row['student_id'],
+        subject_id=row['exam__subject_id'],
+        academic_year_id=row['exam__academic_year_id'],
+        academic_term_id=row['exam__academic_term_id'],
+        total_score=row['total_score'] or 0,
+        total_marks=row['total_marks'] or 0,
+        grades_count=row['grades_count'],
+    )
+
+
+def exam_key(exam):
+    """
+    يعيد مفتاح الملخص (المادة، العام، الفصل) لاختبار معين.
+    """
+    return (exam.subject_id, exam.academic_year_id, exam.academic_term_id)
+
+
+def refresh_aggregates(student_ids, subject_id, academic_year_id, academic_term_id):
+    """
+    يعيد حساب صفوف الملخص لمجموعة طلاب ضمن مادة وعام وفصل محددين،
+    ويحذف الصفوف التي لم تعد لها أي علامة.
+    """
+    student_ids = set(student_ids)
+    if not student_ids:
+        return
+
+    grades_queryset = Grade.objects.filter(
+        student_id__in=student_ids,
+        exam__subject_id=subject_id,
+        exam__academic_year_id=academic_year_id,
+        exam__academic_term_id=academic_term_id,
+    )
+    aggregates = [_aggregate_from_row(row) for row in _summary_rows(grades_queryset)]
+    stale_student_ids = student_ids - {aggregate.student_id for aggregate in aggregates}
+
+    with transaction.atomic():
+        bulk_upsert(
+            StudentSubjectAggregate,
+            aggregates,
+            unique_fields=AGGREGATE_UNIQUE_FIELDS,
+            update_fields=AGGREGATE_UPDATE_FIELDS,
+        )
+        if stale_student_ids:
+            StudentSubjectAggregate.objects.filter(
+                student_id__in=stale_student_ids,
+                subject_id=subject_id,
+                academic_year_id=academic_year_id,
+                academic_term_id=academic_term_id,
+            ).delete()
+        bump_rankings_version({academic_term_id})
+
+
+def refresh_keys(keys):
+    """
+    يعيد حساب مجموعة من المفاتيح (student_id, subject_id, academic_year_id, academic_term_id)
+    باستعلام واحد لكل (مادة، عام، فصل) بدلاً من استعلام لكل طالب.
+    """
+    grouped = {}
+    for student_id, subject_id, academic_year_id, academic_term_id in keys:
+        grouped.setdefault((subject_id, academic_year_id, academic_term_id), set()).add(student_id)
+
+    for (subject_id, academic_year_id, academic_term_id), student_ids in grouped.items():
+        refresh_aggregates(student_ids, subject_id, academic_year_id, academic_term_id)
+
+
+def refresh_exam(exam, old_key=None):
+    """
+    يعيد حساب ملخصات جميع الطلاب الذين لهم علامات في اختبار معين،
+    وكذلك مفتاحه السابق إذا تغيّرت مادته أو عامه أو فصله.
+    """
+    student_ids = set(Grade.objects.filter(exam=exam).values_list('student_id', flat=True))
+    if not student_ids:
+        return
+    keys = {(student_id,) + exam_key(exam) for student_id in student_ids}
+    if old_key and None not in old_key and old_key != exam_key(exam):
+        keys.update((student_id,) + old_key for student_id in student_ids)
+    refresh_keys(keys)
+
+
+def rebuild_all(batch_size=1000):
+    """
+    يعيد بناء جدول الملخص بالكامل من جدول العلامات.
+    يُستخدم لإصلاح أي انحراف في البيانات أو بعد الاستيراد المباشر إلى قاعدة البيانات.
+    """
+    with transaction.atomic():
+        StudentSubjectAggregate.objects.all().delete()
+        rows = _summary_rows(Grade.objects.all()).iterator(chunk_size=batch_size)
+        created = StudentSubjectAggregate.objects.bulk_create(
+            (_aggregate_from_row(row) for row in rows),
+            batch_size=batch_size,
+        )
+        bump_rankings_version({aggregate.academic_term_id for aggregate in created})
+    return len(created)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GradingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'grading'
+
+    def ready(self):
+        # استيراد signals عند جاهزية التطبيق
+        import grading.signals
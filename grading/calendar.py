@@ -0,0 +1,145 @@
+# grading/calendar.py
+from collections import defaultdict
+
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from classes.models import Section
+from schedules.models import ClassSchedule
+from subject.models import TeacherSubject
+
+from .models import Exam
+
+
+class ExamCalendar:
+    """
+    تقويم الاختبارات لفصل دراسي واحد، يُبنى في الذاكرة ويتحقق من اختبار واحد أو دفعة اختبارات
+    دون استعلام لكل اختبار:
+    - تاريخ -> الصفوف المشغولة باختبار (اختبار الشعبة يشغل صفها، كما في Exam.clean).
+    - مفاتيح مواصفات الاختبارات الموجودة لمنع التكرار.
+    - شعب الصفوف ومساراتها، وأزواج (المعلم، المادة)، وما يدرسه المعلم في جدول الفصل.
+    كل فهرس من استعلام واحد، وadd() يضيف الاختبار المقبول فتُفحص بقية الدفعة مقابله.
+    """
+
+    def __init__(self, academic_year_id, academic_term_id):
+        self.academic_year_id = academic_year_id
+        self.academic_term_id = academic_term_id
+        self._days = defaultdict(set)
+        self._specs = set()
+        self._section_classes = {}
+        self._class_streams = defaultdict(set)
+        self._teacher_subjects = set()
+        self._scheduled_sections = set()
+        self._scheduled_classes = set()
+
+    @classmethod
+    def load(cls, academic_year_id, academic_term_id, class_ids=(), teacher_ids=(), exclude_id=None):
+        """
+        يبني التقويم لاختبارات الصفوف المعطاة وللمعلمين المعطين.
+        exclude_id: اختبار يُستثنى من التقويم، ويستخدم عند تعديل اختبار موجود.
+        """
+        calendar = cls(academic_year_id, academic_term_id)
+        class_ids = [pk for pk in class_ids if pk is not None]
+        teacher_ids = [pk for pk in teacher_ids if pk is not None]
+
+        if class_ids:
+            exams = Exam.objects.filter(
+                Q(target_class_id__in=class_ids) | Q(target_section__class_obj_id__in=class_ids),
+                academic_year_id=academic_year_id, academic_term_id=academic_term_id,
+            )
+            if exclude_id is not None:
+                exams = exams.exclude(pk=exclude_id)
+            for row in exams.values_list(
+                'subject_id', 'exam_type', 'exam_date', 'target_class_id', 'target_section_id',
+                'stream_type', 'target_section__class_obj_id',
+            ):
+                calendar._occupy(row[:-1], row[3] or row[-1])
+
+            for section_id, class_id, stream_type in Section.objects.filter(
+                class_obj_id__in=class_ids, academic_year_id=academic_year_id,
+            ).values_list('id', 'class_obj_id', 'stream_type'):
+                calendar._section_classes[section_id] = class_id
+                calendar._class_streams[class_id].add(stream_type)
+
+        if teacher_ids:
+            calendar._teacher_subjects = set(TeacherSubject.objects.filter(
+                teacher_id__in=teacher_ids,
+            ).values_list('teacher_id', 'subject_id'))
+            for teacher_id, subject_id, section_id, class_id in ClassSchedule.objects.filter(
+                teacher_id__in=teacher_ids,
+                academic_year_id=academic_year_id, academic_term_id=academic_term_id,
+            ).values_list('teacher_id', 'subject_id', 'section_id', 'section__class_obj_id').distinct():
+                calendar._scheduled_sections.add((teacher_id, subject_id, section_id))
+                calendar._scheduled_classes.add((teacher_id, subject_id, class_id))
+        return calendar
+
+    @staticmethod
+    def spec(exam):
+        return (
+            exam.subject_id, exam.exam_type, exam.exam_date,
+            exam.target_class_id, exam.target_section_id, exam.stream_type,
+        )
+
+    def _occupy(self, spec, class_id):
+        self._specs.add(spec)
+        if class_id is not None:
+            self._days[spec[2]].add(class_id)
+
+    def _class_of(self, exam):
+        if exam.target_section_id is None:
+            return exam.target_class_id
+        class_id = self._section_classes.get(exam.target_section_id)
+        if class_id is None:
+            class_id = exam.target_section.class_obj_id
+        return class_id
+
+    def is_busy(self, exam_date, class_id):
+        return class_id in self._days.get(exam_date, ())
+
+    def validate(self, exam):
+        """
+        يعيد قائمة رسائل الأخطاء للاختبار المقترح (فارغة إذا كان صالحاً)، بنفس قواعد Exam.clean.
+        """
+        messages = []
+        if exam.total_marks is not None and exam.total_marks <= 0:
+            messages.append(_("يجب أن تكون الدرجة الكلية للاختبار أكبر من صفر."))
+
+        if not (exam.target_class_id or exam.target_section_id):
+            messages.append(_("يجب تحديد الصف المستهدف على الأقل لإنشاء امتحان."))
+            return messages
+        if exam.target_section_id and exam.stream_type:
+            messages.append(_("لا يمكن تحديد شعبة محددة ونوع تخصص في نفس الوقت. اختر أحدهما فقط."))
+
+        class_id = self._class_of(exam)
+        if exam.target_section_id and exam.target_class_id and class_id != exam.target_class_id:
+            messages.append(_("الشعبة المستهدفة لا تنتمي إلى الصف المستهدف."))
+        if exam.target_class_id and exam.stream_type and exam.stream_type not in self._class_streams[exam.target_class_id]:
+            messages.append(_("الصف المحدد لا يحتوي على شعب من نوع التخصص المحدد."))
+
+        if exam.teacher_id and exam.subject_id:
+            if (exam.teacher_id, exam.subject_id) not in self._teacher_subjects:
+                messages.append(_("المعلم المحدد لا يدرس المادة المستهدفة لهذا الاختبار."))
+            elif exam.target_section_id:
+                if (exam.teacher_id, exam.subject_id, exam.target_section_id) not in self._scheduled_sections:
+                    messages.append(_("المعلم المحدد لا يدرس هذه المادة في الشعبة المستهدفة لهذا الفصل الدراسي."))
+            elif (exam.teacher_id, exam.subject_id, class_id) not in self._scheduled_classes:
+                messages.append(_("المعلم المحدد لا يدرس هذه المادة في أي شعبة من الصف المستهدف لهذا الفصل الدراسي."))
+
+        if self.spec(exam) in self._specs:
+            messages.append(_("يوجد بالفعل امتحان بنفس المواصفات في نفس التاريخ."))
+        elif self.is_busy(exam.exam_date, class_id):
+            messages.append(_("يوجد امتحان آخر في نفس الوقت لهذه الشعبة أو الصف."))
+        return messages
+
+    def conflicts(self, exam):
+        """
+        هل يتعارض الاختبار مع اختبار في التقويم (نفس المواصفات، أو اختبار آخر لصفه في نفس اليوم)؟
+        فحص التاريخ فقط دون قواعد المعلم والمسار، ويُستخدم لإعادة فحص اختبارات سبق التحقق منها.
+        """
+        return self.spec(exam) in self._specs or self.is_busy(exam.exam_date, self._class_of(exam))
+
+    def add(self, exam):
+        """
+        يضيف اختباراً مقبولاً إلى التقويم حتى تُفحص بقية الدفعة مقابله.
+        """
+        self._occupy(self.spec(exam), self._class_of(exam))
@@ -1,7 +1,8 @@
 from django.db.models import Avg, Sum
 from academic.models import AcademicYear
+from academic.context import get_current_year
 from students.models import Student
-from .models import Grade
+from .models import StudentSubjectAggregate
 from django.utils.translation import gettext_lazy as _
 from decimal import Decimal
 
@@ -15,48 +16,52 @@ class GradeCalculator:
         دالة مساعدة للعثور على معرف السنة الدراسية الحالية.
         """
         try:
-            current_academic_year = AcademicYear.objects.get(is_current=True)
+            current_academic_year = get_current_year()
             return current_academic_year.id
         except AcademicYear.DoesNotExist:
             return None
 
     def _get_base_queryset(self, student_id, academic_year_id=None, academic_term_id=None, subject_id=None):
         """
-        دالة مساعدة لإنشاء QuerySet الأساسي
+        دالة مساعدة لإنشاء QuerySet الأساسي من جدول ملخصات العلامات
         """
-        grades_queryset = Grade.objects.filter(student_id=student_id)
+        grades_queryset = StudentSubjectAggregate.objects.filter(student_id=student_id)
         
         if academic_year_id:
-            grades_queryset = grades_queryset.filter(exam__academic_year_id=academic_year_id)
+            grades_queryset = grades_queryset.filter(academic_year_id=academic_year_id)
         elif not academic_term_id: # إذا لم يتم تحديد سنة أو فصل، نأخذ السنة الحالية
             current_year_id = self._get_current_year_id()
             if current_year_id:
-                grades_queryset = grades_queryset.filter(exam__academic_year_id=current_year_id)
+                grades_queryset = grades_queryset.filter(academic_year_id=current_year_id)
 
         if academic_term_id:
-            grades_queryset = grades_queryset.filter(exam__academic_term_id=academic_term_id)
+            grades_queryset = grades_queryset.filter(academic_term_id=academic_term_id)
         if subject_id:
-            grades_queryset = grades_queryset.filter(exam__subject_id=subject_id)
+            grades_queryset = grades_queryset.filter(subject_id=subject_id)
 
         return grades_queryset
 
-    def _normalized_percentage_for_queryset(self, grades_queryset):
+    def _normalized_percentage(self, total_score, total_max):
         """
-        يحسب نسبة مئوية موحّدة (0-100) باحتساب مجموع العلامات ÷ مجموع العلامات الكلية ثم * 100.
+        يحوّل مجموع العلامات ومجموع العلامات الكلية إلى نسبة مئوية موحّدة (0-100).
         يعيد None إذا لا توجد بيانات أو المجموع الكلي يساوي صفرًا.
         """
-        aggregates = grades_queryset.aggregate(
-            total_score=Sum('score'),
-            total_max=Sum('exam__total_marks'),
-        )
-        total_score = aggregates.get('total_score')
-        total_max = aggregates.get('total_max')
-
         if total_score is None or total_max in (None, Decimal('0')):
             return None
         percent = (total_score / total_max) * Decimal('100')
         return round(percent, 2)
 
+    def _normalized_percentage_for_queryset(self, grades_queryset):
+        """
+        يحسب نسبة مئوية موحّدة (0-100) باحتساب مجموع العلامات ÷ مجموع العلامات الكلية ثم * 100.
+        يعيد None إذا لا توجد بيانات أو المجموع الكلي يساوي صفرًا.
+        """
+        aggregates = grades_queryset.aggregate(
+            total_score=Sum('total_score'),
+            total_max=Sum('total_marks'),
+        )
+        return self._normalized_percentage(aggregates.get('total_score'), aggregates.get('total_max'))
+
     def calculate_subject_average(self, student_id, subject_id, academic_year_id=None, academic_term_id=None):
         """
         يحسب المعدل كنسبة مئوية موحّدة لمادة محددة ضمن القيود (سنة/فصل اختياريين).
@@ -73,31 +78,49 @@ class GradeCalculator:
         """
         يحسب المعدل العام عبر جميع المواد على شكل متوسط معدلات المواد (كنسب مئوية).
         """
+        averages = self.calculate_overall_averages(
+            [student_id],
+            academic_year_id=academic_year_id,
+            academic_term_id=academic_term_id,
+        )
+        return averages.get(int(student_id))
+
+    def calculate_overall_averages(self, student_ids, academic_year_id=None, academic_term_id=None):
+        """
+        يحسب المعدل العام لمجموعة من الطلاب دفعة واحدة.
+        تُحسب النسبة المئوية لكل (طالب، مادة) باستعلام واحد على جدول الملخصات، ثم تُدمج في الذاكرة
+        إلى معدل عام لكل طالب. يعيد قاموساً {student_id: المعدل أو None}.
+        """
+        student_ids = [int(student_id) for student_id in student_ids]
+        averages = {student_id: None for student_id in student_ids}
+        if not student_ids:
+            return averages
+
         # إذا لم يتم تحديد سنة أو فصل، نستخدم السنة الحالية
         if not academic_year_id and not academic_term_id:
             academic_year_id = self._get_current_year_id()
             if not academic_year_id:
-                return None  # لا توجد سنة دراسية حالية
+                return averages  # لا توجد سنة دراسية حالية
 
-        base_qs = Grade.objects.filter(student_id=student_id)
+        grades_queryset = StudentSubjectAggregate.objects.filter(student_id__in=student_ids)
         if academic_year_id:
-            base_qs = base_qs.filter(exam__academic_year_id=academic_year_id)
+            grades_queryset = grades_queryset.filter(academic_year_id=academic_year_id)
         if academic_term_id:
-            base_qs = base_qs.filter(exam__academic_term_id=academic_term_id)
-        
-        if not base_qs.exists():
-            return None
-        
-        subject_ids = base_qs.values_list('exam__subject_id', flat=True).distinct()
-        per_subject_avgs = []
-        for sid in subject_ids:
-            subject_qs = base_qs.filter(exam__subject_id=sid)
-            avg_percent = self._normalized_percentage_for_queryset(subject_qs)
+            grades_queryset = grades_queryset.filter(academic_term_id=academic_term_id)
+
+        per_subject_rows = grades_queryset.values('student_id', 'subject_id').annotate(
+            total_score=Sum('total_score'),
+            total_max=Sum('total_marks'),
+        ).order_by()
+
+        per_student_percents = {}
+        for row in per_subject_rows:
+            avg_percent = self._normalized_percentage(row['total_score'], row['total_max'])
             if avg_percent is not None:
-                per_subject_avgs.append(avg_percent)
+                per_student_percents.setdefault(row['student_id'], []).append(avg_percent)
 
-        if not per_subject_avgs:
-            return None
+        for student_id, percents in per_student_percents.items():
+            overall = sum(percents) / len(percents)
+            averages[student_id] = round(overall, 2)
 
-        overall = sum(per_subject_avgs) / len(per_subject_avgs)
-        return round(overall, 2)
\ No newline at end of file
+        return averages
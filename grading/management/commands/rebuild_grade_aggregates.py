@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from grading.aggregates import rebuild_all
+
+
+class Command(BaseCommand):
+    help = "إعادة بناء جدول ملخصات علامات الطلاب (StudentSubjectAggregate) بالكامل من جدول العلامات."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="عدد السجلات في كل دفعة إدراج.",
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"تمت إعادة بناء {count} ملخص بنجاح."))
@@ -0,0 +1,65 @@
+# Generated by Django 5.2 on 2026-10-18 08:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_aggregates(apps, schema_editor):
+    Grade = apps.get_model('grading', 'Grade')
+    StudentSubjectAggregate = apps.get_model('grading', 'StudentSubjectAggregate')
+    rows = (
+        Grade.objects
+        .values('student_id', 'exam__subject_id', 'exam__academic_year_id', 'exam__academic_term_id')
+        .annotate(total_score=Sum('score'), total_marks=Sum('exam__total_marks'), grades_count=Count('id'))
+        .order_by()
+    )
+    StudentSubjectAggregate.objects.bulk_create(
+        (
+            StudentSubjectAggregate(
+                student_id=row['student_id'],
+                subject_id=row['exam__subject_id'],
+                academic_year_id=row['exam__academic_year_id'],
+                academic_term_id=row['exam__academic_term_id'],
+                total_score=row['total_score'] or 0,
+                total_marks=row['total_marks'] or 0,
+                grades_count=row['grades_count'],
+            )
+            for row in rows.iterator(chunk_size=2000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0004_timeslot_name'),
+        ('grading', '0004_alter_grade_options_remove_grade_graded_by_and_more'),
+        ('students', '0008_alter_student_image'),
+        ('subject', '0010_remove_subject_unique_subject_per_class_and_stream_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSubjectAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ آخر تحديث')),
+                ('total_score', models.DecimalField(decimal_places=2, default=0, max_digits=9, verbose_name='مجموع الدرجات المحرزة')),
+                ('total_marks', models.DecimalField(decimal_places=2, default=0, max_digits=9, verbose_name='مجموع الدرجات الكلية')),
+                ('grades_count', models.PositiveIntegerField(default=0, verbose_name='عدد العلامات')),
+                ('academic_term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_subject_aggregates', to='academic.academicterm', verbose_name='الفصل الدراسي')),
+                ('academic_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_subject_aggregates', to='academic.academicyear', verbose_name='العام الدراسي')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subject_aggregates', to='students.student', verbose_name='الطالب')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_aggregates', to='subject.subject', verbose_name='المادة الدراسية')),
+            ],
+            options={
+                'verbose_name': 'ملخص علامات مادة',
+                'verbose_name_plural': 'ملخصات علامات المواد',
+                'unique_together': {('student', 'subject', 'academic_year', 'academic_term')},
+            },
+        ),
+        migrations.RunPython(populate_aggregates, migrations.RunPython.noop),
+    ]
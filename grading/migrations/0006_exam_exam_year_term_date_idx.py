@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 08:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0004_timeslot_name'),
+        ('classes', '0004_class_next_class'),
+        ('grading', '0005_studentsubjectaggregate'),
+        ('subject', '0010_remove_subject_unique_subject_per_class_and_stream_and_more'),
+        ('teachers', '0002_alter_teacheravailability_day_of_week'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['academic_year', 'academic_term', 'exam_date'], name='exam_year_term_date_idx'),
+        ),
+    ]
@@ -1,13 +1,11 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from accounts.models import AutoCreateAndAutoUpdateTimeStampedModel,User
-from schedules.models import ClassSchedule
 from subject.models import Subject
 from academic.models import AcademicYear, AcademicTerm
 from classes.models import Class, Section 
 from students.models import Student
 import datetime
-from django.db.models import Q
 
 from teachers.models import Teacher
 
@@ -107,6 +105,10 @@ class Exam(AutoCreateAndAutoUpdateTimeStampedModel):
         unique_together = [
             ['subject', 'academic_year', 'academic_term', 'exam_type', 'exam_date', 'target_class', 'target_section', 'stream_type']
         ]
+        indexes = [
+            # قائمة الاختبارات: تصفية بالعام والفصل ثم ترتيب أو نطاق بتاريخ الاختبار
+            models.Index(fields=['academic_year', 'academic_term', 'exam_date'], name='exam_year_term_date_idx'),
+        ]
 
     def __str__(self):
         details = []
@@ -126,109 +128,19 @@ class Exam(AutoCreateAndAutoUpdateTimeStampedModel):
 
     def clean(self):
         from django.core.exceptions import ValidationError
-        from subject.models import TeacherSubject
-
-        if self.total_marks <= 0:
-            raise ValidationError(_("يجب أن تكون الدرجة الكلية للاختبار أكبر من صفر."))
-        
-        if not (self.target_class or self.target_section):
-            raise ValidationError(_("يجب تحديد الصف المستهدف على الأقل لإنشاء امتحان."))
-         # التحقق من التناسق: لا يمكن تحديد شعبة ونوع تخصص في نفس الوقت
-        if self.target_section and self.stream_type:
-            raise ValidationError(_("لا يمكن تحديد شعبة محددة ونوع تخصص في نفس الوقت. اختر أحدهما فقط."))
-
-        # التحقق من أن الشعبة تنتمي للصف المحدد
-        if self.target_section and self.target_class and self.target_section.class_obj != self.target_class:
-            raise ValidationError(_("الشعبة المستهدفة لا تنتمي إلى الصف المستهدف."))
-        
-        if self.target_class and self.stream_type:
-            if not Section.objects.filter(class_obj=self.target_class, stream_type=self.stream_type).exists():
-                 raise ValidationError(_("الصف المحدد لا يحتوي على شعب من نوع التخصص المحدد."))
-        # التحقق من أن المعلم يدرس المادة المستهدفة
-        if self.teacher and self.subject:
-            if not TeacherSubject.objects.filter(teacher=self.teacher, subject=self.subject).exists():
-                raise ValidationError(_("المعلم المحدد لا يدرس المادة المستهدفة لهذا الاختبار."))
-        
-        # التحقق من أن الشعبة تنتمي إلى الصف
-        if self.target_section and self.target_class and self.target_section.class_obj != self.target_class:
-            raise ValidationError(_("الشعبة المستهدفة يجب أن تنتمي إلى الصف المستهدف المحدد."))
-
-        # التحقق من التضارب (الأساسي)
-        # هذا الشرط يمنع وجود امتحانين بنفس المواصفات بالضبط
-        conflicting_exams_query = Exam.objects.filter(
-            subject=self.subject,
-            academic_year=self.academic_year,
-            academic_term=self.academic_term,
-            exam_type=self.exam_type,
-            exam_date=self.exam_date,
-            target_class=self.target_class,
-            target_section=self.target_section,
-            stream_type=self.stream_type
-        ).exclude(pk=self.pk)
-
-        if conflicting_exams_query.exists():
-            raise ValidationError(_("يوجد بالفعل امتحان بنفس المواصفات في نفس التاريخ."))
-        if self.teacher and self.subject:
-        # إذا كان الامتحان يستهدف شعبة محددة
-            if self.target_section:
-                has_schedule = ClassSchedule.objects.filter(
-                    teacher=self.teacher,
-                    subject=self.subject,
-                    section=self.target_section,
-                    academic_year=self.academic_year,
-                    academic_term=self.academic_term
-                ).exists()
-                if not has_schedule:
-                    raise ValidationError(
-                        _("المعلم المحدد لا يدرس هذه المادة في الشعبة المستهدفة لهذا الفصل الدراسي.")
-                    )
-                # إذا كان الامتحان يستهدف صفًا كاملاً (جميع شعبه)
-                elif self.target_class:
-                    has_schedule = ClassSchedule.objects.filter(
-                        teacher=self.teacher,
-                        subject=self.subject,
-                        section__class_obj=self.target_class,
-                        academic_year=self.academic_year,
-                        academic_term=self.academic_term
-                    ).exists()
-                    if not has_schedule:
-                        raise ValidationError(
-                            _("المعلم المحدد لا يدرس هذه المادة في أي شعبة من الصف المستهدف لهذا الفصل الدراسي.")
-                        )
-                # إذا كان الامتحان عاماً (لا يستهدف شعبة أو صف)
-                else:
-                    has_teacher_subject = TeacherSubject.objects.filter(
-                        teacher=self.teacher,
-                        subject=self.subject
-                    ).exists()
-                    if not has_teacher_subject:
-                        raise ValidationError(
-                            _("المعلم المحدد لا يدرس المادة المستهدفة لهذا الاختبار.")
-                        )
-        # التحقق من تضارب الوقت
-        # هنا نتحقق من عدم وجود امتحان آخر في نفس الوقت لنفس الصف أو الشعبة
-        conflicting_time_query = Exam.objects.filter(
-            exam_date=self.exam_date,
-            academic_year=self.academic_year,
-            academic_term=self.academic_term
-        ).exclude(pk=self.pk)
-
-        if self.target_section:
-            conflicting_time_query = conflicting_time_query.filter(
-                Q(target_section=self.target_section) |
-                Q(target_class=self.target_section.class_obj) |
-                Q(target_section__class_obj=self.target_section.class_obj)
-            )
-        elif self.target_class:
-            conflicting_time_query = conflicting_time_query.filter(
-                Q(target_class=self.target_class) |
-                Q(target_section__class_obj=self.target_class)
-            )
-
-        if conflicting_time_query.exists():
-            raise ValidationError(_("يوجد امتحان آخر في نفس الوقت لهذه الشعبة أو الصف."))
+        from grading.calendar import ExamCalendar
+
+        # تقويم واحد لاختبارات الصف ومواد المعلم بدلاً من استعلام exists() لكل شرط
+        section_class_id = self.target_section.class_obj_id if self.target_section_id else None
+        calendar = ExamCalendar.load(
+            self.academic_year_id, self.academic_term_id,
+            class_ids=[self.target_class_id, section_class_id], teacher_ids=[self.teacher_id],
+            exclude_id=self.pk, # استبعاد الكائن الحالي في حالة التحديث
+        )
+        errors = calendar.validate(self)
+        if errors:
+            raise ValidationError(errors[0])
 
-        
         super().clean()
 
 
@@ -273,3 +185,61 @@ class Grade(AutoCreateAndAutoUpdateTimeStampedModel):
         return f"{self.student.user.get_full_name()} - {self.exam.get_exam_type_display()} ({self.score})"
 
 
+
+
+class StudentSubjectAggregate(AutoCreateAndAutoUpdateTimeStampedModel):
+    """
+    ملخص مُجمّع لعلامات الطالب في مادة واحدة ضمن عام وفصل دراسيين.
+    يُحدّث تلقائياً عند حفظ العلامات أو حذفها، وتعتمد عليه حسابات المعدلات بدلاً من
+    إعادة تجميع جدول العلامات في كل طلب.
+    """
+    student = models.ForeignKey(
+        Student,
+        on_delete=models.CASCADE,
+        related_name='subject_aggregates',
+        verbose_name=_("الطالب")
+    )
+    subject = models.ForeignKey(
+        Subject,
+        on_delete=models.CASCADE,
+        related_name='student_aggregates',
+        verbose_name=_("المادة الدراسية")
+    )
+    academic_year = models.ForeignKey(
+        AcademicYear,
+        on_delete=models.CASCADE,
+        related_name='student_subject_aggregates',
+        verbose_name=_("العام الدراسي")
+    )
+    academic_term = models.ForeignKey(
+        AcademicTerm,
+        on_delete=models.CASCADE,
+        related_name='student_subject_aggregates',
+        verbose_name=_("الفصل الدراسي")
+    )
+    total_score = models.DecimalField(
+        max_digits=9,
+        decimal_places=2,
+        default=0,
+        verbose_name=_("مجموع الدرجات المحرزة")
+    )
+    total_marks = models.DecimalField(
+        max_digits=9,
+        decimal_places=2,
+        default=0,
+        verbose_name=_("مجموع الدرجات الكلية")
+    )
+    grades_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("عدد العلامات")
+    )
+
+    class Meta:
+        verbose_name = _("ملخص علامات مادة")
+        verbose_name_plural = _("ملخصات علامات المواد")
+        unique_together = [
+            ['student', 'subject', 'academic_year', 'academic_term']
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.subject_id} ({self.total_score}/{self.total_marks})"
@@ -0,0 +1,75 @@
+# grading/rankings.py
+from django.core.cache import cache
+from django.db.models import Avg, F, FloatField, Window
+from django.db.models.functions import Cast, PercentRank, Rank
+
+from Schoolo.cache import CacheVersion
+from .models import StudentSubjectAggregate
+
+# انتقال الطالب بين الشعب لا يرفع النسخة، فتنتهي صلاحية الترتيب المخزن بعد هذه المدة
+RANKINGS_CACHE_TIMEOUT = 60 * 30
+
+
+def rankings_cache_key(academic_term_id, version):
+    return f'grading:rankings:{academic_term_id}:{version}'
+
+
+# نسخة ملخصات العلامات لكل فصل دراسي: رفعها يُهمل الترتيب المخزن للفصل
+rankings_versions = CacheVersion('grading:rankings_version')
+get_rankings_version = rankings_versions.get
+bump_rankings_version = rankings_versions.bump
+
+
+def ranked_averages(academic_term_id, **filters):
+    """
+    معدل كل طالب في الفصل الدراسي مع ترتيبه ونسبته المئينية داخل شعبته وداخل صفه، باستعلام واحد.
+    المعدل هو متوسط نسب المواد من جدول الملخصات (نفس تعريف GradeCalculator.calculate_overall_averages)،
+    والترتيب بدوال النوافذ Rank و PercentRank مقسّمة على الشعبة الحالية للطالب وصفها،
+    لذلك يصح للفصل الدراسي الحالي فقط (الواجهات في grading/views.py لا تقبل غيره).
+    filters: تصفية إضافية على جدول الملخصات (مثلاً student__section__class_obj_id=...).
+    يجب ألا تضيّق التصفية داخل الصف، لأن النوافذ تُحسب بعد WHERE.
+    """
+    average = F('average').desc()
+    section = [F('student__section_id')]
+    class_obj = [F('student__section__class_obj_id')]
+    return StudentSubjectAggregate.objects.filter(
+        academic_term_id=academic_term_id, total_marks__gt=0, student__section__isnull=False, **filters,
+    ).values(
+        'student_id', 'student__user__first_name', 'student__user__last_name',
+        'student__section_id', 'student__section__class_obj_id',
+    ).annotate(
+        # التحويل إلى float حتى لا تُقرّب القسمة العشرية (على SQLite تصبح قسمة صحيحة)
+        average=Avg(Cast('total_score', FloatField()) * 100 / Cast('total_marks', FloatField())),
+    ).annotate(
+        section_rank=Window(Rank(), partition_by=section, order_by=average),
+        section_percentile=Window(PercentRank(), partition_by=section, order_by=F('average').asc()),
+        class_rank=Window(Rank(), partition_by=class_obj, order_by=average),
+        class_percentile=Window(PercentRank(), partition_by=class_obj, order_by=F('average').asc()),
+    ).order_by('student__section__class_obj_id', 'class_rank', 'student_id')
+
+
+def _ranking_from_row(row):
+    return {
+        'student_id': row['student_id'],
+        'student_name': f"{row['student__user__first_name']} {row['student__user__last_name']}".strip(),
+        'section_id': row['student__section_id'],
+        'class_id': row['student__section__class_obj_id'],
+        'average': round(row['average'], 2),
+        'section_rank': row['section_rank'],
+        'section_percentile': round(row['section_percentile'] * 100, 2),
+        'class_rank': row['class_rank'],
+        'class_percentile': round(row['class_percentile'] * 100, 2),
+    }
+
+
+def get_term_rankings(academic_term_id):
+    """
+    ترتيب كل طلاب الفصل الدراسي (مرتب حسب الصف ثم الترتيب داخله) من الكاش أو باستعلام واحد.
+    قوائم الشعب والصفوف ولوحة المتصدرين كلها مقاطع من هذه القائمة.
+    """
+    key = rankings_cache_key(academic_term_id, get_rankings_version(academic_term_id))
+    rankings = cache.get(key)
+    if rankings is None:
+        rankings = [_ranking_from_row(row) for row in ranked_averages(academic_term_id)]
+        cache.set(key, rankings, RANKINGS_CACHE_TIMEOUT)
+    return rankings
@@ -17,6 +17,12 @@ class ExamSerializer(serializers.ModelSerializer):
     target_section_name = serializers.StringRelatedField(source='target_section')
     stream_type_display = serializers.CharField(source='get_stream_type_display', read_only=True)
 
+    # __str__ للفصل والشعبة يقرأ السنة والمرحلة أيضاً، لذلك تُجلب معها
+    select_related_fields = (
+        'subject', 'academic_year', 'academic_term__academic_year', 'teacher__user',
+        'target_class', 'target_section__class_obj', 'target_section__academic_year',
+    )
+
     class Meta:
         model = Exam
         fields = [
@@ -101,6 +107,8 @@ class GradeSerializer(serializers.ModelSerializer):
     exam_type = serializers.CharField(source='exam.exam_type', read_only=True)
     exam_total_marks = serializers.DecimalField(source='exam.total_marks', max_digits=5, decimal_places=2, read_only=True)
 
+    select_related_fields = ('student__user', 'exam__subject')
+
     class Meta:
         model = Grade
         fields = [
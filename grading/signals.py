@@ -0,0 +1,61 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .aggregates import exam_key, refresh_exam, refresh_keys
+from .models import Exam, Grade
+from .stats import bump_exam_stats
+
+
+def _loaded(instance, *attnames):
+    # القراءة من __dict__ مباشرة حتى لا تُحمّل الحقول المؤجلة (only/defer) باستعلام إضافي
+    return tuple(instance.__dict__.get(attname) for attname in attnames)
+
+
+@receiver(post_init, sender=Grade)
+def remember_grade_origin(sender, instance, **kwargs):
+    # حفظ القيم الأصلية لمعرفة الملخص السابق إذا تغيّر الطالب أو الاختبار
+    instance._aggregate_origin = _loaded(instance, 'student_id', 'exam_id')
+
+
+@receiver(post_save, sender=Grade)
+def update_aggregate_on_grade_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    keys = {(instance.student_id,) + exam_key(instance.exam)}
+    old_student_id, old_exam_id = instance._aggregate_origin
+    if old_exam_id and (old_student_id, old_exam_id) != (instance.student_id, instance.exam_id):
+        old_exam = Exam.objects.filter(pk=old_exam_id).first()
+        if old_exam:
+            keys.add((old_student_id,) + exam_key(old_exam))
+    instance._aggregate_origin = (instance.student_id, instance.exam_id)
+    refresh_keys(keys)
+    bump_exam_stats({instance.exam_id, old_exam_id})
+
+
+@receiver(post_delete, sender=Grade)
+def update_aggregate_on_grade_delete(sender, instance, **kwargs):
+    exam = Exam.objects.filter(pk=instance.exam_id).first()
+    if exam:
+        refresh_keys({(instance.student_id,) + exam_key(exam)})
+    bump_exam_stats({instance.exam_id})
+
+
+@receiver(post_init, sender=Exam)
+def remember_exam_origin(sender, instance, **kwargs):
+    subject_id, academic_year_id, academic_term_id, total_marks = _loaded(
+        instance, 'subject_id', 'academic_year_id', 'academic_term_id', 'total_marks'
+    )
+    instance._aggregate_origin = ((subject_id, academic_year_id, academic_term_id), total_marks)
+
+
+@receiver(post_save, sender=Exam)
+def update_aggregate_on_exam_save(sender, instance, created=False, raw=False, **kwargs):
+    # تغيير المادة أو العام أو الفصل أو الدرجة الكلية يؤثر على ملخصات جميع طلاب الاختبار
+    old_key, old_total_marks = instance._aggregate_origin
+    instance._aggregate_origin = (exam_key(instance), instance.total_marks)
+    if created or raw:
+        return
+    if old_key != exam_key(instance) or old_total_marks != instance.total_marks:
+        refresh_exam(instance, old_key=old_key)
+        # الإحصائيات نسب مئوية من الدرجة الكلية
+        bump_exam_stats({instance.pk})
@@ -0,0 +1,121 @@
+# grading/stats.py
+import numpy as np
+from django.core.cache import cache
+
+from classes.models import Section
+from Schoolo.cache import CacheVersion
+from .models import Grade
+
+STATS_CACHE_TIMEOUT = 60 * 60 * 24
+STATS_PERCENTILES = (10, 25, 50, 75, 90)
+STATS_HISTOGRAM_BINS = 10
+# علامة النجاح الافتراضية كنسبة مئوية، وهي نفس علامة الترفيع في progression/engine.py
+STATS_PASS_MARK = 50
+
+
+def stats_cache_key(exam_id, version):
+    return f'grading:exam_stats:{exam_id}:{version}'
+
+
+# نسخة علامات كل اختبار: رفعها يُهمل إحصائياته المخزنة
+exam_stats_versions = CacheVersion('grading:exam_stats_version')
+get_exam_stats_version = exam_stats_versions.get
+bump_exam_stats = exam_stats_versions.bump
+
+
+def _round(value):
+    return round(float(value), 2)
+
+
+def _summary(percentages):
+    """
+    ملخص مجموعة علامات (نسب مئوية من الدرجة الكلية) في مصفوفة NumPy واحدة.
+    """
+    if not percentages.size:
+        return {'count': 0, 'mean': None, 'median': None, 'std': None, 'min': None, 'max': None}
+    return {
+        'count': int(percentages.size),
+        'mean': _round(percentages.mean()),
+        'median': _round(np.median(percentages)),
+        'std': _round(percentages.std()),
+        'min': _round(percentages.min()),
+        'max': _round(percentages.max()),
+    }
+
+
+def _pass_rate(percentages, pass_mark):
+    if not percentages.size:
+        return None
+    return _round((percentages >= pass_mark).mean() * 100)
+
+
+def exam_percentages(exam):
+    """
+    علامات الاختبار باستعلام values_list واحد: (نسب مئوية من Exam.total_marks، شعبة كل علامة)
+    كمصفوفتي NumPy، حتى تُقارن الاختبارات ذات الدرجات الكلية المختلفة. 0 = طالب بلا شعبة.
+    """
+    rows = list(Grade.objects.filter(exam=exam).values_list('score', 'student__section_id'))
+    total_marks = float(exam.total_marks)
+    scores = np.fromiter((float(score) for score, _ in rows), dtype=float, count=len(rows))
+    section_ids = np.fromiter((section_id or 0 for _, section_id in rows), dtype=np.int64, count=len(rows))
+    percentages = scores / total_marks * 100 if total_marks > 0 else np.zeros_like(scores)
+    return percentages, section_ids
+
+
+def compute_exam_stats(exam, percentages, section_ids):
+    """
+    إحصائيات توزيع علامات اختبار لا تعتمد على علامة النجاح:
+    ملخص عام ونسب مئينية ومدرج تكراري ونفس الملخص لكل شعبة (الشعبة الحالية للطالب).
+    """
+    stats = {'exam_id': exam.pk, 'total_marks': float(exam.total_marks)}
+    stats.update(_summary(percentages))
+    if percentages.size:
+        values = np.percentile(percentages, STATS_PERCENTILES)
+        stats['percentiles'] = {f'p{q}': _round(value) for q, value in zip(STATS_PERCENTILES, values)}
+    else:
+        stats['percentiles'] = {f'p{q}': None for q in STATS_PERCENTILES}
+
+    counts, edges = np.histogram(np.clip(percentages, 0, 100), bins=STATS_HISTOGRAM_BINS, range=(0, 100))
+    stats['histogram'] = [
+        {'from': _round(edges[i]), 'to': _round(edges[i + 1]), 'count': int(count)}
+        for i, count in enumerate(counts)
+    ]
+
+    sections = {
+        row['id']: row for row in Section.objects.filter(
+            id__in=set(section_ids.tolist()) - {0},
+        ).values('id', 'name', 'class_obj__name')
+    }
+    stats['sections'] = []
+    for section_id in np.unique(section_ids).tolist():
+        section = sections.get(section_id, {})
+        item = {
+            'section_id': section_id or None,
+            'section_name': section.get('name'),
+            'class_name': section.get('class_obj__name'),
+        }
+        item.update(_summary(percentages[section_ids == section_id]))
+        stats['sections'].append(item)
+    return stats
+
+
+def get_exam_stats(exam, pass_mark):
+    """
+    يعيد إحصائيات الاختبار مع نسبة النجاح حسب pass_mark.
+    الكاش يحفظ الإحصائيات الثابتة مع مصفوفة النسب المئوية (مدخل واحد لكل نسخة من علامات الاختبار)،
+    ونسبة النجاح تُحسب منها في كل طلب حتى لا تنشئ كل قيمة pass_mark مدخلاً جديداً في الكاش.
+    """
+    key = stats_cache_key(exam.pk, get_exam_stats_version(exam.pk))
+    cached = cache.get(key)
+    if cached is None:
+        percentages, section_ids = exam_percentages(exam)
+        cached = (compute_exam_stats(exam, percentages, section_ids), percentages, section_ids)
+        cache.set(key, cached, STATS_CACHE_TIMEOUT)
+    stats, percentages, section_ids = cached
+
+    stats = dict(stats, pass_mark=pass_mark, pass_rate=_pass_rate(percentages, pass_mark))
+    stats['sections'] = [
+        dict(item, pass_rate=_pass_rate(percentages[section_ids == (item['section_id'] or 0)], pass_mark))
+        for item in stats['sections']
+    ]
+    return stats
@@ -1,3 +1,371 @@
+import datetime
+import importlib
+from decimal import Decimal
+from unittest import mock
+
+from django.apps import apps
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from academic.models import AcademicTerm, DayOfWeek, TimeSlot
+from accounts.models import User
+from classes.models import Class
+from schedules.models import ClassSchedule
+from Schoolo.testing import SchoolTestDataMixin
+from subject.models import Subject, TeacherSubject
+from teachers.models import Teacher
+from .aggregates import rebuild_all
+from .models import Exam, Grade, StudentSubjectAggregate
+from .timetable import ExamTimetableConflict, ExamTimetableGenerator, save_exam_timetable
+
+
+class GradeBulkRecordViewTests(SchoolTestDataMixin, TestCase):
+    """
+    قياس عدد الاستعلامات في إدخال العلامات المجمّع: يجب أن يبقى ثابتاً مهما كان حجم الشعبة.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.teacher_user = User.objects.create_teacher_user('0900000000', 'pass', is_active=True)
+        cls.teacher = Teacher.objects.create(user=cls.teacher_user)
+        cls.subject = Subject.objects.create(
+            class_obj=cls.class_obj, name='Math', academic_year=cls.year, academic_term=cls.term,
+        )
+        TeacherSubject.objects.create(teacher=cls.teacher, subject=cls.subject, weekly_hours=4)
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate(self.teacher_user)
+
+    def _make_section(self, name, students_count):
+        section = self.create_section(name)
+        exam = Exam.objects.create(
+            subject=self.subject, academic_year=self.year, academic_term=self.term,
+            exam_type='quiz', exam_date=datetime.date(2025, 10, 1 + Exam.objects.count()),
+            total_marks=Decimal('100'), teacher=self.teacher, target_section=section, is_conducted=True,
+        )
+        start = User.objects.count()
+        students = [self.create_student(i, section) for i in range(start, start + students_count)]
+        return section, exam, students
+
+    def _post(self, section, exam, grades):
+        url = reverse('add-section-grades', args=[exam.id, section.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'grades': grades}, format='json')
+        return response, len(queries)
+
+    def test_query_count_is_constant(self):
+        small_section, small_exam, small_students = self._make_section('1', 5)
+        large_section, large_exam, large_students = self._make_section('2', 40)
+
+        small_response, small_queries = self._post(
+            small_section, small_exam, [{'student_id': s.pk, 'score': 50} for s in small_students]
+        )
+        large_response, large_queries = self._post(
+            large_section, large_exam, [{'student_id': s.pk, 'score': 50} for s in large_students]
+        )
+
+        self.assertEqual(small_response.status_code, 201)
+        self.assertEqual(large_response.status_code, 201)
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(Grade.objects.filter(exam=large_exam).count(), 40)
+        self.assertEqual(
+            StudentSubjectAggregate.objects.filter(student__in=large_students).count(), 40
+        )
+
+    def test_updates_existing_grades_and_reports_row_errors(self):
+        section, exam, students = self._make_section('3', 3)
+        Grade.objects.create(student=students[0], exam=exam, score=10)
+
+        response, _ = self._post(section, exam, [
+            {'student_id': students[0].pk, 'score': 70},
+            {'student_id': students[1].pk, 'score': 150},
+            {'student_id': 999999, 'score': 20},
+            {'student_id': students[2].pk},
+            {'student_id': students[1].pk, 'score': 'NaN'},
+            {'student_id': students[1].pk, 'score': 'Infinity'},
+        ])
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(len(response.data['errors']), 5)
+        self.assertEqual(Grade.objects.get(student=students[0], exam=exam).score, Decimal('70'))
+        self.assertFalse(Grade.objects.filter(student=students[1], exam=exam).exists())
+
+
+class ExamGradeListQueryCountTests(SchoolTestDataMixin, TestCase):
+    """
+    عدد استعلامات قوائم الاختبارات والعلامات يجب أن يبقى ثابتاً مهما كان عدد السجلات.
+    """
+
+    def _add_exams(self, count):
+        start = User.objects.count()
+        for i in range(start, start + count):
+            teacher = Teacher.objects.create(user=User.objects.create_teacher_user(f'07{i:08d}', 'pass'))
+            subject = Subject.objects.create(
+                class_obj=self.class_obj, name=f'S{i}', academic_year=self.year, academic_term=self.term,
+            )
+            exam = Exam.objects.create(
+                subject=subject, academic_year=self.year, academic_term=self.term,
+                exam_type='quiz', exam_date=datetime.date(2025, 10, 1) + datetime.timedelta(days=i),
+                total_marks=Decimal('100'), teacher=teacher, target_section=self.section, is_conducted=True,
+            )
+            Grade.objects.create(student=self.create_student(i), exam=exam, score=50)
+
+    def test_query_count_is_constant(self):
+        for url_name in ['exam-list', 'grade-list']:
+            with self.subTest(url_name=url_name):
+                Grade.objects.all().delete()
+                Exam.objects.all().delete()
+                self.assertConstantListQueries(reverse(url_name), self._add_exams)
+
+
+class ExamStatsTests(SchoolTestDataMixin, TestCase):
+    """
+    إحصائيات الاختبار تُحسب من مصفوفة العلامات وتُخزن في الكاش حتى تتغيّر علامات الاختبار.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        subject = Subject.objects.create(
+            class_obj=cls.class_obj, name='Math', academic_year=cls.year, academic_term=cls.term,
+        )
+        cls.exam = Exam.objects.create(
+            subject=subject, academic_year=cls.year, academic_term=cls.term, exam_type='quiz',
+            exam_date=datetime.date(2025, 10, 1), total_marks=Decimal('20'), target_class=cls.class_obj,
+        )
+        cls.grades = [
+            Grade.objects.create(student=cls.create_student(i), exam=cls.exam, score=score)
+            for i, score in enumerate([4, 10, 12, 20])
+        ]
+
+    def _stats(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('exam-stats', args=[self.exam.pk]), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_stats_are_normalized_and_cached_until_grades_change(self):
+        stats, _ = self._stats()
+        self.assertEqual((stats['count'], stats['mean'], stats['median']), (4, 57.5, 55.0))
+        self.assertEqual((stats['min'], stats['max'], stats['pass_rate']), (20.0, 100.0, 75.0))
+        self.assertEqual(sum(bucket['count'] for bucket in stats['histogram']), 4)
+        self.assertEqual(stats['sections'][0]['count'], 4)
+
+        # من الكاش: استعلام الاختبار فقط
+        _, cached_queries = self._stats()
+        self.assertEqual(cached_queries, 1)
+
+        # نسبة النجاح تُحسب من النسب المخزنة لكل علامة نجاح دون مدخل كاش جديد
+        stats, cached_queries = self._stats(pass_mark=90)
+        self.assertEqual((stats['pass_rate'], cached_queries), (25.0, 1))
+
+        self.grades[0].score = 20
+        self.grades[0].save()
+        stats, _ = self._stats()
+        self.assertEqual(stats['min'], 50.0)
+
+
+class StudentSubjectAggregateTests(SchoolTestDataMixin, TestCase):
+    """
+    جدول الملخص يبقى مطابقاً لإعادة الحساب من جدول العلامات بعد كل تعديل على العلامات أو الاختبارات،
+    وإعادة البناء الكاملة وترحيل البيانات ينتجان نفس النتيجة.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.term2 = AcademicTerm.objects.create(
+            academic_year=cls.year, name='T2', start_date=datetime.date(2026, 2, 1),
+            end_date=datetime.date(2026, 6, 30), is_current=False,
+        )
+        cls.math, cls.science = [
+            Subject.objects.create(class_obj=cls.class_obj, name=name, academic_year=cls.year, academic_term=cls.term)
+            for name in ['Math', 'Science']
+        ]
+        cls.students = [cls.create_student(i) for i in range(3)]
+
+    def _exam(self, subject, day, total_marks=100, term=None):
+        return Exam.objects.create(
+            subject=subject, academic_year=self.year, academic_term=term or self.term, exam_type='quiz',
+            exam_date=datetime.date(2025, 10, day), total_marks=Decimal(total_marks), target_class=self.class_obj,
+        )
+
+    def _grade_all(self, exam, scores):
+        return [Grade.objects.create(student=student, exam=exam, score=score) for student, score in zip(self.students, scores)]
+
+    def assertAggregatesMatchGrades(self):
+        expected = {}
+        for grade in Grade.objects.select_related('exam'):
+            exam = grade.exam
+            key = (grade.student_id, exam.subject_id, exam.academic_year_id, exam.academic_term_id)
+            score, marks, count = expected.get(key, (0, 0, 0))
+            expected[key] = (score + grade.score, marks + exam.total_marks, count + 1)
+        actual = {
+            (row.student_id, row.subject_id, row.academic_year_id, row.academic_term_id):
+                (row.total_score, row.total_marks, row.grades_count)
+            for row in StudentSubjectAggregate.objects.all()
+        }
+        self.assertEqual(actual, expected)
+
+    def test_grade_save_and_delete(self):
+        quiz = self._exam(self.math, 1)
+        final = self._exam(self.math, 2, total_marks=50)
+        science = self._exam(self.science, 3)
+        grades = self._grade_all(quiz, [40, 60, 80])
+        self._grade_all(final, [20, 30, 45])
+        self.assertAggregatesMatchGrades()
+
+        grades[0].score = 90
+        grades[0].save()
+        self.assertAggregatesMatchGrades()
+
+        # نقل العلامة إلى اختبار مادة أخرى يحدّث الملخص القديم والجديد
+        grades[1].exam = science
+        grades[1].save()
+        self.assertAggregatesMatchGrades()
+
+        grades[1].delete()
+        grades[2].delete()
+        self.assertAggregatesMatchGrades()
+        self.assertFalse(StudentSubjectAggregate.objects.filter(subject=self.science).exists())
+
+    def test_exam_subject_term_and_total_marks_changes(self):
+        exam = self._exam(self.math, 1)
+        self._grade_all(exam, [40, 60, 80])
+        self._grade_all(self._exam(self.math, 2), [10, 20, 30])
+        self.assertAggregatesMatchGrades()
+
+        exam.subject = self.science
+        exam.save()
+        self.assertAggregatesMatchGrades()
+
+        exam.academic_term = self.term2
+        exam.save()
+        self.assertAggregatesMatchGrades()
+
+        exam.total_marks = Decimal('80')
+        exam.save()
+        self.assertAggregatesMatchGrades()
+
+    def _corrupt_aggregates(self):
+        StudentSubjectAggregate.objects.filter(student=self.students[0]).update(total_score=0, grades_count=7)
+        StudentSubjectAggregate.objects.filter(student=self.students[1]).delete()
+
+    def test_rebuild_all_and_data_migration_match_grades(self):
+        self._grade_all(self._exam(self.math, 1), [40, 60, 80])
+        self._grade_all(self._exam(self.math, 2, term=self.term2), [15, 25, 35])
+        self._grade_all(self._exam(self.science, 3), [50, 70, 90])
+
+        self._corrupt_aggregates()
+        self.assertEqual(rebuild_all(batch_size=2), 9)
+        self.assertAggregatesMatchGrades()
+
+        # ترحيل البيانات الأولي يملأ الجدول الفارغ من العلامات الموجودة
+        migration = importlib.import_module('grading.migrations.0005_studentsubjectaggregate')
+        StudentSubjectAggregate.objects.all().delete()
+        migration.populate_aggregates(apps, None)
+        self.assertAggregatesMatchGrades()
+
+
+class ExamTimetableTests(SchoolTestDataMixin, TestCase):
+    """
+    جدول الاختبارات المولّد: اختبار واحد للصف في اليوم، ولا اختباران لنفس المعلم في يوم،
+    وحد أقصى لعدد الاختبارات في اليوم، وتخطي الاختبارات الموجودة، ورفض الحفظ إذا تعارض مع اختبارات أحدث.
+    """
+
+    # من الاثنين إلى الجمعة، وكلها أيام دراسية
+    START, END = datetime.date(2026, 1, 5), datetime.date(2026, 1, 9)
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.class_b = Class.objects.create(name='C2')
+        cls.section_b = cls.create_section('A', cls.class_b)
+        cls.teacher = Teacher.objects.create(user=User.objects.create_teacher_user('0944444444'))
+        slot = TimeSlot.objects.create(slot_number=1, name='P1', start_time=datetime.time(8), end_time=datetime.time(9))
+        cls.subjects = {}
+        for class_obj, section in [(cls.class_obj, cls.section), (cls.class_b, cls.section_b)]:
+            for name in ['Math', 'Science']:
+                subject = Subject.objects.create(
+                    class_obj=class_obj, name=name, academic_year=cls.year, academic_term=cls.term,
+                )
+                cls.subjects[(class_obj.pk, name)] = subject
+        # المعلم نفسه يدرس الرياضيات في الصفين
+        for section, class_obj in [(cls.section, cls.class_obj), (cls.section_b, cls.class_b)]:
+            math = cls.subjects[(class_obj.pk, 'Math')]
+            TeacherSubject.objects.create(teacher=cls.teacher, subject=math, weekly_hours=4)
+            ClassSchedule.objects.create(
+                subject=math, section=section, teacher=cls.teacher, academic_year=cls.year,
+                academic_term=cls.term, day_of_week=DayOfWeek.objects.get(pk=1), time_slot=slot,
+            )
+
+    def _generate(self, end=None, **kwargs):
+        return ExamTimetableGenerator(self.year, self.term, 'final', self.START, end or self.END, **kwargs).generate()
+
+    def test_class_and_teacher_exams_fall_on_different_days(self):
+        result = self._generate()
+        self.assertEqual((len(result.exams), result.unplaced), (4, []))
+        class_days = [(exam.target_class_id, exam.exam_date) for exam in result.exams]
+        self.assertEqual(len(set(class_days)), 4)
+        teacher_days = [exam.exam_date for exam in result.exams if exam.teacher_id == self.teacher.pk]
+        self.assertEqual(len(teacher_days), 2)
+        self.assertNotEqual(teacher_days[0], teacher_days[1])
+
+        # حتى بيومين فقط يبقى اختبارا المعلم في يومين مختلفين
+        result = self._generate(end=datetime.date(2026, 1, 6))
+        self.assertEqual((len(result.exams), result.unplaced), (4, []))
+        teacher_days = {exam.exam_date for exam in result.exams if exam.teacher_id == self.teacher.pk}
+        self.assertEqual(len(teacher_days), 2)
+
+    def test_max_per_day_leaves_extra_exams_unplaced(self):
+        result = self._generate(max_per_day=1)
+        self.assertEqual(len(result.exams), 4)
+        self.assertEqual(set(result.dates.values()), {1})
+
+        result = self._generate(end=datetime.date(2026, 1, 7), max_per_day=1)
+        self.assertEqual(len(result.exams), 3)
+        self.assertEqual([item['reason'] for item in result.unplaced], ['no_free_date'])
+
+    def test_existing_exams_are_skipped_and_block_their_day(self):
+        science = self.subjects[(self.class_obj.pk, 'Science')]
+        Exam.objects.create(
+            subject=science, academic_year=self.year, academic_term=self.term, exam_type='final',
+            exam_date=self.START, total_marks=Decimal('100'), target_class=self.class_obj,
+        )
+        result = self._generate()
+        self.assertEqual(len(result.exams), 3)
+        self.assertNotIn(science.pk, {exam.subject_id for exam in result.exams})
+        self.assertNotIn(
+            (self.class_obj.pk, self.START), {(exam.target_class_id, exam.exam_date) for exam in result.exams},
+        )
+
+    def test_conflicting_exam_created_after_generation_is_rejected(self):
+        generate = ExamTimetableGenerator.generate
+
+        def generate_then_create(generator):
+            # إنشاء يدوي بين التوليد والحفظ في نفس يوم أحد الاختبارات المولّدة لصفه
+            result = generate(generator)
+            exam = result.exams[0]
+            Exam.objects.create(
+                subject=exam.subject, academic_year=self.year, academic_term=self.term, exam_type='midterm',
+                exam_date=exam.exam_date, total_marks=Decimal('100'), target_class_id=exam.target_class_id,
+            )
+            return result
+
+        with mock.patch.object(ExamTimetableGenerator, 'generate', generate_then_create):
+            response = self.client.post(reverse('exam-generate'), {
+                'exam_type': 'final', 'start_date': self.START.isoformat(), 'end_date': self.END.isoformat(),
+            }, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Exam.objects.filter(exam_type='final').exists())
 
-# Create your tests here.
+    def test_overlapping_generations_save_once(self):
+        first, second = self._generate(), self._generate()
+        self.assertEqual(len(save_exam_timetable(first)), 4)
+        with self.assertRaises(ExamTimetableConflict):
+            save_exam_timetable(second)
+        self.assertEqual(Exam.objects.count(), 4)
@@ -0,0 +1,249 @@
+# grading/timetable.py
+import datetime
+from collections import defaultdict, namedtuple
+
+from django.db import IntegrityError, models, transaction
+
+from academic.models import AcademicTerm, DayOfWeek
+from classes.models import Section
+from schedules.models import ClassSchedule
+from subject.models import Subject
+
+from .calendar import ExamCalendar
+from .models import Exam
+
+
+ExamTimetableResult = namedtuple('ExamTimetableResult', 'exams unplaced dates')
+
+
+class ExamTimetableConflict(Exception):
+    """
+    الجدول المولّد لم يعد صالحاً عند الحفظ: أُنشئت اختبارات متعارضة معه بعد التوليد
+    (طلب توليد آخر في نفس الوقت أو إنشاء يدوي).
+    """
+
+
+class _Paper:
+    """
+    اختبار واحد مطلوب جدولته: مادة لصف كامل (أو لمسار منه) أو لشعبة، مع معلميها في جدول الفصل.
+    """
+    __slots__ = ('exam', 'class_id', 'teacher_ids', 'neighbours', 'blocked', 'date')
+
+    def __init__(self, exam, class_id, teacher_ids):
+        self.exam = exam
+        self.class_id = class_id
+        self.teacher_ids = teacher_ids
+        self.neighbours = set()
+        self.blocked = set()
+        self.date = None
+
+
+class ExamTimetableGenerator:
+    """
+    مولّد جدول الاختبارات (نصفي/نهائي) لكل صفوف الفصل الحالي ضمن نافذة تواريخ.
+    كل مادة نشطة في الفصل = اختبار، وكل تاريخ دراسي في النافذة = لون، ويتصل اختباران إذا اشتركا في صف
+    (قاعدة Exam.clean: اختبار واحد للصف في اليوم) أو في معلم (اختياري، حتى لا يُكلّف المعلم باختبارين في يوم).
+    الحل بتلوين الرسم بطريقة DSatur: في كل خطوة الاختبار الأقل تواريخ متاحة ثم الأكثر جيراناً،
+    ويوضع في التاريخ الأبعد عن اختبارات صفه ثم الأقل ازدحاماً، مع حد أقصى لعدد الاختبارات في اليوم.
+    التواريخ المشغولة باختبارات موجودة تُقرأ من ExamCalendar، والاختبار الذي لا يجد تاريخاً يُسجّل كناقص.
+    """
+
+    def __init__(self, academic_year, academic_term, exam_type, start_date, end_date,
+                 max_per_day=None, total_marks=100, class_ids=None, separate_teachers=True):
+        self.academic_year = academic_year
+        self.academic_term = academic_term
+        self.exam_type = exam_type
+        self.start_date = start_date
+        self.end_date = end_date
+        self.max_per_day = max_per_day
+        self.total_marks = total_marks
+        self.class_ids = class_ids
+        self.separate_teachers = separate_teachers
+
+    def _school_dates(self):
+        # معرفات DayOfWeek تطابق isoweekday (الاثنين=1 ... الأحد=7)
+        school_days = set(DayOfWeek.objects.filter(is_school_day=True).values_list('id', flat=True))
+        dates, day = [], self.start_date
+        while day <= self.end_date:
+            if day.isoweekday() in school_days:
+                dates.append(day)
+            day += datetime.timedelta(days=1)
+        return dates
+
+    def _load(self):
+        self.dates = self._school_dates()
+
+        sections = Section.objects.filter(academic_year=self.academic_year, is_active=True)
+        if self.class_ids is not None:
+            sections = sections.filter(class_obj_id__in=self.class_ids)
+        section_classes = dict(sections.values_list('id', 'class_obj_id'))
+        class_ids = set(section_classes.values())
+
+        subjects = Subject.objects.filter(
+            models.Q(class_obj_id__in=class_ids, section__isnull=True) |
+            models.Q(section_id__in=section_classes),
+            academic_term=self.academic_term, is_active=True,
+        ).order_by('id').values_list('id', 'class_obj_id', 'section_id', 'stream_type')
+
+        # الاختبارات من نفس النوع المنشأة مسبقاً لا تُجدول مرة أخرى
+        existing = set(Exam.objects.filter(
+            academic_year=self.academic_year, academic_term=self.academic_term, exam_type=self.exam_type,
+        ).values_list('subject_id', 'target_class_id', 'target_section_id', 'stream_type'))
+
+        class_teachers, section_teachers = defaultdict(set), defaultdict(set)
+        for subject_id, section_id, class_id, teacher_id in ClassSchedule.objects.filter(
+            academic_year=self.academic_year, academic_term=self.academic_term,
+            section_id__in=section_classes, teacher__isnull=False,
+        ).values_list('subject_id', 'section_id', 'section__class_obj_id', 'teacher_id').distinct():
+            class_teachers[(subject_id, class_id)].add(teacher_id)
+            section_teachers[(subject_id, section_id)].add(teacher_id)
+
+        self.calendar = ExamCalendar.load(
+            self.academic_year.id, self.academic_term.id, class_ids=class_ids,
+            teacher_ids={t for teachers in class_teachers.values() for t in teachers},
+        )
+
+        self.papers, self.unplaced = [], []
+        for subject_id, class_id, section_id, stream_type in subjects:
+            if section_id is not None:
+                class_id = section_classes[section_id]
+                teachers = section_teachers[(subject_id, section_id)]
+                target = (None, section_id, None)
+            else:
+                teachers = class_teachers[(subject_id, class_id)]
+                # مادة المسار العام تستهدف الصف كله
+                target = (class_id, None, stream_type if stream_type != 'General' else None)
+            if (subject_id,) + target in existing:
+                continue
+            exam = Exam(
+                subject_id=subject_id,
+                academic_year=self.academic_year,
+                academic_term=self.academic_term,
+                exam_type=self.exam_type,
+                total_marks=self.total_marks,
+                target_class_id=target[0],
+                target_section_id=target[1],
+                stream_type=target[2],
+                # المعلم المسؤول يُحدد فقط إذا كان معلم المادة الوحيد في الصف أو الشعبة
+                teacher_id=next(iter(teachers)) if len(teachers) == 1 else None,
+            )
+            errors = self.calendar.validate(exam)
+            if errors:
+                self.unplaced.append({
+                    'subject_id': subject_id, 'target_class_id': target[0], 'target_section_id': target[1],
+                    'reason': 'invalid', 'errors': [str(error) for error in errors],
+                })
+                continue
+            paper = _Paper(exam, class_id, teachers)
+            paper.blocked = {
+                index for index, date in enumerate(self.dates) if self.calendar.is_busy(date, class_id)
+            }
+            self.papers.append(paper)
+
+        # الجيران: كل اختبارات الصف نفسه، وكل اختبارات المعلم نفسه
+        groups = defaultdict(list)
+        for paper in self.papers:
+            groups[('class', paper.class_id)].append(paper)
+            if self.separate_teachers:
+                for teacher_id in paper.teacher_ids:
+                    groups[('teacher', teacher_id)].append(paper)
+        for members in groups.values():
+            for paper in members:
+                paper.neighbours.update(other for other in members if other is not paper)
+
+    def _available(self, paper, loads):
+        return [
+            index for index in range(len(self.dates))
+            if index not in paper.blocked and (self.max_per_day is None or loads[index] < self.max_per_day)
+        ]
+
+    def _select(self, pending, loads):
+        """
+        DSatur: الاختبار الأقل تواريخ متاحة، وعند التساوي الأكثر جيراناً غير مجدولين.
+        """
+        best, best_key, best_available = None, None, None
+        for paper in pending:
+            available = self._available(paper, loads)
+            key = (len(available), -sum(1 for other in paper.neighbours if other.date is None))
+            if best is None or key < best_key:
+                best, best_key, best_available = paper, key, available
+                if not available:
+                    break
+        return best, best_available
+
+    def _choose(self, paper, available, class_dates, loads):
+        """
+        التاريخ الأبعد عن باقي اختبارات الصف (راحة للطلاب بين الاختبارات)، ثم الأقل ازدحاماً، ثم الأبكر.
+        """
+        taken = class_dates[paper.class_id]
+
+        def key(index):
+            gap = min((abs(index - other) for other in taken), default=len(self.dates))
+            return (-min(gap, 2), loads[index], index)
+
+        return min(available, key=key)
+
+    def generate(self):
+        self._load()
+        loads = [0] * len(self.dates)
+        class_dates = defaultdict(list)
+        pending = list(self.papers)
+        scheduled = []
+
+        while pending:
+            paper, available = self._select(pending, loads)
+            pending.remove(paper)
+            if not available:
+                exam = paper.exam
+                self.unplaced.append({
+                    'subject_id': exam.subject_id, 'target_class_id': exam.target_class_id,
+                    'target_section_id': exam.target_section_id, 'reason': 'no_free_date',
+                })
+                continue
+            index = self._choose(paper, available, class_dates, loads)
+            paper.date = index
+            paper.exam.exam_date = self.dates[index]
+            loads[index] += 1
+            class_dates[paper.class_id].append(index)
+            for other in paper.neighbours:
+                other.blocked.add(index)
+            self.calendar.add(paper.exam)
+            scheduled.append(paper.exam)
+
+        scheduled.sort(key=lambda exam: (exam.exam_date, exam.subject_id))
+        dates = {self.dates[index]: load for index, load in enumerate(loads) if load}
+        return ExamTimetableResult(scheduled, self.unplaced, dates)
+
+
+def save_exam_timetable(result):
+    """
+    يحفظ الاختبارات المولّدة بعملية bulk_create واحدة.
+    داخل المعاملة يُقفل صف الفصل الدراسي حتى لا يُحفظ جدولان مولّدان في نفس الوقت، ثم يُعاد فحص الاختبارات
+    مقابل الموجود الآن: نفس المادة والهدف ونوع الاختبار، أو اختبار آخر للصف في نفس اليوم.
+    أي تعارض (أو خطأ تفرد من قاعدة البيانات) يرفع ExamTimetableConflict دون حفظ أي اختبار.
+    """
+    if not result.exams:
+        return []
+    first = result.exams[0]
+    section_ids = {exam.target_section_id for exam in result.exams} - {None}
+    try:
+        with transaction.atomic():
+            AcademicTerm.objects.select_for_update().filter(pk=first.academic_term_id).first()
+            class_ids = {exam.target_class_id for exam in result.exams} | set(
+                Section.objects.filter(pk__in=section_ids).values_list('class_obj_id', flat=True)
+            )
+            calendar = ExamCalendar.load(first.academic_year_id, first.academic_term_id, class_ids=class_ids)
+            existing = set(Exam.objects.filter(
+                academic_year_id=first.academic_year_id, academic_term_id=first.academic_term_id,
+                exam_type__in={exam.exam_type for exam in result.exams},
+            ).values_list('subject_id', 'exam_type', 'target_class_id', 'target_section_id', 'stream_type'))
+            for exam in result.exams:
+                key = (exam.subject_id, exam.exam_type, exam.target_class_id, exam.target_section_id, exam.stream_type)
+                if key in existing or calendar.conflicts(exam):
+                    raise ExamTimetableConflict(
+                        f"Exam for subject {exam.subject_id} on {exam.exam_date} conflicts with an existing exam."
+                    )
+                calendar.add(exam)
+            return Exam.objects.bulk_create(result.exams, batch_size=1000)
+    except IntegrityError as e:
+        raise ExamTimetableConflict(str(e)) from e
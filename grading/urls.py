@@ -15,4 +15,6 @@ urlpatterns = [
 	path('grades/add_section_grades/<int:exam_id>/<int:section_id>/', GradeBulkRecordView.as_view(), name='add-section-grades'),
 	path('grades/averages/subject/', SubjectAverageView.as_view(), name='subject-average'),
 	path('grades/averages/overall/', OverallAverageView.as_view(), name='overall-average'),
+	path('grades/averages/rankings/', StudentRankingView.as_view(), name='student-rankings'),
+	path('grades/averages/leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
 ]
\ No newline at end of file
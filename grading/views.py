@@ -8,12 +8,24 @@ from rest_framework import permissions # يجب استيراد permissions
 from django.utils.translation import gettext_lazy as _
 from accounts.permissions import *
 from grading.grade_calculator import GradeCalculator
+from grading.calendar import ExamCalendar
+from grading.timetable import ExamTimetableConflict, ExamTimetableGenerator, save_exam_timetable
+from grading.aggregates import exam_key, refresh_aggregates
+from grading.stats import STATS_PASS_MARK, bump_exam_stats, get_exam_stats
+from grading.rankings import get_term_rankings
+from Schoolo.bulk import bulk_upsert
+from Schoolo.mixins import SerializerQueryProfileMixin
+from schedules.scope import TeacherScope, get_teacher_scope
+from decimal import Decimal, InvalidOperation
 from .serializers import *
 from .models import *
+from academic.context import get_current_year, get_current_term
 from accounts.models import User 
 from teachers.models import Teacher
 from students.models import Student 
-from classes.models import Section 
+from classes.models import Class, Section 
+from subject.models import Subject
+import datetime
 from accounts.permissions import CustomPermission
 from rest_framework.decorators import action
 from django.utils import timezone
@@ -22,7 +34,8 @@ from django.db import transaction
 from academic.models import AcademicYear, AcademicTerm
 
 
-class ExamViewSet(viewsets.ModelViewSet):
+class ExamViewSet(SerializerQueryProfileMixin, viewsets.ModelViewSet):
+    cursor_ordering = ('-exam_date', 'id')
     serializer_class = ExamSerializer
     permission_classes = [CustomPermission]
     queryset = Exam.objects.all() 
@@ -35,42 +48,36 @@ class ExamViewSet(viewsets.ModelViewSet):
             queryset = Exam.objects.all()
         elif user.is_teacher():
             try:
-                teacher = user.teacher_profile
-                
-                # جلب معرفات الشعب، والصفوف، والمواد، وأنواع التخصصات التي يدرسها المعلم
-                taught_schedules = teacher.teaching_schedules.filter(
-                    academic_year__is_current=True,
-                    academic_term__is_current=True
+                # الشعب والصفوف والمواد والتخصصات التي يدرسها المعلم في الفصل الحالي (من الكاش)
+                scope = get_teacher_scope(user.pk)
+            except (AcademicYear.DoesNotExist, AcademicTerm.DoesNotExist):
+                scope = TeacherScope(user.pk, None)
+            taught_section_ids = scope.section_ids
+            taught_class_ids = scope.class_ids
+            taught_subject_ids = scope.subject_ids
+            taught_stream_types = scope.stream_types
+
+            # فلترة الامتحانات لتظهر للمعلم ما يخصه
+            queryset = Exam.objects.filter(
+                # الحالة الأولى: الامتحان مخصص لشعبة محددة يدرسها المعلم
+                Q(target_section__id__in=taught_section_ids) |
+
+                # الحالة الثانية: الامتحان مخصص لصف يدرسه المعلم (وليس لتخصص محدد داخل الصف)
+                (
+                    Q(target_class__id__in=taught_class_ids) &
+                    Q(target_section__isnull=True) &
+                    Q(stream_type__isnull=True) &
+                    Q(subject__id__in=taught_subject_ids)
+                ) |
+
+                # الحالة الثالثة (الجديدة): الامتحان مخصص لصف وتخصص محدد يدرسه المعلم
+                (
+                    Q(target_class__id__in=taught_class_ids) &
+                    Q(target_section__isnull=True) &
+                    Q(stream_type__in=taught_stream_types) &
+                    Q(subject__id__in=taught_subject_ids)
                 )
-                taught_section_ids = taught_schedules.values_list('section__id', flat=True).distinct()
-                taught_class_ids = taught_schedules.values_list('section__class_obj__id', flat=True).distinct()
-                taught_subject_ids = taught_schedules.values_list('subject__id', flat=True).distinct()
-                taught_stream_types = taught_schedules.values_list('section__stream_type', flat=True).distinct()
-                
-                # فلترة الامتحانات لتظهر للمعلم ما يخصه
-                queryset = Exam.objects.filter(
-                    # الحالة الأولى: الامتحان مخصص لشعبة محددة يدرسها المعلم
-                    Q(target_section__id__in=taught_section_ids) |
-                    
-                    # الحالة الثانية: الامتحان مخصص لصف يدرسه المعلم (وليس لتخصص محدد داخل الصف)
-                    (
-                        Q(target_class__id__in=taught_class_ids) & 
-                        Q(target_section__isnull=True) & 
-                        Q(stream_type__isnull=True) &
-                        Q(subject__id__in=taught_subject_ids) 
-                    ) |
-                    
-                    # الحالة الثالثة (الجديدة): الامتحان مخصص لصف وتخصص محدد يدرسه المعلم
-                    (
-                        Q(target_class__id__in=taught_class_ids) & 
-                        Q(target_section__isnull=True) & 
-                        Q(stream_type__in=taught_stream_types) &
-                        Q(subject__id__in=taught_subject_ids)
-                    )
-                ).distinct()
-                
-            except Teacher.DoesNotExist:
-                queryset = Exam.objects.none()
+            )
         elif user.is_student():
             try:
                 student = user.student
@@ -143,8 +150,8 @@ class ExamViewSet(viewsets.ModelViewSet):
 
         # ضبط العام والفصل الحاليين تلقائيًا عند إنشاء الامتحان
         try:
-            current_year = AcademicYear.objects.get(is_current=True)
-            current_term = AcademicTerm.objects.get(is_current=True, academic_year=current_year)
+            current_year = get_current_year()
+            current_term = get_current_term()
         except (AcademicYear.DoesNotExist, AcademicTerm.DoesNotExist):
             raise ValidationError({
                 "detail": _("لا يوجد عام أو فصل دراسي حالي. لا يمكن إنشاء الامتحان بدون تحديد عام وفصل حاليين.")
@@ -167,7 +174,195 @@ class ExamViewSet(viewsets.ModelViewSet):
 
         serializer.save()
 
-class ExamConductView(generics.RetrieveUpdateAPIView):
+    @action(detail=False, methods=['post'], url_path='bulk_create')
+    def bulk_create(self, request):
+        """
+        إنشاء خطة اختبارات للفصل الحالي دفعة واحدة.
+        Path: /api/exams/bulk_create/
+
+        Body مثال:
+        {
+            "exams": [
+                {"subject": 1, "exam_type": "final", "exam_date": "2026-01-10", "total_marks": 100, "target_class": 2},
+                {"subject": 2, "exam_type": "final", "exam_date": "2026-01-11", "total_marks": 100, "target_section": 5}
+            ]
+        }
+        تُفحص كل الاختبارات في الذاكرة عبر ExamCalendar (مقابل الموجود ومقابل بعضها)،
+        وأي خطأ يعني عدم إنشاء أي اختبار.
+        """
+        try:
+            current_year = get_current_year()
+            current_term = get_current_term()
+        except (AcademicYear.DoesNotExist, AcademicTerm.DoesNotExist):
+            raise ValidationError({
+                "detail": _("لا يوجد عام أو فصل دراسي حالي. لا يمكن إنشاء الامتحان بدون تحديد عام وفصل حاليين.")
+            })
+
+        exams = request.data.get('exams') or []
+        if not isinstance(exams, list) or len(exams) == 0:
+            return Response({"detail": "الرجاء إرسال قائمة 'exams' غير فارغة."}, status=status.HTTP_400_BAD_REQUEST)
+
+        exam_types = dict(Exam.EXAM_TYPE_CHOICES)
+        stream_types = dict(Exam.STREAM_TYPE_CHOICES)
+        items = []
+        for idx, item in enumerate(exams):
+            try:
+                items.append({
+                    'subject': int(item.get('subject')),
+                    'teacher': int(item['teacher']) if item.get('teacher') else None,
+                    'target_class': int(item['target_class']) if item.get('target_class') else None,
+                    'target_section': int(item['target_section']) if item.get('target_section') else None,
+                    'exam_date': datetime.date.fromisoformat(str(item.get('exam_date'))),
+                    'total_marks': Decimal(str(item.get('total_marks'))),
+                    'exam_type': item.get('exam_type'),
+                    'stream_type': item.get('stream_type') or None,
+                })
+            except (AttributeError, TypeError, ValueError, InvalidOperation):
+                return Response({"detail": f"السجل رقم {idx} يحتوي على قيم غير صحيحة."}, status=status.HTTP_400_BAD_REQUEST)
+            if request.user.is_teacher() and items[-1]['exam_type'] not in ('quiz', 'assignment'):
+                raise ValidationError({
+                    "detail": _("المعلمون مسموح لهم فقط بإنشاء اختبارات من نوع quiz أو assignment.")
+                })
+
+        # تحميل كل ما يلزم للتحقق دفعة واحدة بدلاً من استعلامات لكل اختبار
+        subjects = Subject.objects.in_bulk({item['subject'] for item in items})
+        teachers = Teacher.objects.in_bulk({item['teacher'] for item in items} - {None})
+        classes = Class.objects.in_bulk({item['target_class'] for item in items} - {None})
+        sections = Section.objects.in_bulk({item['target_section'] for item in items} - {None})
+        calendar = ExamCalendar.load(
+            current_year.id, current_term.id,
+            class_ids=set(classes) | {section.class_obj_id for section in sections.values()},
+            teacher_ids=teachers,
+        )
+
+        errors = []
+        new_objects = []
+        for idx, item in enumerate(items):
+            item_errors = {}
+            for field, lookup in (('subject', subjects), ('teacher', teachers), ('target_class', classes), ('target_section', sections)):
+                if item[field] is not None and item[field] not in lookup:
+                    item_errors[field] = [f'Invalid pk "{item[field]}" - object does not exist.']
+            if item['exam_type'] not in exam_types:
+                item_errors['exam_type'] = [f'"{item["exam_type"]}" is not a valid choice.']
+            if item['stream_type'] is not None and item['stream_type'] not in stream_types:
+                item_errors['stream_type'] = [f'"{item["stream_type"]}" is not a valid choice.']
+            if not item_errors:
+                exam = Exam(
+                    subject=subjects[item['subject']],
+                    teacher=teachers.get(item['teacher']),
+                    target_class=classes.get(item['target_class']),
+                    target_section=sections.get(item['target_section']),
+                    academic_year=current_year,
+                    academic_term=current_term,
+                    exam_type=item['exam_type'],
+                    exam_date=item['exam_date'],
+                    total_marks=item['total_marks'],
+                    stream_type=item['stream_type'],
+                )
+                messages = calendar.validate(exam)
+                if messages:
+                    item_errors['non_field_errors'] = messages
+                else:
+                    calendar.add(exam)
+                    new_objects.append(exam)
+            if item_errors:
+                errors.append({"index": idx, "errors": item_errors})
+
+        if errors:
+            # أي خطأ -> لا يُنشأ أي اختبار
+            raise ValidationError({"detail": "فشل إنشاء بعض الاختبارات.", "errors": errors})
+
+        with transaction.atomic():
+            Exam.objects.bulk_create(new_objects)
+
+        # MySQL لا يعيد المعرفات من bulk_create، فتُقرأ الاختبارات المنشأة باستعلام واحد حسب مواصفاتها
+        specs = {ExamCalendar.spec(exam) for exam in new_objects}
+        created = [
+            exam for exam in Exam.objects.filter(
+                academic_year=current_year, academic_term=current_term,
+                subject_id__in=subjects, exam_date__in={item['exam_date'] for item in items},
+            ).select_related(*self.get_serializer_class().select_related_fields).order_by('exam_date', 'id')
+            if ExamCalendar.spec(exam) in specs
+        ]
+        return Response(self.get_serializer(created, many=True).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='generate')
+    def generate(self, request):
+        """
+        توليد جدول اختبارات نصفية أو نهائية لكل صفوف الفصل الحالي (أو لصفوف محددة) وحفظه دفعة واحدة.
+        Path: /api/exams/generate/
+
+        Body مثال:
+        {"exam_type": "final", "start_date": "2026-01-04", "end_date": "2026-01-22",
+         "max_per_day": 6, "total_marks": 100, "class_ids": [1, 2], "separate_teachers": true}
+        max_per_day و total_marks و class_ids و separate_teachers اختيارية.
+        """
+        try:
+            current_year = get_current_year()
+            current_term = get_current_term()
+        except (AcademicYear.DoesNotExist, AcademicTerm.DoesNotExist):
+            return Response({"detail": "لا يوجد عام أو فصل دراسي نشط حالياً."}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = request.data
+        exam_type = data.get('exam_type')
+        if exam_type not in ('midterm', 'final'):
+            return Response({"detail": "نوع الاختبار يجب أن يكون midterm أو final."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start_date = datetime.date.fromisoformat(str(data.get('start_date')))
+            end_date = datetime.date.fromisoformat(str(data.get('end_date')))
+            max_per_day = int(data['max_per_day']) if data.get('max_per_day') else None
+            total_marks = Decimal(str(data.get('total_marks', 100)))
+            class_ids = data.get('class_ids')
+            if class_ids is not None:
+                class_ids = [int(class_id) for class_id in class_ids]
+        except (TypeError, ValueError, InvalidOperation):
+            return Response({"detail": "قيم الطلب غير صحيحة."}, status=status.HTTP_400_BAD_REQUEST)
+        if start_date > end_date or start_date < current_term.start_date or end_date > current_term.end_date:
+            return Response({"detail": "نافذة التواريخ يجب أن تكون ضمن الفصل الدراسي الحالي."}, status=status.HTTP_400_BAD_REQUEST)
+        if max_per_day is not None and max_per_day < 1:
+            return Response({"detail": "max_per_day يجب أن يكون 1 على الأقل."}, status=status.HTTP_400_BAD_REQUEST)
+
+        generator = ExamTimetableGenerator(
+            current_year, current_term, exam_type, start_date, end_date,
+            max_per_day=max_per_day, total_marks=total_marks, class_ids=class_ids,
+            separate_teachers=data.get('separate_teachers', True) not in (False, 'false', '0'),
+        )
+        result = generator.generate()
+        try:
+            save_exam_timetable(result)
+        except ExamTimetableConflict:
+            return Response(
+                {"detail": "أُنشئت اختبارات متعارضة مع الجدول أثناء توليده. يرجى إعادة التوليد."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return Response({
+            "detail": "تم توليد جدول الاختبارات.",
+            "created_exams": len(result.exams),
+            "dates": {date.isoformat(): count for date, count in result.dates.items()},
+            "unplaced": result.unplaced,
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """
+        إحصائيات توزيع علامات الاختبار (للمعلمين والإدارة) مع تقسيم حسب الشعبة.
+        Path: /api/exams/<id>/stats/?pass_mark=50
+        كل القيم نسب مئوية من الدرجة الكلية للاختبار.
+        """
+        user = request.user
+        if not (user.is_superuser or user.is_admin() or user.is_teacher()):
+            raise PermissionDenied(_("لا تملك الصلاحية لعرض إحصائيات الاختبار."))
+        exam = self.get_object()
+        try:
+            pass_mark = Decimal(request.query_params.get('pass_mark', STATS_PASS_MARK))
+        except InvalidOperation:
+            return Response({"detail": _("قيمة pass_mark غير صحيحة.")}, status=status.HTTP_400_BAD_REQUEST)
+        if not pass_mark.is_finite() or not 0 <= pass_mark <= 100:
+            return Response({"detail": _("قيمة pass_mark يجب أن تكون بين 0 و 100.")}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_exam_stats(exam, float(pass_mark)))
+
+class ExamConductView(SerializerQueryProfileMixin, generics.RetrieveUpdateAPIView):
     queryset = Exam.objects.all()
     serializer_class = ExamSerializer
     permission_classes = [IsAdminOrSuperuser]
@@ -193,7 +388,8 @@ class ExamConductView(generics.RetrieveUpdateAPIView):
 
 
 
-class GradeViewSet(viewsets.ModelViewSet):
+class GradeViewSet(SerializerQueryProfileMixin, viewsets.ModelViewSet):
+    cursor_ordering = ('-created_at', '-id')
     serializer_class = GradeSerializer
     queryset = Grade.objects.all()
     permission_classes = [GradePermissions]
@@ -254,13 +450,8 @@ class GradeViewSet(viewsets.ModelViewSet):
         exam = serializer.validated_data['exam']
         student = serializer.validated_data['student']
 
-        is_teacher_for_this_student_and_subject = ClassSchedule.objects.filter(
-            teacher=teacher,
-            subject=exam.subject,
-            section=student.section,
-            academic_year=exam.academic_year,
-            academic_term=exam.academic_term
-        ).exists()
+        scope = get_teacher_scope(teacher.pk, exam.academic_term_id)
+        is_teacher_for_this_student_and_subject = scope.teaches(student.section_id, exam.subject_id)
 
         if not is_teacher_for_this_student_and_subject:
             raise PermissionDenied(_("لا يمكنك إضافة علامات لهذا الطالب. يجب أن تكون معلم المادة في شعبة هذا الطالب."))
@@ -345,7 +536,7 @@ class GradeBulkRecordView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        if exam.teacher != user.teacher_profile:
+        if exam.teacher_id != user.teacher_profile.pk:
             return Response(
                 {"error": "ليس لديك صلاحية لإضافة علامات لهذا الاختبار."},
                 status=status.HTTP_403_FORBIDDEN
@@ -358,10 +549,11 @@ class GradeBulkRecordView(APIView):
             )
         
         # تحقق من أن الاختبار يستهدف الشعبة بشكل مباشر أو غير مباشر (عن طريق الصف أو نوع التخصص)
+        # المقارنة بالمعرفات مباشرة حتى لا يتم تحميل الكائنات المرتبطة
         is_target_section_match = (
-            (exam.target_section and exam.target_section == section) or
-            (exam.target_section is None and exam.target_class and exam.target_class == section.class_obj and exam.stream_type is None) or
-            (exam.target_section is None and exam.target_class and exam.target_class == section.class_obj and exam.stream_type and exam.stream_type == section.stream_type)
+            (exam.target_section_id and exam.target_section_id == section.id) or
+            (exam.target_section_id is None and exam.target_class_id and exam.target_class_id == section.class_obj_id and exam.stream_type is None) or
+            (exam.target_section_id is None and exam.target_class_id and exam.target_class_id == section.class_obj_id and exam.stream_type and exam.stream_type == section.stream_type)
         )
 
         if not is_target_section_match:
@@ -377,45 +569,78 @@ class GradeBulkRecordView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # جلب شعب جميع الطلاب المطلوبين باستعلام واحد بدلاً من استعلام لكل سجل
+        requested_ids = set()
+        for grade_item in grades_data:
+            try:
+                requested_ids.add(int(grade_item.get('student_id')))
+            except (TypeError, ValueError):
+                pass
+        student_sections = dict(
+            Student.objects.filter(pk__in=requested_ids).values_list('pk', 'section_id')
+        )
+
         success_count = 0
         errors = []
+        graded_at = timezone.now()
+        grades_by_student = {}
 
+        for grade_item in grades_data:
+            student_id = grade_item.get('student_id')
+            score = grade_item.get('score')
+            
+            if student_id is None or score is None:
+                errors.append({"error": "يجب توفير معرف الطالب والدرجة لكل سجل.", "record": grade_item})
+                continue
+
+            try:
+                student_pk = int(student_id)
+            except (TypeError, ValueError):
+                student_pk = None
+            if student_pk not in student_sections:
+                errors.append({"error": f"الطالب بالمعرف {student_id} غير موجود.", "record": grade_item})
+                continue
+
+            if student_sections[student_pk] != section.id:
+                errors.append({"error": f"الطالب بالمعرف {student_id} لا ينتمي إلى هذه الشعبة.", "record": grade_item})
+                continue
+
+            try:
+                score_value = Decimal(str(score))
+            except InvalidOperation:
+                score_value = None
+            # Decimal يقبل NaN و Infinity، وهي ليست درجات صالحة
+            if score_value is None or not score_value.is_finite():
+                errors.append({"error": f"الدرجة ({score}) غير صالحة.", "record": grade_item})
+                continue
+
+            if score_value > exam.total_marks:
+                errors.append({"error": f"درجة الطالب ({score}) لا يمكن أن تتجاوز الدرجة الكلية ({exam.total_marks}).", "record": grade_item})
+                continue
+            if score_value < 0:
+                errors.append({"error": f"درجة الطالب ({score}) لا يمكن أن تكون سالبة.", "record": grade_item})
+                continue
+
+            # في حال تكرار الطالب في الطلب تُعتمد آخر درجة كما في الحفظ المتتالي
+            grades_by_student[student_pk] = Grade(
+                student_id=student_pk,
+                exam=exam,
+                score=score_value,
+                graded_at=graded_at,
+            )
+            success_count += 1
+
+        # حفظ جميع العلامات باستعلام upsert واحد ثم تحديث ملخصات العلامات مرة واحدة
         with transaction.atomic():
-            for grade_item in grades_data:
-                student_id = grade_item.get('student_id')
-                score = grade_item.get('score')
-                
-                if student_id is None or score is None:
-                    errors.append({"error": "يجب توفير معرف الطالب والدرجة لكل سجل.", "record": grade_item})
-                    continue
-
-                try:
-                    student_obj = Student.objects.get(pk=student_id)
-                    
-                    if student_obj.section != section:
-                        errors.append({"error": f"الطالب بالمعرف {student_id} لا ينتمي إلى هذه الشعبة.", "record": grade_item})
-                        continue
-
-                    if score > exam.total_marks:
-                        errors.append({"error": f"درجة الطالب ({score}) لا يمكن أن تتجاوز الدرجة الكلية ({exam.total_marks}).", "record": grade_item})
-                        continue
-                    if score < 0:
-                        errors.append({"error": f"درجة الطالب ({score}) لا يمكن أن تكون سالبة.", "record": grade_item})
-                        continue
-
-                    grade_record, created = Grade.objects.update_or_create(
-                        student=student_obj,
-                        exam=exam,
-                        defaults={
-                            'score': score,
-                            'graded_at': timezone.now()
-                        }
-                    )
-                    success_count += 1
-                except Student.DoesNotExist:
-                    errors.append({"error": f"الطالب بالمعرف {student_id} غير موجود.", "record": grade_item})
-                except Exception as e:
-                    errors.append({"error": str(e), "record": grade_item})
+            bulk_upsert(
+                Grade,
+                list(grades_by_student.values()),
+                unique_fields=['student', 'exam'],
+                update_fields=['score', 'graded_at', 'updated_at'],
+            )
+            refresh_aggregates(grades_by_student.keys(), *exam_key(exam))
+            # bulk_upsert لا يرسل signals، فتُهمل إحصائيات الاختبار هنا
+            bump_exam_stats({exam.pk})
 
         if errors:
             return Response({
@@ -452,8 +677,8 @@ class SubjectAverageView(APIView):
 
         if not academic_year_id and not academic_term_id:
             try:
-                current_year = AcademicYear.objects.get(is_current=True)
-                current_term = AcademicTerm.objects.get(is_current=True, academic_year=current_year)
+                current_year = get_current_year()
+                current_term = get_current_term()
             except (AcademicYear.DoesNotExist, AcademicTerm.DoesNotExist):
                 return Response({"detail": _("لا يوجد عام أو فصل دراسي حالي.")}, status=status.HTTP_400_BAD_REQUEST)
             academic_year_id = current_year.pk
@@ -501,8 +726,8 @@ class OverallAverageView(APIView):
         # المنطق الافتراضي كما في SubjectAverageView
         if not academic_year_id and not academic_term_id:
             try:
-                current_year = AcademicYear.objects.get(is_current=True)
-                current_term = AcademicTerm.objects.get(is_current=True, academic_year=current_year)
+                current_year = get_current_year()
+                current_term = get_current_term()
             except (AcademicYear.DoesNotExist, AcademicTerm.DoesNotExist):
                 return Response({"detail": _("لا يوجد عام أو فصل دراسي حالي.")}, status=status.HTTP_400_BAD_REQUEST)
             academic_year_id = current_year.pk
@@ -533,12 +758,90 @@ class OverallAverageView(APIView):
             academic_term_id=academic_term_id,
         )
         return Response({"overall_average": avg})
-    
 
-import pandas as pd
-import io
-import xlsxwriter
-from django.http import HttpResponse
+
+class RankingBaseView(APIView):
+    """
+    أساس عرض ترتيب الطلاب: يقرأ ترتيب الفصل الدراسي الحالي كاملاً من الكاش (انظر grading/rankings.py)،
+    ويحصر المعلم في الصفوف التي يدرّسها في ذلك الفصل.
+    الترتيب مقسّم على الشعبة الحالية للطالب، لذلك لا يُعرض لفصول سابقة انتقل بعدها الطلاب إلى شعب أخرى.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_term_id(self):
+        try:
+            academic_term_id = get_current_term().pk
+        except AcademicTerm.DoesNotExist:
+            raise ValidationError({"detail": _("لا يوجد عام أو فصل دراسي حالي.")})
+        requested = self.request.query_params.get('academic_term_id')
+        if requested and requested != str(academic_term_id):
+            raise ValidationError({"detail": _("ترتيب الطلاب متاح للفصل الدراسي الحالي فقط.")})
+        return academic_term_id
+
+    def get_rankings(self):
+        user = self.request.user
+        if not (user.is_superuser or user.is_admin() or user.is_teacher()):
+            raise PermissionDenied(_("لا تملك الصلاحية لعرض ترتيب الطلاب."))
+        academic_term_id = self.get_term_id()
+        rankings = get_term_rankings(academic_term_id)
+        if not (user.is_superuser or user.is_admin()):
+            class_ids = get_teacher_scope(user.pk, academic_term_id).class_ids
+            rankings = [row for row in rankings if row['class_id'] in class_ids]
+        return academic_term_id, rankings
+
+
+class StudentRankingView(RankingBaseView):
+    """
+    ترتيب طلاب شعبة أو صف كامل حسب المعدل العام في الفصل الدراسي الحالي، مع الترتيب والنسبة المئينية داخل الشعبة والصف.
+    Path: /api/grades/averages/rankings/?section_id=<id> أو ?class_id=<id>
+    """
+
+    def get(self, request, *args, **kwargs):
+        section_id = request.query_params.get('section_id')
+        class_id = request.query_params.get('class_id')
+        if not (section_id or class_id):
+            return Response({"detail": _("يجب توفير section_id أو class_id.")}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            section_id = int(section_id) if section_id else None
+            class_id = int(class_id) if class_id else None
+        except ValueError:
+            return Response({"detail": _("قيم المعرفات غير صحيحة.")}, status=status.HTTP_400_BAD_REQUEST)
+
+        academic_term_id, rankings = self.get_rankings()
+        if section_id:
+            results = sorted(
+                (row for row in rankings if row['section_id'] == section_id),
+                key=lambda row: (row['section_rank'], row['student_id']),
+            )
+        else:
+            results = [row for row in rankings if row['class_id'] == class_id]
+        return Response({"academic_term_id": academic_term_id, "results": results})
+
+
+class LeaderboardView(RankingBaseView):
+    """
+    لوحة المتصدرين للفصل الدراسي الحالي: أول limit طالب (10 افتراضياً) في كل صف.
+    Path: /api/grades/averages/leaderboard/?limit=10
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({"detail": _("قيمة limit غير صحيحة.")}, status=status.HTTP_400_BAD_REQUEST)
+
+        academic_term_id, rankings = self.get_rankings()
+        classes = {}
+        for row in rankings:
+            if row['class_rank'] <= limit:
+                classes.setdefault(row['class_id'], []).append(row)
+        return Response({
+            "academic_term_id": academic_term_id,
+            "classes": [{"class_id": class_id, "results": rows} for class_id, rows in classes.items()],
+        })
+
+
+from Schoolo.exports import ExportWriter, get_export_format, iter_queryset
 
 class GradeReportViewSet(viewsets.ViewSet):
     """
@@ -546,6 +849,10 @@ class GradeReportViewSet(viewsets.ViewSet):
     """
     @action(detail=False, methods=['get'])
     def download_excel_report(self, request):
+        """
+        تقرير علامات بصيغة xlsx (افتراضياً) أو csv عبر file_format=csv.
+        يُكتب التقرير صفاً بعد صف إلى ملف مؤقت ويُرسل عبر FileResponse.
+        """
         student_id = request.query_params.get('student_id')
         section_id = request.query_params.get('section_id')
         subject_id = request.query_params.get('subject_id')
@@ -558,10 +865,9 @@ class GradeReportViewSet(viewsets.ViewSet):
         if not (user.is_superuser or user.is_admin() or user.is_teacher()):
             return Response({"error": "لا تملك الصلاحية للوصول إلى تقارير الدرجات."}, status=status.HTTP_403_FORBIDDEN)
 
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-        worksheet = workbook.add_worksheet('Grades Report')
-        bold = workbook.add_format({'bold': True})
+        export_format = get_export_format(request)
+        if not export_format:
+            return Response({"error": "صيغة الملف غير مدعومة. الصيغ المتاحة: xlsx, csv."}, status=status.HTTP_400_BAD_REQUEST)
         
         # Set report start column for centering
         start_column_index = 3 # Column D
@@ -569,7 +875,7 @@ class GradeReportViewSet(viewsets.ViewSet):
         if student_id:
             # Case 1: All grades for a single student
             try:
-                student_obj = Student.objects.get(pk=student_id)
+                student_obj = Student.objects.select_related('user', 'section').get(pk=student_id)
             except Student.DoesNotExist:
                 return Response({"error": "الطالب غير موجود."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -577,125 +883,110 @@ class GradeReportViewSet(viewsets.ViewSet):
             if not grades_queryset.exists():
                 return Response({"message": "لا توجد درجات لهذا الطالب."}, status=status.HTTP_200_OK)
 
+            writer = ExportWriter(export_format, sheet_name='Grades Report')
+
             # Write student info
-            worksheet.write(1, start_column_index, 'Student Name:', bold)
-            worksheet.write(1, start_column_index + 1, student_obj.user.get_full_name())
-            worksheet.write(2, start_column_index, 'Section:', bold)
-            worksheet.write(2, start_column_index + 1, student_obj.section.name if hasattr(student_obj, 'section') and student_obj.section else "غير محدد")
+            writer.write(1, start_column_index, 'Student Name:', bold=True)
+            writer.write(1, start_column_index + 1, student_obj.user.get_full_name())
+            writer.write(2, start_column_index, 'Section:', bold=True)
+            writer.write(2, start_column_index + 1, student_obj.section.name if student_obj.section else "غير محدد")
             
             # Calculate and prepare data
             grade_calculator = GradeCalculator()
             grades_by_subject = {}
-            for grade in grades_queryset:
-                subject_name = grade.exam.subject.name
-                if subject_name not in grades_by_subject:
-                    grades_by_subject[subject_name] = []
-                grades_by_subject[subject_name].append(grade.score)
+            subject_grades = grades_queryset.values_list('exam__subject__name', 'score').order_by('exam__subject__name', 'exam__exam_date')
+            for subject_name, score in iter_queryset(subject_grades):
+                grades_by_subject.setdefault(subject_name, []).append(score)
 
-            report_data = []
+            overall_avg = grade_calculator.calculate_overall_average(student_id=student_id)
+            # Write report data
+            headers = ['Subject', 'Grades', 'Subject Average']
+            writer.write(4, start_column_index, 'Detailed Grades:', bold=True)
+            writer.write_row(5, start_column_index, headers, bold=True)
+            
+            current_row = 6
             for subject, grades_list in grades_by_subject.items():
                 subject_avg = sum(grades_list) / len(grades_list)
-                report_data.append([
+                writer.write_row(current_row, start_column_index, [
                     subject,
                     ', '.join(map(str, grades_list)),
                     f"{subject_avg:.2f}"
                 ])
-            overall_avg = grade_calculator.calculate_overall_average(student_id=student_id)
-            print(overall_avg)
-            # Write report data
-            headers = ['Subject', 'Grades', 'Subject Average']
-            worksheet.write(4, start_column_index, 'Detailed Grades:', bold)
-            worksheet.write_row(5, start_column_index, headers, bold)
-            
-            current_row = 6
-            for row in report_data:
-                worksheet.write_row(current_row, start_column_index, row)
                 current_row += 1
 
-            # Write overall average - Corrected Line
-            worksheet.write(current_row + 1, start_column_index, 'Overall Final Average:', bold)
+            # Write overall average
+            writer.write(current_row + 1, start_column_index, 'Overall Final Average:', bold=True)
             formatted_avg = f"{overall_avg:.2f}" if overall_avg is not None else "N/A"
-            worksheet.write(current_row + 1, start_column_index + 1, formatted_avg)
+            writer.write(current_row + 1, start_column_index + 1, formatted_avg)
 
-            filename = f'Student_Grades_Report_{student_obj.user.get_full_name()}.xlsx'
+            filename = f'Student_Grades_Report_{student_obj.user.get_full_name()}'
 
         elif section_id and subject_id:
             # Case 2: Grades for a section in a single subject
             try:
-                section_obj = Section.objects.get(pk=section_id)
+                section_obj = Section.objects.select_related('class_obj').get(pk=section_id)
                 subject_obj = Subject.objects.get(pk=subject_id)
             except (Section.DoesNotExist, Subject.DoesNotExist):
                 return Response({"error": "الشعبة أو المادة غير موجودة."}, status=status.HTTP_404_NOT_FOUND)
 
-            grades_queryset = Grade.objects.filter(student__section=section_obj, exam__subject=subject_obj).select_related('student__user')
+            grades_queryset = Grade.objects.filter(student__section=section_obj, exam__subject=subject_obj)
             if not grades_queryset.exists():
                 return Response({"message": "لا توجد درجات لطلاب هذه الشعبة في هذه المادة."}, status=status.HTTP_200_OK)
 
-            # Write section and subject info
-            worksheet.write(1, start_column_index, 'Class:', bold)
-            worksheet.write(1, start_column_index + 1, section_obj.class_obj.name if section_obj.class_obj else "غير محدد")
-            worksheet.write(2, start_column_index, 'Section:', bold)
-            worksheet.write(2, start_column_index + 1, section_obj.name)
-            worksheet.write(3, start_column_index, 'Subject:', bold)
-            worksheet.write(3, start_column_index + 1, subject_obj.name)
+            writer = ExportWriter(export_format, sheet_name='Grades Report')
 
-            # Prepare report data
-            report_data = [{'Student Name': grade.student.user.get_full_name(), 'Grade': grade.score} for grade in grades_queryset]
-            df_report = pd.DataFrame(report_data)
+            # Write section and subject info
+            writer.write(1, start_column_index, 'Class:', bold=True)
+            writer.write(1, start_column_index + 1, section_obj.class_obj.name if section_obj.class_obj else "غير محدد")
+            writer.write(2, start_column_index, 'Section:', bold=True)
+            writer.write(2, start_column_index + 1, section_obj.name)
+            writer.write(3, start_column_index, 'Subject:', bold=True)
+            writer.write(3, start_column_index + 1, subject_obj.name)
 
             # Write report
-            worksheet.write_row(5, start_column_index, df_report.columns, bold)
-            for row_num, row_data in enumerate(df_report.values):
-                worksheet.write_row(row_num + 6, start_column_index, row_data)
+            writer.write_row(5, start_column_index, ['Student Name', 'Grade'], bold=True)
+            rows = grades_queryset.values_list('student__user__first_name', 'student__user__last_name', 'score')
+            for row_num, (first_name, last_name, score) in enumerate(iter_queryset(rows)):
+                writer.write_row(row_num + 6, start_column_index, [f"{first_name} {last_name}".strip(), score])
 
-            filename = f'Section_Grades_{section_obj.name}_{subject_obj.name}.xlsx'
+            filename = f'Section_Grades_{section_obj.name}_{subject_obj.name}'
 
         elif section_id:
             # Case 3: Overall averages for a section
             try:
-                section_obj = Section.objects.get(pk=section_id)
+                section_obj = Section.objects.select_related('class_obj').get(pk=section_id)
             except Section.DoesNotExist:
                 return Response({"error": "الشعبة غير موجودة."}, status=status.HTTP_404_NOT_FOUND)
 
-            students_in_section = Student.objects.filter(section=section_obj)
-            if not students_in_section.exists():
+            students_in_section = list(
+                Student.objects.filter(section=section_obj).values_list('pk', 'user__first_name', 'user__last_name')
+            )
+            if not students_in_section:
                 return Response({"message": "لا يوجد طلاب في هذه الشعبة."}, status=status.HTTP_200_OK)
 
+            writer = ExportWriter(export_format, sheet_name='Grades Report')
+
             # Write section info
-            worksheet.write(1, start_column_index, 'Class:', bold)
-            worksheet.write(1, start_column_index + 1, section_obj.class_obj.name if section_obj.class_obj else "غير محدد")
-            worksheet.write(2, start_column_index, 'Section:', bold)
-            worksheet.write(2, start_column_index + 1, section_obj.name)
+            writer.write(1, start_column_index, 'Class:', bold=True)
+            writer.write(1, start_column_index + 1, section_obj.class_obj.name if section_obj.class_obj else "غير محدد")
+            writer.write(2, start_column_index, 'Section:', bold=True)
+            writer.write(2, start_column_index + 1, section_obj.name)
 
-            # Prepare report data
             grade_calculator = GradeCalculator()
-            report_data = []
-            for student_obj in students_in_section:
-                overall_avg = grade_calculator.calculate_overall_average(student_id=student_obj.pk)
-                formatted_avg = f"{overall_avg:.2f}" if overall_avg is not None else "N/A"
-                report_data.append({
-                    'Student Name': student_obj.user.get_full_name(),
-                    'Overall Average': formatted_avg
-                })
-            df_report = pd.DataFrame(report_data)
+            overall_averages = grade_calculator.calculate_overall_averages(
+                [student_pk for student_pk, _first, _last in students_in_section]
+            )
 
             # Write report
-            worksheet.write_row(4, start_column_index, df_report.columns, bold)
-            for row_num, row_data in enumerate(df_report.values):
-                worksheet.write_row(row_num + 5, start_column_index, row_data)
+            writer.write_row(4, start_column_index, ['Student Name', 'Overall Average'], bold=True)
+            for row_num, (student_pk, first_name, last_name) in enumerate(students_in_section):
+                overall_avg = overall_averages.get(student_pk)
+                formatted_avg = f"{overall_avg:.2f}" if overall_avg is not None else "N/A"
+                writer.write_row(row_num + 5, start_column_index, [f"{first_name} {last_name}".strip(), formatted_avg])
                 
-            filename = f'Section_Averages_Report_{section_obj.name}.xlsx'
+            filename = f'Section_Averages_Report_{section_obj.name}'
         
         else:
              return Response({"error": "الرجاء تحديد معرف الطالب أو الشعبة أو كليهما."}, status=status.HTTP_400_BAD_REQUEST)
 
-        workbook.close()
-        output.seek(0)
-        
-        response = HttpResponse(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
\ No newline at end of file
+        return writer.response(filename)
\ No newline at end of file
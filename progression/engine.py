@@ -0,0 +1,189 @@
+# progression/engine.py
+from collections import namedtuple
+
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from classes.allocation import SectionAllocator
+from grading.grade_calculator import GradeCalculator
+from Schoolo.bulk import bulk_upsert
+from students.counters import adjust_section_counts, section_count_deltas
+from students.models import Student
+from .models import StudentProgression, StudentProgressionIssue
+
+PASS_MARK = 50
+
+# قرار الترقية لطالب واحد، يُحسب في الذاكرة قبل أي كتابة
+PromotionDecision = namedtuple('PromotionDecision', [
+    'student', 'overall_average', 'result_status', 'is_promoted',
+    'from_class', 'from_section', 'to_class', 'to_section', 'notes', 'issue',
+])
+
+FAILED_NOTE = _("المعدل العام أقل من درجة النجاح المطلوبة.")
+GRADUATED_NOTE = _("أتم الطالب دراسته بنجاح وتخرج.")
+NO_SECTION_DESCRIPTION = _("لا توجد شعبة متاحة في الصف التالي لاستيعاب الطالب.")
+RESOLVED_DESCRIPTION = _("تم حل المشكلة يدويا وترقية الطالب.")
+
+
+class PromotionEngine:
+    """
+    محرك الترقية السنوية على دفعات: يحمّل المعدلات وسعات الشعب مرة واحدة، يحسب قرار كل طالب
+    في الذاكرة (plan) ويوزع الناجحين على شعب الصف التالي بـ SectionAllocator (موازنة العدد والجنس والمعدل)،
+    ثم يكتب الطلاب وسجلات التقدم والمشاكل بعمليات مجمّعة (apply).
+    الكتابة المجمّعة لا ترسل signals الحفظ لكل طالب، لذلك تُحدّث أعداد طلاب الشعب المتأثرة مرة واحدة في النهاية.
+    """
+
+    def __init__(self, current_year, previous_year):
+        self.current_year = current_year
+        self.previous_year = previous_year
+
+    def plan(self, students):
+        """
+        يعيد (decisions, skipped): قرارات الطلاب، وعدد من لم يمكن معالجتهم (طالب ناجح بلا صف).
+        لا يكتب شيئاً في قاعدة البيانات، فيصلح للمعاينة (dry run).
+        """
+        students = list(students)
+        averages = GradeCalculator().calculate_overall_averages(
+            [student.pk for student in students], academic_year_id=self.previous_year.pk,
+        )
+        next_class_ids = {student.student_class.next_class_id for student in students if student.student_class}
+        allocator = SectionAllocator.for_classes(
+            next_class_ids - {None}, self.current_year, balance_gender=True, balance_average=True,
+        )
+
+        # توزيع الناجحين الذين لهم صف تالٍ دفعة واحدة لكل (صف تالٍ، مسار)
+        candidates = {}
+        for student in students:
+            average = averages.get(student.pk)
+            if average is None or average < PASS_MARK or not student.student_class or not student.section:
+                continue
+            if student.student_class.next_class_id:
+                group = (student.student_class.next_class_id, student.section.stream_type)
+                candidates.setdefault(group, []).append(student)
+        assigned = {}
+        for (class_id, stream_type), group in candidates.items():
+            assigned.update(allocator.allocate(group, class_id, stream_type, averages))
+
+        decisions, skipped = [], 0
+        for student in students:
+            average = averages.get(student.pk)
+            from_class, from_section = student.student_class, student.section
+            decision = dict(
+                student=student, overall_average=average,
+                from_class=from_class, from_section=from_section, notes=None, issue=None,
+            )
+            if average is None or average < PASS_MARK:
+                decision.update(
+                    result_status='failed', is_promoted=False,
+                    to_class=from_class, to_section=from_section, notes=FAILED_NOTE,
+                )
+            elif from_class is None or from_section is None:
+                skipped += 1
+                continue
+            elif not from_class.next_class_id:
+                decision.update(
+                    result_status='graduated', is_promoted=False,
+                    to_class=None, to_section=None, notes=GRADUATED_NOTE,
+                )
+            else:
+                to_section = assigned.get(student.pk)
+                if to_section is None:
+                    decision.update(
+                        result_status='failed', is_promoted=False,
+                        to_class=from_class, to_section=from_section, issue='no_available_section',
+                    )
+                else:
+                    decision.update(
+                        result_status='promoted', is_promoted=True,
+                        to_class=to_section.class_obj, to_section=to_section,
+                    )
+            decisions.append(PromotionDecision(**decision))
+        return decisions, skipped
+
+    @staticmethod
+    def summarize(decisions, skipped=0):
+        results = {'promoted': 0, 'failed': 0, 'graduated': 0, 'issues': skipped}
+        for decision in decisions:
+            if decision.issue:
+                results['issues'] += 1
+            else:
+                results[decision.result_status] += 1
+        return results
+
+    @staticmethod
+    def preview(decisions):
+        return [
+            {
+                'student_id': d.student.pk,
+                'overall_average': d.overall_average,
+                'result_status': d.result_status,
+                'from_section_id': d.from_section.pk if d.from_section else None,
+                'to_class_id': d.to_class.pk if d.to_class else None,
+                'to_section_id': d.to_section.pk if d.to_section else None,
+                'issue': d.issue,
+            }
+            for d in decisions
+        ]
+
+    def apply(self, decisions):
+        """
+        يكتب القرارات: تحديث الطلاب المنقولين (bulk_update)، سجلات التقدم والمشاكل (upsert)،
+        ثم تحديث أعداد طلاب الشعب القديمة والجديدة بتحديثات F() مجمّعة.
+        """
+        now = timezone.now()
+        moved = [d for d in decisions if d.result_status in ('promoted', 'graduated')]
+        for d in moved:
+            d.student.student_class, d.student.section = d.to_class, d.to_section
+            d.student.updated_at = now
+        Student.objects.bulk_update(
+            [d.student for d in moved], ['student_class', 'section', 'updated_at'], batch_size=500,
+        )
+
+        bulk_upsert(
+            StudentProgression,
+            [
+                StudentProgression(
+                    student=d.student, academic_year=self.current_year, overall_average=d.overall_average,
+                    result_status=d.result_status, is_promoted=d.is_promoted, notes=d.notes,
+                    from_class=d.from_class, from_section=d.from_section,
+                    to_class=d.to_class, to_section=d.to_section,
+                )
+                for d in decisions
+            ],
+            unique_fields=['student', 'academic_year'],
+            update_fields=[
+                'overall_average', 'result_status', 'is_promoted', 'notes',
+                'from_class', 'from_section', 'to_class', 'to_section', 'updated_at',
+            ],
+            batch_size=500,
+        )
+
+        issue_students = [d.student.pk for d in decisions if d.issue]
+        if issue_students:
+            # MySQL لا يعيد المفاتيح بعد الإدراج المجمّع، لذلك تُقرأ معرفات السجلات باستعلام واحد
+            progression_ids = StudentProgression.objects.filter(
+                academic_year=self.current_year, student_id__in=issue_students,
+            ).values_list('id', flat=True)
+            bulk_upsert(
+                StudentProgressionIssue,
+                [
+                    StudentProgressionIssue(
+                        student_progression_id=progression_id, issue_type='no_available_section',
+                        description=NO_SECTION_DESCRIPTION,
+                    )
+                    for progression_id in progression_ids
+                ],
+                unique_fields=['student_progression'],
+                update_fields=['issue_type', 'description', 'updated_at'],
+            )
+
+        promoted = [d.student.pk for d in decisions if d.result_status == 'promoted']
+        if promoted:
+            StudentProgressionIssue.objects.filter(
+                student_progression__student_id__in=promoted, issue_type='no_available_section',
+            ).update(is_resolved=True, description=RESOLVED_DESCRIPTION)
+
+        adjust_section_counts(section_count_deltas(
+            (d.from_section.pk if d.from_section else None, d.to_section.pk if d.to_section else None)
+            for d in moved
+        ))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from progression.runs import claim_next_run, run_promotion
+
+
+class Command(BaseCommand):
+    help = "تشغيل عامل الترقية: ينفذ عمليات PromotionRun المنتظرة صفاً بعد صف."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="معالجة جميع العمليات المنتظرة ثم الخروج.",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help="عدد الثواني بين كل فحص للعمليات الجديدة.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("بدء عامل الترقية...")
+        while True:
+            run = claim_next_run()
+            if run is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            run = run_promotion(run)
+            if run.status == run.STATUS_DONE:
+                self.stdout.write(self.style.SUCCESS(
+                    f"اكتملت عملية الترقية #{run.pk}: {run.promoted} ناجح، {run.failed} راسب، "
+                    f"{run.graduated} متخرج، {run.issues} مشكلة."
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(f"فشلت عملية الترقية #{run.pk}: {run.error}"))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-18 09:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0004_timeslot_name'),
+        ('classes', '0004_class_next_class'),
+        ('progression', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromotionRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ آخر تحديث')),
+                ('status', models.CharField(choices=[('pending', 'في الانتظار'), ('running', 'قيد التنفيذ'), ('done', 'مكتمل'), ('failed', 'فشل')], db_index=True, default='pending', max_length=10, verbose_name='الحالة')),
+                ('total_classes', models.PositiveIntegerField(default=0, verbose_name='عدد الصفوف')),
+                ('processed_classes', models.PositiveIntegerField(default=0, verbose_name='الصفوف المعالجة')),
+                ('promoted', models.PositiveIntegerField(default=0, verbose_name='الناجحون')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='الراسبون')),
+                ('graduated', models.PositiveIntegerField(default=0, verbose_name='المتخرجون')),
+                ('issues', models.PositiveIntegerField(default=0, verbose_name='المشاكل')),
+                ('error', models.TextField(blank=True, verbose_name='رسالة الخطأ')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='وقت البدء')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='وقت الانتهاء')),
+                ('academic_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='promotion_runs', to='academic.academicyear', verbose_name='العام الدراسي')),
+                ('last_class', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='classes.class', verbose_name='آخر صف تمت معالجته')),
+                ('previous_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='promotion_runs_from', to='academic.academicyear', verbose_name='العام الدراسي السابق')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='promotion_runs', to=settings.AUTH_USER_MODEL, verbose_name='طُلب بواسطة')),
+            ],
+            options={
+                'verbose_name': 'عملية ترقية',
+                'verbose_name_plural': 'عمليات الترقية',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -4,7 +4,7 @@ from django.utils.translation import gettext_lazy as _
 from academic.models import AcademicYear
 from students.models import Student
 from classes.models import Class, Section  # إعادة استيراد النماذج
-from accounts.models import AutoCreateAndAutoUpdateTimeStampedModel
+from accounts.models import AutoCreateAndAutoUpdateTimeStampedModel, User
 
 class StudentProgression(AutoCreateAndAutoUpdateTimeStampedModel):
     """
@@ -135,3 +135,90 @@ class StudentProgressionIssue(AutoCreateAndAutoUpdateTimeStampedModel):
     def __str__(self):
         return f"مشكلة لـ {self.student_progression.student.user.get_full_name()} - {self.get_issue_type_display()}"
 
+
+class PromotionRun(AutoCreateAndAutoUpdateTimeStampedModel):
+    """
+    عملية ترقية سنوية تُنفذ على دفعات (صف دراسي في كل دفعة) خارج دورة الطلب
+    بواسطة العامل run_promotion_worker. كل دفعة تُحفظ في معاملة مستقلة مع تقدم العملية،
+    فإذا فشلت العملية يمكن استئنافها من بعد آخر صف تمت معالجته.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _('في الانتظار')),
+        (STATUS_RUNNING, _('قيد التنفيذ')),
+        (STATUS_DONE, _('مكتمل')),
+        (STATUS_FAILED, _('فشل')),
+    ]
+
+    academic_year = models.ForeignKey(
+        AcademicYear,
+        on_delete=models.CASCADE,
+        related_name='promotion_runs',
+        verbose_name=_("العام الدراسي")
+    )
+    previous_year = models.ForeignKey(
+        AcademicYear,
+        on_delete=models.CASCADE,
+        related_name='promotion_runs_from',
+        verbose_name=_("العام الدراسي السابق")
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        db_index=True,
+        verbose_name=_("الحالة")
+    )
+    total_classes = models.PositiveIntegerField(default=0, verbose_name=_("عدد الصفوف"))
+    processed_classes = models.PositiveIntegerField(default=0, verbose_name=_("الصفوف المعالجة"))
+    last_class = models.ForeignKey(
+        Class,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        verbose_name=_("آخر صف تمت معالجته")
+    )
+    promoted = models.PositiveIntegerField(default=0, verbose_name=_("الناجحون"))
+    failed = models.PositiveIntegerField(default=0, verbose_name=_("الراسبون"))
+    graduated = models.PositiveIntegerField(default=0, verbose_name=_("المتخرجون"))
+    issues = models.PositiveIntegerField(default=0, verbose_name=_("المشاكل"))
+    error = models.TextField(
+        blank=True,
+        verbose_name=_("رسالة الخطأ")
+    )
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='promotion_runs',
+        verbose_name=_("طُلب بواسطة")
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("وقت البدء")
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("وقت الانتهاء")
+    )
+
+    class Meta:
+        verbose_name = _("عملية ترقية")
+        verbose_name_plural = _("عمليات الترقية")
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.academic_year.name} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def progress(self):
+        if not self.total_classes:
+            return 100 if self.status == self.STATUS_DONE else 0
+        return round(self.processed_classes * 100 / self.total_classes)
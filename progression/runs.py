@@ -0,0 +1,135 @@
+# progression/runs.py
+import datetime
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from students.models import Student
+from .engine import PromotionEngine
+from .models import PromotionRun
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = [PromotionRun.STATUS_PENDING, PromotionRun.STATUS_RUNNING, PromotionRun.STATUS_FAILED]
+
+# كل صف مكتمل يحدّث updated_at، فالعملية قيد التنفيذ التي لم تتحدث خلال هذه المدة
+# تُعتبر متوقفة (توقف العامل) وتُعاد إلى الانتظار لتُستأنف من بعد آخر صف
+STALE_RUN_TIMEOUT = datetime.timedelta(minutes=30)
+
+
+class StaleClaimError(Exception):
+    """
+    العملية أُعيدت إلى الانتظار وحجزها عامل آخر، فيتوقف العامل القديم دون حفظ دفعته.
+    """
+
+
+def enqueue_promotion_run(current_year, previous_year, user=None):
+    """
+    ينشئ عملية ترقية جديدة للعام الحالي، أو يعيد العملية غير المكتملة السابقة.
+    العملية الفاشلة تُعاد إلى الانتظار فيستأنفها العامل من بعد آخر صف تمت معالجته.
+    يعيد (run, created).
+    """
+    run = PromotionRun.objects.filter(academic_year=current_year, status__in=ACTIVE_STATUSES).first()
+    if run:
+        if run.status == PromotionRun.STATUS_FAILED:
+            PromotionRun.objects.filter(pk=run.pk, status=PromotionRun.STATUS_FAILED).update(
+                status=PromotionRun.STATUS_PENDING, error='', finished_at=None, updated_at=timezone.now(),
+            )
+            run.refresh_from_db()
+        return run, False
+    run = PromotionRun.objects.create(academic_year=current_year, previous_year=previous_year, requested_by=user)
+    return run, True
+
+
+def claim_next_run():
+    """
+    يحجز أقدم عملية في الانتظار بتحديث شرطي على الحالة، حتى لا يعالجها عاملان معاً.
+    العمليات المتوقفة قيد التنفيذ (انظر STALE_RUN_TIMEOUT) تُعاد إلى الانتظار أولاً.
+    وقت الحجز started_at يميّز الحجز الحالي، فلا يحفظ العامل القديم شيئاً بعد إعادة الحجز.
+    """
+    requeue_stale_runs()
+    pending = PromotionRun.objects.filter(status=PromotionRun.STATUS_PENDING).order_by('created_at')
+    for run_id in pending.values_list('pk', flat=True)[:10]:
+        claimed = PromotionRun.objects.filter(pk=run_id, status=PromotionRun.STATUS_PENDING).update(
+            status=PromotionRun.STATUS_RUNNING,
+            started_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        if claimed:
+            return PromotionRun.objects.select_related('academic_year', 'previous_year').get(pk=run_id)
+    return None
+
+
+def requeue_stale_runs():
+    """
+    يعيد إلى الانتظار العمليات قيد التنفيذ التي لم تتحدث منذ STALE_RUN_TIMEOUT، ويعيد عددها.
+    """
+    now = timezone.now()
+    return PromotionRun.objects.filter(
+        status=PromotionRun.STATUS_RUNNING, updated_at__lt=now - STALE_RUN_TIMEOUT,
+    ).update(status=PromotionRun.STATUS_PENDING, updated_at=now)
+
+
+def _remaining_class_ids(run):
+    students = Student.objects.filter(section__academic_year=run.previous_year)
+    class_ids = students.order_by('section__class_obj_id').values_list('section__class_obj_id', flat=True).distinct()
+    if run.last_class_id:
+        class_ids = class_ids.filter(section__class_obj_id__gt=run.last_class_id)
+    return list(class_ids)
+
+
+def _promote_class(run, engine, class_id):
+    """
+    دفعة واحدة: ترقية طلاب صف واحد وحفظ تقدم العملية في نفس المعاملة،
+    فإما أن تُحفظ الدفعة وتقدمها معاً أو لا يُحفظ أي منهما.
+    تحديث التقدم مشروط بالحجز الحالي، وإذا أُعيد حجز العملية تُلغى الدفعة بـ StaleClaimError.
+    """
+    students = Student.objects.filter(
+        section__academic_year=run.previous_year, section__class_obj_id=class_id,
+    ).select_related('student_class', 'section')
+    with transaction.atomic():
+        decisions, skipped = engine.plan(students)
+        engine.apply(decisions)
+        results = engine.summarize(decisions, skipped)
+        updated = PromotionRun.objects.filter(
+            pk=run.pk, status=PromotionRun.STATUS_RUNNING, started_at=run.started_at,
+        ).update(
+            last_class_id=class_id,
+            processed_classes=F('processed_classes') + 1,
+            promoted=F('promoted') + results['promoted'],
+            failed=F('failed') + results['failed'],
+            graduated=F('graduated') + results['graduated'],
+            issues=F('issues') + results['issues'],
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            raise StaleClaimError(f"Promotion run {run.pk} was claimed by another worker.")
+
+
+def run_promotion(run):
+    """
+    ينفذ العملية صفاً بعد صف بدءاً من بعد آخر صف تمت معالجته، ويحدّث حالتها في النهاية.
+    """
+    engine = PromotionEngine(run.academic_year, run.previous_year)
+    try:
+        class_ids = _remaining_class_ids(run)
+        if not run.last_class_id:
+            PromotionRun.objects.filter(pk=run.pk).update(total_classes=len(class_ids))
+        for class_id in class_ids:
+            _promote_class(run, engine, class_id)
+        run.refresh_from_db()
+        run.status = PromotionRun.STATUS_DONE
+        run.error = ''
+    except StaleClaimError:
+        logger.warning("Promotion run %s was reclaimed, stopping this worker.", run.pk)
+        return run
+    except Exception as e:
+        logger.exception("Promotion run %s failed.", run.pk)
+        run.refresh_from_db()
+        run.status = PromotionRun.STATUS_FAILED
+        run.error = str(e)
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+    return run
@@ -1,6 +1,6 @@
 # progression/serializers.py
 from rest_framework import serializers
-from .models import StudentProgression, StudentProgressionIssue
+from .models import PromotionRun, StudentProgression, StudentProgressionIssue
 from students.models import Student
 from classes.models import Class, Section
 from academic.models import AcademicYear
@@ -19,3 +19,19 @@ class StudentProgressionIssueSerializer(serializers.ModelSerializer):
             'is_resolved', 'resolved_at', 'student_name', 'student_id',
             'student_class_name', 'student_section_name', 'academic_year_name'
         ]
+
+
+class PromotionRunSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    academic_year_name = serializers.CharField(source='academic_year.name', read_only=True)
+    last_class_name = serializers.CharField(source='last_class.name', read_only=True, default=None)
+
+    class Meta:
+        model = PromotionRun
+        fields = [
+            'id', 'academic_year', 'academic_year_name', 'previous_year',
+            'status', 'status_display', 'progress', 'total_classes', 'processed_classes',
+            'last_class', 'last_class_name', 'promoted', 'failed', 'graduated', 'issues',
+            'error', 'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = fields
@@ -1,3 +1,82 @@
+import datetime
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+
+from academic.models import AcademicYear
+from classes.models import Class
+from Schoolo.testing import SchoolTestDataMixin
+from . import runs
+from .models import PromotionRun, StudentProgression
+
+
+class PromotionRunResumeTests(SchoolTestDataMixin, TestCase):
+    """
+    عملية الترقية تُنفذ صفاً بعد صف، وتُستأنف بعد الفشل أو توقف العامل من بعد آخر صف محفوظ.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.current_year = cls.year
+        cls.previous_year = AcademicYear.objects.create(
+            name='2024-2025', start_date=datetime.date(2024, 9, 1),
+            end_date=datetime.date(2025, 6, 30), is_current=False,
+        )
+        cls.classes = [cls.class_obj, Class.objects.create(name='C2')]
+        for index, class_obj in enumerate(cls.classes):
+            section = cls.create_section('A', class_obj, academic_year=cls.previous_year)
+            for offset in range(2):
+                cls.create_student(index * 2 + offset, section)
+
+    def _claim(self):
+        run, created = runs.enqueue_promotion_run(self.current_year, self.previous_year)
+        claimed = runs.claim_next_run()
+        self.assertEqual(claimed.pk, run.pk)
+        return claimed
+
+    def test_failed_run_resumes_after_last_class(self):
+        promote_class = runs._promote_class
+        calls = []
+
+        def fail_on_second_class(run, engine, class_id):
+            calls.append(class_id)
+            if len(calls) == 2:
+                raise RuntimeError('worker crashed')
+            promote_class(run, engine, class_id)
+
+        with mock.patch.object(runs, '_promote_class', side_effect=fail_on_second_class), \
+                self.assertLogs('progression.runs', level='ERROR'):
+            run = runs.run_promotion(self._claim())
+        self.assertEqual(run.status, PromotionRun.STATUS_FAILED)
+        self.assertEqual((run.last_class_id, run.processed_classes, run.failed), (self.classes[0].pk, 1, 2))
+        self.assertEqual(StudentProgression.objects.count(), 2)
+
+        run = runs.run_promotion(self._claim())
+        self.assertEqual(run.status, PromotionRun.STATUS_DONE)
+        self.assertEqual(
+            (run.last_class_id, run.total_classes, run.processed_classes, run.failed),
+            (self.classes[1].pk, 2, 2, 4),
+        )
+        self.assertEqual(StudentProgression.objects.count(), 4)
+
+    def test_stale_running_run_is_reclaimed(self):
+        stale = self._claim()
+        self.assertIsNone(runs.claim_next_run())
+
+        PromotionRun.objects.filter(pk=stale.pk).update(
+            updated_at=timezone.now() - runs.STALE_RUN_TIMEOUT - datetime.timedelta(minutes=1),
+        )
+        reclaimed = runs.claim_next_run()
+        self.assertEqual(reclaimed.pk, stale.pk)
+
+        # العامل القديم (بوقت حجزه السابق) لا يحفظ شيئاً بعد إعادة الحجز
+        stale.started_at -= datetime.timedelta(seconds=1)
+        with self.assertLogs('progression.runs', level='WARNING'):
+            runs.run_promotion(stale)
+        self.assertEqual(StudentProgression.objects.count(), 0)
+        self.assertEqual(PromotionRun.objects.get(pk=stale.pk).status, PromotionRun.STATUS_RUNNING)
 
-# Create your tests here.
+        run = runs.run_promotion(reclaimed)
+        self.assertEqual((run.status, run.processed_classes, run.failed), (PromotionRun.STATUS_DONE, 2, 4))
@@ -5,6 +5,7 @@ from .views import *
 
 router = DefaultRouter()
 router.register('issues', StudentProgressionIssueViewSet, basename='progression-issue')
+router.register('runs', PromotionRunViewSet, basename='promotion-run')
 
 urlpatterns = [
     path('promote/', StudentPromotionView.as_view(), name='student-promotion'),
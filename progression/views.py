@@ -7,161 +7,85 @@ from accounts.permissions import IsAdminOrSuperuser
 from students.models import Student
 from classes.models import Class, Section
 from .models import *
+from academic.context import get_current_year
 from .serializers import *
-from grading.grade_calculator import GradeCalculator
+from .engine import PromotionEngine
+from .runs import ACTIVE_STATUSES, enqueue_promotion_run
 from academic.models import AcademicYear
 from rest_framework import status
 from rest_framework.response import Response
 from .filters import StudentProgressionIssueFilterSet
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets
+from django.urls import reverse
+
+def _is_dry_run(request):
+    # dry_run في جسم الطلب أو في الرابط (?dry_run=true)
+    value = request.data.get('dry_run', request.query_params.get('dry_run', False))
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes')
+    return bool(value)
+
 
 class StudentPromotionView(APIView):
     permission_classes = [IsAdminOrSuperuser]
 
-    def _promote_students(self, students, current_year, previous_year):
-        promotion_results = {
-            'promoted': 0,
-            'failed': 0,
-            'graduated': 0,
-            'issues': 0,
-        }
-        grade_calculator = GradeCalculator()
-        for student in students:
-            overall_average = grade_calculator.calculate_overall_average(
-                student_id=student.pk,
-                academic_year_id=previous_year.pk
-            )
-            from_class = student.student_class
-            from_section = student.section
-
-            # إعداد البيانات التي سيتم تحديثها أو إنشاؤها
-            progression_data = {
-                'student': student,
-                'academic_year': current_year,
-                'overall_average': overall_average,
-                'from_class': from_class,
-                'from_section': from_section,
-            }
-
-            # المنطق لفرز الطلاب
-            if overall_average is None or overall_average < 50:
-                progression_data.update({
-                    'result_status': 'failed',
-                    'is_promoted': False,
-                    'to_class': from_class,
-                    'to_section': from_section,
-                    'notes': _("المعدل العام أقل من درجة النجاح المطلوبة.")
-                })
-                StudentProgression.objects.update_or_create(
-                    student=student, academic_year=current_year, defaults=progression_data
-                )
-                promotion_results['failed'] += 1
-            elif from_class and not from_class.next_class:
-                student.student_class = None
-                student.section = None
-                student.save()
-                
-                progression_data.update({
-                    'result_status': 'graduated',
-                    'is_promoted': False,
-                    'to_class': None,
-                    'to_section': None,
-                    'notes': _("أتم الطالب دراسته بنجاح وتخرج.")
-                })
-                StudentProgression.objects.update_or_create(
-                    student=student, academic_year=current_year, defaults=progression_data
-                )
-                promotion_results['graduated'] += 1
-            else:
-                try:
-                    next_class = from_class.next_class
-                    to_section = Section.objects.filter(
-                        class_obj=next_class,
-                        academic_year=current_year,
-                        is_active=True,
-                        stream_type=from_section.stream_type
-                    ).annotate(
-                        student_count=Count('students')
-                    ).filter(
-                        student_count__lt=F('capacity')
-                    ).order_by('student_count').first()
-
-                    if not to_section:
-                        progression_data.update({
-                            'result_status': 'failed',
-                            'is_promoted': False,
-                            'to_class': from_class,
-                            'to_section': from_section
-                        })
-                        progression, created = StudentProgression.objects.update_or_create(
-                            student=student, academic_year=current_year, defaults=progression_data
-                        )
-                        
-                        StudentProgressionIssue.objects.update_or_create(
-                            student_progression=progression,
-                            issue_type='no_available_section',
-                            defaults={'description': _("لا توجد شعبة متاحة في الصف التالي لاستيعاب الطالب.")}
-                        )
-                        promotion_results['issues'] += 1
-                    else:
-                        student.student_class = next_class
-                        student.section = to_section
-                        student.save()
-                        
-                        progression_data.update({
-                            'result_status': 'promoted',
-                            'is_promoted': True,
-                            'to_class': next_class,
-                            'to_section': to_section,
-                        })
-                        progression, created = StudentProgression.objects.update_or_create(
-                            student=student, academic_year=current_year, defaults=progression_data
-                        )
-                        
-                        # Mark the issue as resolved if it exists
-                        StudentProgressionIssue.objects.filter(
-                            student_progression__student=student,
-                            issue_type='no_available_section'
-                        ).update(is_resolved=True, description=_("تم حل المشكلة يدويا وترقية الطالب."))
-                        
-                        promotion_results['promoted'] += 1
-                except Class.DoesNotExist:
-                    promotion_results['issues'] += 1
-        return promotion_results
+    def _promote_students(self, students, current_year, previous_year, dry_run=False):
+        """
+        يحسب قرارات الترقية في الذاكرة ثم يكتبها دفعة واحدة (انظر progression/engine.py).
+        مع dry_run تُعاد القرارات للمعاينة دون أي كتابة.
+        """
+        engine = PromotionEngine(current_year, previous_year)
+        decisions, skipped = engine.plan(students)
+        results = engine.summarize(decisions, skipped)
+        if dry_run:
+            results['preview'] = engine.preview(decisions)
+        else:
+            engine.apply(decisions)
+        return results
+
     def post(self, request, *args, **kwargs):
         """
         Performs automatic promotion for all students in the previous academic year.
+        الترقية الفعلية تُنشأ كعملية PromotionRun ينفذها العامل run_promotion_worker صفاً بعد صف،
+        ويُتابع تقدمها عبر /api/progression/runs/<id>/. المعاينة (dry_run) تُنفذ مباشرة دون حفظ.
         """
         try:
-            with transaction.atomic():
-                try:
-                    current_year = AcademicYear.objects.get(is_current=True)
-                    previous_year = AcademicYear.objects.filter(end_date__lt=current_year.start_date).order_by('-end_date').first()
-                    if not previous_year:
-                        return Response({"detail": _("لا يوجد عام دراسي سابق محدد.")}, status=status.HTTP_400_BAD_REQUEST)
-                except AcademicYear.DoesNotExist:
-                    return Response({"detail": _("لا يوجد عام دراسي حالي محدد.")}, status=status.HTTP_400_BAD_REQUEST)
-                
-                if StudentProgression.objects.filter(academic_year=current_year).exists():
-                    return Response(
-                        {"detail": _("عملية الترقية قد تمت بالفعل لهذا العام الدراسي. يرجى إعادة ضبطها أولاً إذا كنت ترغب في إعادة التشغيل."), "hint": "قم بإرسال طلب POST إلى مسار /api/promotion/reset/"},
-                        status=status.HTTP_409_CONFLICT
-                    )
-                
+            try:
+                current_year = get_current_year()
+                previous_year = AcademicYear.objects.filter(end_date__lt=current_year.start_date).order_by('-end_date').first()
+                if not previous_year:
+                    return Response({"detail": _("لا يوجد عام دراسي سابق محدد.")}, status=status.HTTP_400_BAD_REQUEST)
+            except AcademicYear.DoesNotExist:
+                return Response({"detail": _("لا يوجد عام دراسي حالي محدد.")}, status=status.HTTP_400_BAD_REQUEST)
+
+            if _is_dry_run(request):
                 students = Student.objects.filter(
                     section__academic_year=previous_year
                 ).select_related('student_class', 'section')
-                
-                if not students.exists():
-                    return Response({"detail": _("لا يوجد طلاب مسجلون في العام الدراسي السابق.")}, status=status.HTTP_200_OK)
+                results = self._promote_students(students, current_year, previous_year, dry_run=True)
+                return Response({"message": _("معاينة الترقية دون حفظ."), "results": results}, status=status.HTTP_200_OK)
 
-                results = self._promote_students(students, current_year, previous_year)
-                
+            # عملية سابقة لم تكتمل (في الانتظار أو قيد التنفيذ أو فاشلة) تُستأنف بدلاً من رفض الطلب
+            resumable = PromotionRun.objects.filter(academic_year=current_year, status__in=ACTIVE_STATUSES).exists()
+            if not resumable and StudentProgression.objects.filter(academic_year=current_year).exists():
                 return Response(
-                    {"message": _("اكتملت عملية الترقية بنجاح."), "results": results},
-                    status=status.HTTP_200_OK
+                    {"detail": _("عملية الترقية قد تمت بالفعل لهذا العام الدراسي. يرجى إعادة ضبطها أولاً إذا كنت ترغب في إعادة التشغيل."), "hint": "قم بإرسال طلب POST إلى مسار /api/promotion/reset/"},
+                    status=status.HTTP_409_CONFLICT
                 )
+
+            if not Student.objects.filter(section__academic_year=previous_year).exists():
+                return Response({"detail": _("لا يوجد طلاب مسجلون في العام الدراسي السابق.")}, status=status.HTTP_200_OK)
+
+            run, created = enqueue_promotion_run(current_year, previous_year, user=request.user)
+            return Response(
+                {
+                    "message": _("تمت جدولة عملية الترقية.") if created else _("تم استئناف عملية الترقية السابقة."),
+                    "run": PromotionRunSerializer(run).data,
+                    "status_url": reverse('promotion-run-detail', args=[run.pk]),
+                },
+                status=status.HTTP_202_ACCEPTED
+            )
         except Exception as e:
             return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -176,7 +100,7 @@ class StudentPromotionView(APIView):
         try:
             with transaction.atomic():
                 try:
-                    current_year = AcademicYear.objects.get(is_current=True)
+                    current_year = get_current_year()
                     previous_year = AcademicYear.objects.filter(end_date__lt=current_year.start_date).order_by('-end_date').first()
                     if not previous_year:
                         return Response({"detail": _("لا يوجد عام دراسي سابق محدد.")}, status=status.HTTP_400_BAD_REQUEST)
@@ -191,8 +115,11 @@ class StudentPromotionView(APIView):
                 if not students.exists():
                     return Response({"detail": _("لم يتم العثور على أي طلاب بالمعرفات المحددة في العام الدراسي السابق.")}, status=status.HTTP_404_NOT_FOUND)
 
-                results = self._promote_students(students, current_year, previous_year)
-                
+                dry_run = _is_dry_run(request)
+                results = self._promote_students(students, current_year, previous_year, dry_run=dry_run)
+                if dry_run:
+                    return Response({"message": _("معاينة الترقية دون حفظ."), "results": results}, status=status.HTTP_200_OK)
+
                 return Response(
                     {"message": _("اكتملت عملية الترقية للطلاب المحددين بنجاح."), "results": results},
                     status=status.HTTP_200_OK
@@ -211,14 +138,15 @@ class StudentPromotionResetView(APIView):
         try:
             with transaction.atomic():
                 try:
-                    current_year = AcademicYear.objects.get(is_current=True)
+                    current_year = get_current_year()
                     previous_year = AcademicYear.objects.filter(end_date__lt=current_year.start_date).order_by('-end_date').first()
                     if not previous_year:
                         return Response({"detail": _("لا يوجد عام دراسي سابق محدد.")}, status=status.HTTP_400_BAD_REQUEST)
                 except AcademicYear.DoesNotExist:
                     return Response({"detail": _("لا يوجد عام دراسي حالي محدد.")}, status=status.HTTP_400_BAD_REQUEST)
 
-                # حذف سجلات التقدم والمشاكل المرتبطة بها
+                # حذف سجلات التقدم والمشاكل المرتبطة بها، وعمليات الترقية حتى يمكن البدء من جديد
+                PromotionRun.objects.filter(academic_year=current_year).delete()
                 deleted_progressions = StudentProgression.objects.filter(
                     academic_year=current_year
                 ).delete()
@@ -251,3 +179,12 @@ class StudentProgressionIssueViewSet(viewsets.ReadOnlyModelViewSet):
             'student_progression__academic_year'
         )
         return queryset
+
+
+class PromotionRunViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    متابعة عمليات الترقية: الحالة ونسبة التقدم والأعداد وآخر صف تمت معالجته.
+    """
+    queryset = PromotionRun.objects.select_related('academic_year', 'last_class')
+    serializer_class = PromotionRunSerializer
+    permission_classes = [IsAdminOrSuperuser]
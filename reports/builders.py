@@ -0,0 +1,171 @@
+# reports/builders.py
+from django.db.models import Count, Max
+from rest_framework.exceptions import ValidationError
+
+from academic.context import get_current
+from attendance.models import Attendance
+from attendance.reports import write_students_attendance_table
+from classes.models import Section
+from grading.grade_calculator import GradeCalculator
+from grading.models import StudentSubjectAggregate
+from progression.models import StudentProgression
+from Schoolo.exports import iter_queryset
+from students.models import Student
+
+START_COLUMN = 3
+
+
+def _int_param(params, name, required=True):
+    value = params.get(name)
+    if value in (None, ''):
+        if required:
+            raise ValidationError({"params": f"المعامل {name} مطلوب."})
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({"params": f"المعامل {name} يجب أن يكون رقماً."})
+
+
+def _fingerprint(*querysets):
+    """
+    بصمة بسيطة للبيانات: عدد السجلات وآخر وقت تعديل لكل استعلام.
+    أي إضافة أو تعديل أو حذف يغيّر البصمة، وتعمل عبر جميع العمليات لأنها تُقرأ من قاعدة البيانات.
+    """
+    parts = []
+    for queryset in querysets:
+        stats = queryset.aggregate(count=Count('pk'), last_update=Max('updated_at'))
+        last_update = stats['last_update'].isoformat() if stats['last_update'] else '-'
+        parts.append(f"{stats['count']}:{last_update}")
+    return '|'.join(parts)
+
+
+class SectionGradeAveragesReport:
+    """
+    المعدلات العامة لطلاب شعبة (من جدول ملخصات العلامات).
+    """
+    # مثل GradeReportViewSet: متاح للمعلمين أيضاً
+    admin_only = False
+
+    def normalize_params(self, params):
+        normalized = {'section_id': _int_param(params, 'section_id')}
+        for name in ('academic_year_id', 'academic_term_id'):
+            value = _int_param(params, name, required=False)
+            if value:
+                normalized[name] = value
+        if not Section.objects.filter(pk=normalized['section_id']).exists():
+            raise ValidationError({"params": "الشعبة غير موجودة."})
+        return normalized
+
+    def fingerprint(self, params):
+        return _fingerprint(
+            Student.objects.filter(section_id=params['section_id']),
+            StudentSubjectAggregate.objects.filter(student__section_id=params['section_id']),
+        )
+
+    def build(self, writer, params):
+        section_obj = Section.objects.select_related('class_obj').get(pk=params['section_id'])
+        students = list(
+            Student.objects.filter(section=section_obj)
+            .values_list('pk', 'user__first_name', 'user__last_name')
+            .order_by('user__first_name', 'user__last_name')
+        )
+        overall_averages = GradeCalculator().calculate_overall_averages(
+            [student_pk for student_pk, _first, _last in students],
+            academic_year_id=params.get('academic_year_id'),
+            academic_term_id=params.get('academic_term_id'),
+        )
+
+        writer.write(1, START_COLUMN, 'Class:', bold=True)
+        writer.write(1, START_COLUMN + 1, section_obj.class_obj.name if section_obj.class_obj else "غير محدد")
+        writer.write(2, START_COLUMN, 'Section:', bold=True)
+        writer.write(2, START_COLUMN + 1, section_obj.name)
+        writer.write_row(4, START_COLUMN, ['Student Name', 'Overall Average'], bold=True)
+        for row_num, (student_pk, first_name, last_name) in enumerate(students):
+            overall_avg = overall_averages.get(student_pk)
+            formatted_avg = f"{overall_avg:.2f}" if overall_avg is not None else "N/A"
+            writer.write_row(row_num + 5, START_COLUMN, [f"{first_name} {last_name}".strip(), formatted_avg])
+        return f'Section_Averages_Report_{section_obj.name}'
+
+
+class SchoolAttendanceReport:
+    """
+    نسب الحضور لجميع طلاب المدرسة ضمن عام وفصل (الحاليين افتراضياً).
+    """
+    # مثل تقرير الحضور scope=school: للإدارة فقط
+    admin_only = True
+
+    def normalize_params(self, params):
+        academic_year_id = _int_param(params, 'academic_year_id', required=False)
+        academic_term_id = _int_param(params, 'academic_term_id', required=False)
+        if not academic_year_id and not academic_term_id:
+            # تثبيت العام والفصل الحاليين في المعاملات حتى لا تتغير نتيجة المهمة لاحقاً
+            current_year, current_term = get_current()
+            if not current_year or not current_term:
+                raise ValidationError({"params": "لا يوجد عام أو فصل دراسي حالي."})
+            academic_year_id, academic_term_id = current_year.pk, current_term.pk
+        normalized = {}
+        if academic_year_id:
+            normalized['academic_year_id'] = academic_year_id
+        if academic_term_id:
+            normalized['academic_term_id'] = academic_term_id
+        return normalized
+
+    def _attendance(self, params):
+        return Attendance.objects.filter(**params)
+
+    def fingerprint(self, params):
+        return _fingerprint(Student.objects.all(), self._attendance(params))
+
+    def build(self, writer, params):
+        writer.write(1, START_COLUMN, 'School Attendance Report', bold=True)
+        write_students_attendance_table(
+            writer, 5, START_COLUMN, self._attendance(params), Student.objects.all(), include_placement=True,
+        )
+        return 'School_Attendance_Report'
+
+
+class ProgressionResultsReport:
+    """
+    نتائج الترفيع لجميع الطلاب في عام دراسي.
+    """
+    # مثل واجهات الترقية في progression/views.py: للإدارة فقط
+    admin_only = True
+
+    def normalize_params(self, params):
+        return {'academic_year_id': _int_param(params, 'academic_year_id')}
+
+    def _progressions(self, params):
+        return StudentProgression.objects.filter(academic_year_id=params['academic_year_id'])
+
+    def fingerprint(self, params):
+        return _fingerprint(self._progressions(params))
+
+    def build(self, writer, params):
+        headers = ['Student Name', 'From Class', 'From Section', 'Overall Average', 'Result', 'To Class', 'To Section']
+        writer.write_row(1, START_COLUMN, headers, bold=True)
+        rows = self._progressions(params).values_list(
+            'student__user__first_name', 'student__user__last_name',
+            'from_class__name', 'from_section__name', 'overall_average',
+            'result_status', 'to_class__name', 'to_section__name',
+        )
+        status_labels = dict(StudentProgression.RESULT_STATUS_CHOICES)
+        for row_num, row in enumerate(iter_queryset(rows)):
+            first_name, last_name, from_class, from_section, average, result, to_class, to_section = row
+            writer.write_row(row_num + 2, START_COLUMN, [
+                f"{first_name} {last_name}".strip(),
+                from_class or "-",
+                from_section or "-",
+                f"{average:.2f}" if average is not None else "N/A",
+                str(status_labels.get(result, result)),
+                to_class or "-",
+                to_section or "-",
+            ])
+        return f"Progression_Results_{params['academic_year_id']}"
+
+
+REPORT_BUILDERS = {
+    'section_grade_averages': SectionGradeAveragesReport(),
+    'school_attendance': SchoolAttendanceReport(),
+    'progression_results': ProgressionResultsReport(),
+}
@@ -0,0 +1,203 @@
+# reports/jobs.py
+import datetime
+import hashlib
+import json
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.core.files import File
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from Schoolo.exports import ExportWriter
+from .builders import REPORT_BUILDERS
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+# مهمة قيد التنفيذ لم تتحدث خلال هذه المدة تُعتبر متوقفة (توقف العامل) وتُعاد إلى الانتظار
+STALE_JOB_TIMEOUT = datetime.timedelta(minutes=30)
+
+# أثناء توليد الملف يحدّث العامل updated_at كل هذه المدة حتى لا تُعتبر مهمته الطويلة متوقفة
+HEARTBEAT_INTERVAL = datetime.timedelta(minutes=1)
+
+# المهام المنتهية (مكتملة أو فاشلة) تُحذف مع ملفاتها بعد هذه المدة
+REPORT_RETENTION = datetime.timedelta(days=7)
+
+
+def params_hash(report_type, params, file_format):
+    payload = json.dumps(
+        {'report_type': report_type, 'params': params, 'file_format': file_format},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def enqueue_report(report_type, params, file_format, user=None):
+    """
+    ينشئ مهمة تقرير جديدة أو يعيد مهمة سابقة مطابقة (نفس المعاملات ونفس بصمة البيانات):
+    - مهمة للمستخدم نفسه ما زالت قيد الانتظار أو التنفيذ أو اكتملت بملف صالح تُعاد كما هي.
+    - ملف مكتمل طلبه مستخدم آخر يُعاد استخدامه بمهمة مكتملة جديدة باسم المستخدم تشير إلى نفس الملف،
+      حتى تبقى مهام كل مستخدم ضمن ما يراه في قائمة مهامه.
+    يعيد (job, reused).
+    """
+    builder = REPORT_BUILDERS[report_type]
+    params = builder.normalize_params(params)
+    job_hash = params_hash(report_type, params, file_format)
+    fingerprint = builder.fingerprint(params)
+
+    matching = ReportJob.objects.filter(params_hash=job_hash, data_fingerprint=fingerprint)
+    existing = matching.filter(
+        requested_by=user,
+        status__in=[ReportJob.STATUS_PENDING, ReportJob.STATUS_RUNNING, ReportJob.STATUS_DONE],
+    ).first()
+    if existing and (existing.status != ReportJob.STATUS_DONE or existing.file):
+        return existing, True
+
+    job = ReportJob(
+        report_type=report_type,
+        params=params,
+        file_format=file_format,
+        params_hash=job_hash,
+        data_fingerprint=fingerprint,
+        requested_by=user,
+    )
+    shared = matching.filter(status=ReportJob.STATUS_DONE).exclude(file='').exclude(file__isnull=True).first()
+    if shared:
+        job.status = ReportJob.STATUS_DONE
+        job.file = shared.file.name
+        job.filename = shared.filename
+        job.started_at = job.finished_at = timezone.now()
+    job.save()
+    return job, bool(shared)
+
+
+def claim_next_job():
+    """
+    يحجز أقدم مهمة في الانتظار. الحجز بتحديث شرطي على الحالة، لذلك يمكن تشغيل
+    أكثر من عامل في نفس الوقت دون أن تُعالج المهمة مرتين.
+    المهام المتوقفة قيد التنفيذ (انظر STALE_JOB_TIMEOUT) تُعاد إلى الانتظار أولاً.
+    """
+    requeue_stale_jobs()
+    pending = ReportJob.objects.filter(status=ReportJob.STATUS_PENDING).order_by('created_at')
+    for job_id in pending.values_list('pk', flat=True)[:10]:
+        claimed = ReportJob.objects.filter(pk=job_id, status=ReportJob.STATUS_PENDING).update(
+            status=ReportJob.STATUS_RUNNING,
+            started_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        if claimed:
+            return ReportJob.objects.get(pk=job_id)
+    return None
+
+
+def requeue_stale_jobs():
+    """
+    يعيد إلى الانتظار المهام قيد التنفيذ التي لم تتحدث منذ STALE_JOB_TIMEOUT، ويعيد عددها.
+    """
+    now = timezone.now()
+    return ReportJob.objects.filter(
+        status=ReportJob.STATUS_RUNNING, updated_at__lt=now - STALE_JOB_TIMEOUT,
+    ).update(status=ReportJob.STATUS_PENDING, started_at=None, updated_at=now)
+
+
+@contextmanager
+def _heartbeat(claimed):
+    """
+    يحدّث updated_at للمهمة المحجوزة دورياً في خيط جانبي طوال تنفيذ الكتلة.
+    يتوقف الخيط إذا أُعيد حجز المهمة (لم يعد التحديث الشرطي يطابق أي صف).
+    """
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(HEARTBEAT_INTERVAL.total_seconds()):
+                if not claimed.update(updated_at=timezone.now()):
+                    break
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_job(job):
+    """
+    يولّد ملف التقرير ويحفظه على القرص ويحدّث حالة المهمة.
+    حفظ النتيجة مشروط بالحجز الحالي (الحالة ووقت البدء)، فإذا أُعيدت المهمة إلى الانتظار
+    وحجزها عامل آخر لا يكتب العامل القديم فوق نتيجته ويحذف الملف الذي ولّده.
+    """
+    builder = REPORT_BUILDERS[job.report_type]
+    claimed = ReportJob.objects.filter(pk=job.pk, status=ReportJob.STATUS_RUNNING, started_at=job.started_at)
+    written = None
+    try:
+        with _heartbeat(claimed):
+            # بصمة البيانات لحظة التوليد، حتى تطابق محتوى الملف الفعلي
+            job.data_fingerprint = builder.fingerprint(job.params)
+            writer = ExportWriter(job.file_format, sheet_name='Report')
+            filename = builder.build(writer, job.params)
+            job.filename = f'{filename}.{job.file_format}'
+            with writer.close() as output:
+                job.file.save(f'report_{job.pk}.{job.file_format}', File(output), save=False)
+                written = job.file.name
+        job.status = ReportJob.STATUS_DONE
+        job.error = ''
+    except Exception as e:
+        logger.exception("Report job %s failed.", job.pk)
+        job.status = ReportJob.STATUS_FAILED
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    updated = claimed.update(
+        status=job.status,
+        error=job.error,
+        file=job.file.name,
+        filename=job.filename,
+        data_fingerprint=job.data_fingerprint,
+        finished_at=job.finished_at,
+        updated_at=job.finished_at,
+    )
+    if not updated:
+        logger.warning("Report job %s was reclaimed, discarding this worker's result.", job.pk)
+        if written:
+            job.file.storage.delete(written)
+        job.refresh_from_db()
+    return job
+
+
+def cleanup_report_jobs(now=None):
+    """
+    يحذف المهام المنتهية منذ أكثر من REPORT_RETENTION، والمهام المكتملة التي حلت محلها
+    مهمة مكتملة أحدث لنفس المستخدم ونفس المعاملات (بيانات أحدث).
+    يُحذف الملف فقط إذا لم تعد أي مهمة متبقية تشير إليه (الملفات المشاركة بين المستخدمين).
+    يعيد عدد المهام المحذوفة.
+    """
+    now = now or timezone.now()
+    newer = ReportJob.objects.filter(
+        status=ReportJob.STATUS_DONE,
+        params_hash=OuterRef('params_hash'),
+        requested_by=OuterRef('requested_by'),
+        finished_at__gt=OuterRef('finished_at'),
+    ).exclude(data_fingerprint=OuterRef('data_fingerprint'))
+    expired = ReportJob.objects.filter(
+        status__in=[ReportJob.STATUS_DONE, ReportJob.STATUS_FAILED], finished_at__lt=now - REPORT_RETENTION,
+    )
+    superseded = ReportJob.objects.filter(status=ReportJob.STATUS_DONE).filter(Exists(newer))
+    job_ids = set(expired.values_list('pk', flat=True)) | set(superseded.values_list('pk', flat=True))
+    if not job_ids:
+        return 0
+
+    jobs = ReportJob.objects.filter(pk__in=job_ids)
+    file_names = set(jobs.exclude(file='').exclude(file__isnull=True).values_list('file', flat=True))
+    jobs.delete()
+    still_used = set(ReportJob.objects.filter(file__in=file_names).values_list('file', flat=True))
+    storage = ReportJob._meta.get_field('file').storage
+    for name in file_names - still_used:
+        storage.delete(name)
+    return len(job_ids)
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports.jobs import claim_next_job, cleanup_report_jobs, run_job
+
+# تنظيف المهام المنتهية وملفاتها مرة كل ساعة على الأكثر
+CLEANUP_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = "تشغيل عامل توليد التقارير: يعالج مهام ReportJob المنتظرة ويحفظ الملفات الناتجة على القرص."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="معالجة جميع المهام المنتظرة ثم الخروج.",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help="عدد الثواني بين كل فحص للمهام الجديدة.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("بدء عامل التقارير...")
+        last_cleanup = None
+        while True:
+            if last_cleanup is None or time.monotonic() - last_cleanup >= CLEANUP_INTERVAL:
+                removed = cleanup_report_jobs()
+                if removed:
+                    self.stdout.write(f"حُذفت {removed} مهمة تقرير منتهية مع ملفاتها.")
+                last_cleanup = time.monotonic()
+
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            job = run_job(job)
+            if job.status == job.STATUS_DONE:
+                self.stdout.write(self.style.SUCCESS(f"تم توليد التقرير #{job.pk}."))
+            elif job.status == job.STATUS_FAILED:
+                self.stdout.write(self.style.ERROR(f"فشل توليد التقرير #{job.pk}: {job.error}"))
+            else:
+                self.stdout.write(self.style.WARNING(f"أُعيد حجز التقرير #{job.pk} من عامل آخر."))
@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 08:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ آخر تحديث')),
+                ('report_type', models.CharField(choices=[('section_grade_averages', 'معدلات طلاب الشعبة'), ('school_attendance', 'حضور المدرسة'), ('progression_results', 'نتائج الترفيع')], max_length=50, verbose_name='نوع التقرير')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='معاملات التقرير')),
+                ('file_format', models.CharField(choices=[('xlsx', 'Excel (xlsx)'), ('csv', 'CSV')], default='xlsx', max_length=10, verbose_name='صيغة الملف')),
+                ('params_hash', models.CharField(db_index=True, help_text='بصمة نوع التقرير ومعاملاته وصيغته، تُستخدم لإعادة استخدام النتائج.', max_length=64, verbose_name='بصمة المعاملات')),
+                ('data_fingerprint', models.CharField(blank=True, help_text='تتغير عند تعديل البيانات التي يعتمد عليها التقرير.', max_length=255, verbose_name='بصمة البيانات')),
+                ('status', models.CharField(choices=[('pending', 'في الانتظار'), ('running', 'قيد التنفيذ'), ('done', 'مكتمل'), ('failed', 'فشل')], db_index=True, default='pending', max_length=10, verbose_name='الحالة')),
+                ('file', models.FileField(blank=True, null=True, upload_to='report_jobs/%Y/%m/', verbose_name='الملف الناتج')),
+                ('filename', models.CharField(blank=True, max_length=255, verbose_name='اسم الملف')),
+                ('error', models.TextField(blank=True, verbose_name='رسالة الخطأ')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='وقت البدء')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='وقت الانتهاء')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='report_jobs', to=settings.AUTH_USER_MODEL, verbose_name='طُلب بواسطة')),
+            ],
+            options={
+                'verbose_name': 'مهمة تقرير',
+                'verbose_name_plural': 'مهام التقارير',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
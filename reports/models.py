@@ -0,0 +1,110 @@
+# reports/models.py
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from accounts.models import AutoCreateAndAutoUpdateTimeStampedModel, User
+
+
+class ReportJob(AutoCreateAndAutoUpdateTimeStampedModel):
+    """
+    مهمة توليد تقرير ثقيل خارج دورة الطلب. تُنشأ بحالة pending ويعالجها العامل
+    (الأمر run_report_worker) ثم يُحفظ الملف الناتج على القرص.
+    المهام ذات المعاملات نفسها وبصمة البيانات نفسها يُعاد استخدام نتيجتها.
+    """
+    REPORT_TYPE_CHOICES = [
+        ('section_grade_averages', _('معدلات طلاب الشعبة')),
+        ('school_attendance', _('حضور المدرسة')),
+        ('progression_results', _('نتائج الترفيع')),
+    ]
+
+    FILE_FORMAT_CHOICES = [
+        ('xlsx', 'Excel (xlsx)'),
+        ('csv', 'CSV'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _('في الانتظار')),
+        (STATUS_RUNNING, _('قيد التنفيذ')),
+        (STATUS_DONE, _('مكتمل')),
+        (STATUS_FAILED, _('فشل')),
+    ]
+
+    report_type = models.CharField(
+        max_length=50,
+        choices=REPORT_TYPE_CHOICES,
+        verbose_name=_("نوع التقرير")
+    )
+    params = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_("معاملات التقرير")
+    )
+    file_format = models.CharField(
+        max_length=10,
+        choices=FILE_FORMAT_CHOICES,
+        default='xlsx',
+        verbose_name=_("صيغة الملف")
+    )
+    params_hash = models.CharField(
+        max_length=64,
+        db_index=True,
+        verbose_name=_("بصمة المعاملات"),
+        help_text=_("بصمة نوع التقرير ومعاملاته وصيغته، تُستخدم لإعادة استخدام النتائج.")
+    )
+    data_fingerprint = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name=_("بصمة البيانات"),
+        help_text=_("تتغير عند تعديل البيانات التي يعتمد عليها التقرير.")
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        db_index=True,
+        verbose_name=_("الحالة")
+    )
+    file = models.FileField(
+        upload_to='report_jobs/%Y/%m/',
+        null=True,
+        blank=True,
+        verbose_name=_("الملف الناتج")
+    )
+    filename = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name=_("اسم الملف")
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name=_("رسالة الخطأ")
+    )
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='report_jobs',
+        verbose_name=_("طُلب بواسطة")
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("وقت البدء")
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("وقت الانتهاء")
+    )
+
+    class Meta:
+        verbose_name = _("مهمة تقرير")
+        verbose_name_plural = _("مهام التقارير")
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_report_type_display()} #{self.pk} ({self.get_status_display()})"
@@ -0,0 +1,29 @@
+from rest_framework import serializers
+from django.urls import reverse
+from .models import ReportJob
+
+
+class ReportJobCreateSerializer(serializers.Serializer):
+    report_type = serializers.ChoiceField(choices=ReportJob.REPORT_TYPE_CHOICES)
+    params = serializers.DictField(required=False, default=dict)
+    file_format = serializers.ChoiceField(choices=ReportJob.FILE_FORMAT_CHOICES, default='xlsx')
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    report_type_display = serializers.CharField(source='get_report_type_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'report_type', 'report_type_display', 'params', 'file_format',
+            'status', 'status_display', 'error', 'filename', 'download_url',
+            'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != ReportJob.STATUS_DONE or not obj.file:
+            return None
+        return reverse('report-job-download', args=[obj.pk])
@@ -0,0 +1,122 @@
+import datetime
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from Schoolo.testing import SchoolTestDataMixin
+from .jobs import REPORT_RETENTION, STALE_JOB_TIMEOUT, claim_next_job, cleanup_report_jobs, enqueue_report, run_job
+from .models import ReportJob
+
+
+class ReportJobTests(SchoolTestDataMixin, TestCase):
+    """
+    صلاحيات طلب التقارير حسب النوع، وإعادة استخدام النتائج لكل مستخدم، واسترجاع المهام المتوقفة.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.teacher_a = User.objects.create_teacher_user('0922222222', 'x', is_active=True)
+        cls.teacher_b = User.objects.create_teacher_user('0933333333', 'x', is_active=True)
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def _request(self, user, report_type, params):
+        self.authenticate(user)
+        return self.client.post(
+            '/api/reports/jobs/', {'report_type': report_type, 'params': params}, format='json',
+        )
+
+    def test_admin_only_reports_reject_teachers(self):
+        params = {'academic_year_id': self.year.pk}
+        self.assertEqual(self._request(self.teacher_a, 'progression_results', params).status_code, 403)
+        self.assertEqual(self._request(self.teacher_a, 'school_attendance', params).status_code, 403)
+        self.assertEqual(self._request(self.admin_user, 'progression_results', params).status_code, 202)
+        self.assertEqual(
+            self._request(self.teacher_a, 'section_grade_averages', {'section_id': self.section.pk}).status_code, 202,
+        )
+
+    def test_reuse_is_per_requester(self):
+        params = {'section_id': self.section.pk}
+        first, reused = enqueue_report('section_grade_averages', params, 'csv', user=self.teacher_a)
+        self.assertFalse(reused)
+
+        # مهمة معلم آخر قيد الانتظار لا تُعاد لغيره
+        pending, reused = enqueue_report('section_grade_averages', params, 'csv', user=self.teacher_b)
+        self.assertFalse(reused)
+        self.assertNotEqual(pending.pk, first.pk)
+        pending.delete()
+
+        run_job(claim_next_job())
+        again, reused = enqueue_report('section_grade_averages', params, 'csv', user=self.teacher_a)
+        self.assertTrue(reused)
+        self.assertEqual(again.pk, first.pk)
+
+        # الملف المكتمل يُشارك عبر مهمة جديدة باسم المعلم الثاني فتظهر في قائمته
+        shared, reused = enqueue_report('section_grade_averages', params, 'csv', user=self.teacher_b)
+        self.assertTrue(reused)
+        self.assertNotEqual(shared.pk, first.pk)
+        self.assertEqual(shared.status, ReportJob.STATUS_DONE)
+        self.assertEqual(shared.file.name, ReportJob.objects.get(pk=first.pk).file.name)
+
+        self.authenticate(self.teacher_b)
+        response = self.client.get(f'/api/reports/jobs/{shared.pk}/download/')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    def test_stale_running_job_is_requeued(self):
+        job, _ = enqueue_report('section_grade_averages', {'section_id': self.section.pk}, 'csv', user=self.admin_user)
+        self.assertEqual(claim_next_job().pk, job.pk)
+        self.assertIsNone(claim_next_job())
+
+        ReportJob.objects.filter(pk=job.pk).update(
+            updated_at=timezone.now() - STALE_JOB_TIMEOUT - datetime.timedelta(minutes=1),
+        )
+        stale = ReportJob.objects.get(pk=job.pk)
+        reclaimed = claim_next_job()
+        self.assertEqual(reclaimed.pk, job.pk)
+        self.assertEqual(run_job(reclaimed).status, ReportJob.STATUS_DONE)
+        file_name = ReportJob.objects.get(pk=job.pk).file.name
+
+        # العامل القديم (بوقت حجزه السابق) لا يكتب فوق نتيجة العامل الجديد ويحذف ملفه
+        stale.started_at -= datetime.timedelta(seconds=1)
+        with self.assertLogs('reports.jobs', level='WARNING'):
+            run_job(stale)
+        self.assertEqual(ReportJob.objects.get(pk=job.pk).file.name, file_name)
+        self.assertEqual(os.listdir(os.path.dirname(os.path.join(self.media_root, file_name))), [os.path.basename(file_name)])
+
+    def _file_path(self, job):
+        return os.path.join(self.media_root, job.file.name)
+
+    def test_cleanup_removes_expired_and_superseded_files(self):
+        params = {'section_id': self.section.pk}
+        old, _ = enqueue_report('section_grade_averages', params, 'csv', user=self.teacher_a)
+        old = run_job(claim_next_job())
+        shared, _ = enqueue_report('section_grade_averages', params, 'csv', user=self.teacher_b)
+
+        # تغيّر البيانات يُنتج مهمة جديدة للمعلم الأول تحل محل القديمة
+        ReportJob.objects.filter(pk__in=[old.pk, shared.pk]).update(data_fingerprint='old')
+        new, _ = enqueue_report('section_grade_averages', params, 'csv', user=self.teacher_a)
+        new = run_job(claim_next_job())
+        self.assertNotEqual(new.pk, old.pk)
+
+        # الملف القديم ما زال مستخدماً في مهمة المعلم الثاني فلا يُحذف
+        self.assertEqual(cleanup_report_jobs(), 1)
+        self.assertFalse(ReportJob.objects.filter(pk=old.pk).exists())
+        self.assertTrue(os.path.exists(self._file_path(shared)))
+
+        # بعد انتهاء مدة الاحتفاظ تُحذف المهام المتبقية وملفاتها
+        self.assertEqual(cleanup_report_jobs(now=timezone.now() + REPORT_RETENTION + datetime.timedelta(days=1)), 2)
+        self.assertFalse(ReportJob.objects.exists())
+        self.assertFalse(os.path.exists(self._file_path(shared)))
+        self.assertFalse(os.path.exists(self._file_path(new)))
@@ -0,0 +1,60 @@
+from django.http import FileResponse
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .builders import REPORT_BUILDERS
+from .jobs import enqueue_report
+from .models import ReportJob
+from .serializers import ReportJobCreateSerializer, ReportJobSerializer
+
+
+class ReportJobViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    طلب التقارير الثقيلة بشكل غير متزامن:
+    - POST: إنشاء مهمة (أو إعادة مهمة مطابقة سابقة) ويعالجها العامل run_report_worker.
+    - GET /<id>/: حالة المهمة.
+    - GET /<id>/download/: تحميل الملف بعد اكتمال المهمة.
+    """
+    serializer_class = ReportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = ReportJob.objects.all()
+        if not (user.is_superuser or user.is_admin()):
+            queryset = queryset.filter(requested_by=user)
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        user = request.user
+        is_admin = user.is_superuser or user.is_admin()
+        if not (is_admin or user.is_teacher()):
+            return Response({"error": "لا تملك الصلاحية لطلب التقارير."}, status=status.HTTP_403_FORBIDDEN)
+
+        input_serializer = ReportJobCreateSerializer(data=request.data)
+        input_serializer.is_valid(raise_exception=True)
+        report_type = input_serializer.validated_data['report_type']
+        # نفس صلاحيات واجهة التقرير المباشرة لكل نوع
+        if REPORT_BUILDERS[report_type].admin_only and not is_admin:
+            return Response({"error": "لا تملك الصلاحية لطلب هذا التقرير."}, status=status.HTTP_403_FORBIDDEN)
+
+        job, reused = enqueue_report(
+            report_type,
+            input_serializer.validated_data['params'],
+            input_serializer.validated_data['file_format'],
+            user=user,
+        )
+        data = self.get_serializer(job).data
+        data['reused'] = reused
+        return Response(data, status=status.HTTP_200_OK if reused else status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != ReportJob.STATUS_DONE or not job.file:
+            return Response(
+                {"error": "التقرير غير جاهز بعد.", "status": job.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.filename)
@@ -0,0 +1,63 @@
+# schedules/counters.py
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from subject.models import SectionSubjectRequirement
+from .models import SectionSubjectLessonCount
+
+
+def lesson_key(schedule):
+    return (schedule.section_id, schedule.subject_id, schedule.academic_year_id, schedule.academic_term_id)
+
+
+def adjust_lesson_counts(deltas):
+    """
+    يضيف (أو يطرح) عدد الحصص لكل مفتاح (section_id, subject_id, academic_year_id, academic_term_id)
+    بتحديث ذري عبر F() دون قراءة العدّاد أولاً. المفاتيح غير الموجودة تُنشأ عند الزيادة.
+    """
+    for key, delta in Counter(deltas).items():
+        if not delta or None in key:
+            continue
+        section_id, subject_id, academic_year_id, academic_term_id = key
+        lookup = dict(
+            section_id=section_id, subject_id=subject_id,
+            academic_year_id=academic_year_id, academic_term_id=academic_term_id,
+        )
+        counters = SectionSubjectLessonCount.objects.filter(**lookup)
+        # العمود بلا إشارة في MySQL، فلا يُطرح إلا إذا بقيت النتيجة موجبة
+        increment = Case(
+            When(scheduled_lessons__gte=-delta, then=F('scheduled_lessons') + delta), default=Value(0),
+        ) if delta < 0 else F('scheduled_lessons') + delta
+        if counters.update(scheduled_lessons=increment) or delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                SectionSubjectLessonCount.objects.create(scheduled_lessons=delta, **lookup)
+        except IntegrityError:
+            # أنشأه طلب متزامن في نفس اللحظة، فنعيد الزيادة على الموجود
+            counters.update(scheduled_lessons=increment)
+
+
+def annotate_lesson_counts(subjects, section_id, academic_year_id=None, academic_term_id=None):
+    """
+    يضيف إلى queryset المواد الحقلين scheduled_lessons و required_lessons لشعبة معينة
+    (من العدّادات ومتطلبات الشعبة) كاستعلامات فرعية، فتُجلب القائمة كاملة باستعلام واحد.
+    بدون عام وفصل تُجمع حصص كل الفصول.
+    """
+    counters = SectionSubjectLessonCount.objects.filter(section_id=section_id, subject_id=OuterRef('pk'))
+    if academic_year_id and academic_term_id:
+        counters = counters.filter(academic_year_id=academic_year_id, academic_term_id=academic_term_id)
+    scheduled = counters.values('subject_id').annotate(total=Sum('scheduled_lessons')).values('total')
+    required = SectionSubjectRequirement.objects.filter(
+        section_id=section_id, subject_id=OuterRef('pk'),
+    ).values('weekly_lessons_required')[:1]
+    return subjects.annotate(
+        scheduled_lessons=Coalesce(Subquery(scheduled, output_field=IntegerField()), Value(0)),
+        required_lessons=Coalesce(
+            Subquery(required, output_field=IntegerField()), F('default_weekly_lessons'),
+            output_field=IntegerField(),
+        ),
+    )
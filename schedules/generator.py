@@ -0,0 +1,334 @@
+# schedules/generator.py
+from collections import defaultdict, namedtuple
+
+from django.db import models, transaction
+
+from academic.models import DayOfWeek, TimeSlot
+from classes.models import Section
+from schedules.models import ClassSchedule, ProposedClassSchedule
+from subject.models import Subject, SectionSubjectRequirement, TeacherSubject
+from teachers.models import TeacherAvailability
+
+
+GeneratedLesson = namedtuple('GeneratedLesson', 'section_id subject_id teacher_id day_id slot_id')
+TimetableResult = namedtuple('TimetableResult', 'lessons unplaced repairs')
+
+
+class _Unit:
+    """
+    مادة واحدة في شعبة واحدة مع معلمها وعدد الحصص التي ما زالت بحاجة إلى خانة.
+    """
+    __slots__ = ('section', 'subject_id', 'teacher', 'remaining', 'day_counts')
+
+    def __init__(self, section, subject_id, teacher, remaining, days_count):
+        self.section = section
+        self.subject_id = subject_id
+        self.teacher = teacher
+        self.remaining = remaining
+        self.day_counts = [0] * days_count
+
+
+class TimetableGenerator:
+    """
+    مولّد جدول الحصص لفصل دراسي كامل.
+    الحالة كلها مصفوفات بالفهرس: لكل شعبة ولكل معلم عدد صحيح (bitset) بت لكل خانة (يوم، فترة).
+    البحث: في كل خطوة تُختار المادة الأكثر تقييداً (أقل خانات حرة نسبةً لما تبقى لها)،
+    وتوضع في الخانة الأقل طلباً من باقي مواد الشعبة. عند طريق مسدود يُجرّب تراجع محلي بنقل حصة واحدة
+    تمنع الخانة، وإلا تُسجّل الحصة كناقصة ويستمر التوليد، فيبقى الزمن خطياً تقريباً في عدد الحصص.
+    """
+
+    def __init__(self, academic_year, academic_term, section_ids=None):
+        self.academic_year = academic_year
+        self.academic_term = academic_term
+        self.section_ids = section_ids
+
+    def _load(self):
+        days = list(DayOfWeek.objects.filter(is_school_day=True).order_by('id').values_list('id', flat=True))
+        slots = list(TimeSlot.objects.filter(is_break=False).order_by('slot_number').values_list('id', flat=True))
+        self.day_ids, self.slot_ids = days, slots
+        self.slots_per_day = len(slots)
+        positions = len(days) * len(slots)
+        self.full_mask = (1 << positions) - 1
+        self.day_masks = [self._day_mask(day) for day in range(len(days))]
+        day_index = {day_id: i for i, day_id in enumerate(days)}
+        slot_index = {slot_id: i for i, slot_id in enumerate(slots)}
+
+        sections = Section.objects.filter(academic_year=self.academic_year, is_active=True)
+        if self.section_ids is not None:
+            sections = sections.filter(id__in=self.section_ids)
+        sections = list(sections.values('id', 'class_obj_id'))
+        self.section_index = {row['id']: i for i, row in enumerate(sections)}
+        self.section_busy = [0] * len(sections)
+
+        subjects = list(Subject.objects.filter(
+            models.Q(class_obj_id__in={row['class_obj_id'] for row in sections}) |
+            models.Q(section_id__in=self.section_index),
+            academic_term=self.academic_term, is_active=True,
+        ).values('id', 'class_obj_id', 'section_id', 'default_weekly_lessons'))
+        section_subjects = defaultdict(dict)
+        for row in sections:
+            for subject in subjects:
+                if subject['section_id'] == row['id'] or (
+                    subject['section_id'] is None and subject['class_obj_id'] == row['class_obj_id']
+                ):
+                    section_subjects[row['id']][subject['id']] = subject['default_weekly_lessons']
+        for section_id, subject_id, required in SectionSubjectRequirement.objects.filter(
+            section_id__in=self.section_index,
+        ).values_list('section_id', 'subject_id', 'weekly_lessons_required'):
+            if subject_id in section_subjects[section_id]:
+                section_subjects[section_id][subject_id] = required
+
+        candidates = defaultdict(list)
+        for teacher_id, subject_id in TeacherSubject.objects.filter(
+            subject_id__in={s['id'] for s in subjects},
+        ).order_by('teacher_id').values_list('teacher_id', 'subject_id'):
+            candidates[subject_id].append(teacher_id)
+
+        availability = defaultdict(int)
+        for teacher_id, day_id in TeacherAvailability.objects.filter(
+            teacher_id__in={t for ts in candidates.values() for t in ts},
+        ).values_list('teacher_id', 'day_of_week_id'):
+            if day_id in day_index:
+                availability[teacher_id] |= self._day_mask(day_index[day_id])
+
+        # الحصص المعتمدة مسبقاً في الفصل تشغل خاناتها وتُطرح من المطلوب
+        self.teacher_index = {}
+        self.teacher_busy = []
+        self.teacher_allowed = []
+        scheduled = defaultdict(int)
+        existing = ClassSchedule.objects.filter(
+            academic_year=self.academic_year, academic_term=self.academic_term,
+        ).filter(
+            models.Q(section_id__in=self.section_index) |
+            models.Q(teacher_id__in={t for ts in candidates.values() for t in ts})
+        ).values_list('section_id', 'subject_id', 'teacher_id', 'day_of_week_id', 'time_slot_id')
+        for section_id, subject_id, teacher_id, day_id, slot_id in existing:
+            if day_id not in day_index or slot_id not in slot_index:
+                continue
+            bit = 1 << (day_index[day_id] * self.slots_per_day + slot_index[slot_id])
+            if section_id in self.section_index:
+                self.section_busy[self.section_index[section_id]] |= bit
+                scheduled[(section_id, subject_id)] += 1
+            if teacher_id is not None:
+                self.teacher_busy[self._teacher(teacher_id, availability)] |= bit
+
+        # إسناد معلم لكل مادة في كل شعبة حسب الحمل وأيام التوفر (انظر _teacher_cost)
+        load = defaultdict(int)
+        self.units, self.unplaced = [], []
+        self.section_units = defaultdict(list)
+        for row in sections:
+            section = self.section_index[row['id']]
+            section_demand = []
+            for subject_id, required in section_subjects[row['id']].items():
+                remaining = required - scheduled[(row['id'], subject_id)]
+                if remaining <= 0:
+                    continue
+                if not candidates[subject_id]:
+                    self.unplaced.append({
+                        'section_id': row['id'], 'subject_id': subject_id,
+                        'missing_lessons': remaining, 'reason': 'no_teacher',
+                    })
+                    continue
+                teacher = min(
+                    (self._teacher(teacher_id, availability) for teacher_id in candidates[subject_id]),
+                    key=lambda t: (self._teacher_cost(t, section, remaining, load, section_demand), load[t]),
+                )
+                load[teacher] += remaining
+                section_demand.append((self.teacher_allowed[teacher], remaining))
+                self.units.append(_Unit(section, subject_id, teacher, remaining, len(days)))
+                self.section_units[section].append(self.units[-1])
+
+    def _teacher_cost(self, teacher, section, remaining, load, section_demand):
+        """
+        كلفة إسناد المادة لهذا المعلم: الأسوأ بين حمل المعلم نسبةً لخاناته المتاحة،
+        وضغط الشعبة على أيام التوفر المقيّدة (حصص المعلمين المقيّدين بأيام ضمنها نسبةً لخانات الشعبة فيها).
+        المعلم المتاح كل الأيام لا يزيد ضغط الأيام المقيّدة، فيُفضّل ما دام حمله منخفضاً.
+        """
+        allowed = self.teacher_allowed[teacher]
+        capacity = (allowed & ~self.teacher_busy[teacher]).bit_count() or 1
+        pressure = 0
+        for mask in {mask for mask, _ in section_demand if mask != self.full_mask} | {allowed}:
+            if mask == self.full_mask:
+                continue
+            within = sum(lessons for other, lessons in section_demand if not other & ~mask)
+            if not allowed & ~mask:
+                within += remaining
+            pressure = max(pressure, within / ((mask & ~self.section_busy[section]).bit_count() or 1))
+        return max((load[teacher] + remaining) / capacity, pressure)
+
+    def _day_mask(self, day):
+        return ((1 << self.slots_per_day) - 1) << (day * self.slots_per_day)
+
+    def _teacher(self, teacher_id, availability):
+        if teacher_id not in self.teacher_index:
+            self.teacher_index[teacher_id] = len(self.teacher_busy)
+            self.teacher_busy.append(0)
+            # المعلم الذي لم يحدد أيام توفره متاح في كل الأيام الدراسية
+            self.teacher_allowed.append(availability.get(teacher_id) or self.full_mask)
+        return self.teacher_index[teacher_id]
+
+    def _free(self, unit):
+        return (
+            self.teacher_allowed[unit.teacher]
+            & ~self.teacher_busy[unit.teacher]
+            & ~self.section_busy[unit.section]
+            & self.full_mask
+        )
+
+    @staticmethod
+    def _positions(mask):
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def _candidates(self, unit, free):
+        """
+        خانات الحصة مرتبة بحيث تُترك الخانات الأكثر طلباً لباقي مواد الشعبة (least constraining value):
+        لكل خانة طلب المواد الأخرى عليها، مضافاً إليه عدد حصص المادة نفسها في ذلك اليوم لتوزيعها على الأيام،
+        ثم الأيام الأخف على الشعبة، ثم الفترات المبكرة.
+        """
+        demand = defaultdict(float)
+        for other in self.section_units[unit.section]:
+            if other is unit or not other.remaining:
+                continue
+            other_free = self._free(other)
+            count = other_free.bit_count()
+            if count:
+                weight = other.remaining / count
+                for position in self._positions(other_free & free):
+                    demand[position] += weight
+
+        section_busy = self.section_busy[unit.section]
+        day_loads = [(section_busy & mask).bit_count() for mask in self.day_masks]
+        positions = []
+        for position in self._positions(free):
+            day = position // self.slots_per_day
+            positions.append((demand[position] + unit.day_counts[day], day_loads[day], position))
+        positions.sort()
+        return [position for _, _, position in positions]
+
+    def _select(self):
+        """
+        اختيار المادة الأكثر تقييداً (أقل فائض خانات حرة عن الحصص المتبقية).
+        """
+        best, best_slack = None, None
+        for unit in self.units:
+            if not unit.remaining:
+                continue
+            slack = self._free(unit).bit_count() - unit.remaining
+            if best is None or slack < best_slack:
+                best, best_slack = unit, slack
+                if slack < 0:
+                    break
+        return best
+
+    def _place(self, unit, position):
+        bit = 1 << position
+        self.section_busy[unit.section] |= bit
+        self.teacher_busy[unit.teacher] |= bit
+        self.section_occupant[(unit.section, position)] = unit
+        self.teacher_occupant[(unit.teacher, position)] = unit
+        unit.day_counts[position // self.slots_per_day] += 1
+        unit.remaining -= 1
+
+    def _unplace(self, unit, position):
+        bit = 1 << position
+        self.section_busy[unit.section] &= ~bit
+        self.teacher_busy[unit.teacher] &= ~bit
+        del self.section_occupant[(unit.section, position)]
+        del self.teacher_occupant[(unit.teacher, position)]
+        unit.day_counts[position // self.slots_per_day] -= 1
+        unit.remaining += 1
+
+    def _repair(self, unit):
+        """
+        تراجع محلي عند طريق مسدود: البحث عن خانة يمنعها حصة واحدة فقط (من نفس الشعبة أو لنفس المعلم)
+        يمكن نقلها إلى خانة حرة أخرى، فتُنقل وتوضع الحصة الجديدة مكانها.
+        """
+        allowed = self.teacher_allowed[unit.teacher] & self.full_mask
+        section_busy = self.section_busy[unit.section]
+        teacher_busy = self.teacher_busy[unit.teacher]
+        blocked = (
+            (allowed & ~teacher_busy & section_busy, self.section_occupant, unit.section),
+            (allowed & ~section_busy & teacher_busy, self.teacher_occupant, unit.teacher),
+        )
+        for mask, occupants, owner in blocked:
+            for position in self._positions(mask):
+                other = occupants.get((owner, position))
+                if other is None or other is unit:
+                    # الخانة مشغولة بحصة معتمدة مسبقاً فلا تُنقل
+                    continue
+                alternatives = self._free(other)
+                if alternatives:
+                    self._unplace(other, position)
+                    self._place(other, self._candidates(other, alternatives)[0])
+                    self._place(unit, position)
+                    return True
+        return False
+
+    def generate(self):
+        self._load()
+        self.section_occupant, self.teacher_occupant = {}, {}
+        missing = defaultdict(int)
+        repairs = 0
+
+        while True:
+            unit = self._select()
+            if unit is None:
+                break
+            free = self._free(unit)
+            if free:
+                self._place(unit, self._candidates(unit, free)[0])
+            elif self._repair(unit):
+                repairs += 1
+            else:
+                # لا خانة ممكنة لهذه الحصة: تُسجّل كحصة ناقصة ويكمل التوليد لباقي الحصص
+                unit.remaining -= 1
+                missing[id(unit)] += 1
+
+        section_ids = {index: section_id for section_id, index in self.section_index.items()}
+        teacher_ids = {index: teacher_id for teacher_id, index in self.teacher_index.items()}
+        lessons = []
+        for (section, position), unit in sorted(self.section_occupant.items(), key=lambda item: item[0]):
+            day, slot = divmod(position, self.slots_per_day)
+            lessons.append(GeneratedLesson(
+                section_ids[section], unit.subject_id, teacher_ids[unit.teacher],
+                self.day_ids[day], self.slot_ids[slot],
+            ))
+        unplaced = list(self.unplaced)
+        for unit in self.units:
+            if missing[id(unit)]:
+                unplaced.append({
+                    'section_id': section_ids[unit.section], 'subject_id': unit.subject_id,
+                    'missing_lessons': missing[id(unit)], 'reason': 'no_free_slot',
+                })
+        return TimetableResult(lessons, unplaced, repairs)
+
+
+def save_proposals(result, academic_year, academic_term, section_ids):
+    """
+    يستبدل الجداول المقترحة غير المقبولة للشعب المعطاة بنتيجة التوليد، بعملية bulk_create واحدة.
+    """
+    day_codes = [code for code, _ in ProposedClassSchedule.DAY_OF_WEEK_CHOICES]
+    slot_numbers = dict(TimeSlot.objects.values_list('id', 'slot_number'))
+    proposals = [
+        ProposedClassSchedule(
+            subject_id=lesson.subject_id,
+            section_id=lesson.section_id,
+            teacher_id=lesson.teacher_id,
+            academic_year=academic_year,
+            academic_term=academic_term,
+            # معرفات DayOfWeek تبدأ من الاثنين=1 بنفس ترتيب DAY_OF_WEEK_CHOICES
+            day_of_week=day_codes[lesson.day_id - 1],
+            period=str(slot_numbers[lesson.slot_id]),
+        )
+        for lesson in result.lessons
+    ]
+    with transaction.atomic():
+        ProposedClassSchedule.objects.filter(
+            academic_year=academic_year, academic_term=academic_term,
+            section_id__in=section_ids,
+        ).exclude(status='accepted').delete()
+        ProposedClassSchedule.objects.bulk_create(proposals, batch_size=1000)
+    return proposals
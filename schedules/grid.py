@@ -0,0 +1,95 @@
+# schedules/grid.py
+from django.core.cache import cache
+
+from academic.models import DayOfWeek, TimeSlot
+from Schoolo.cache import CacheVersion
+from schedules.models import ClassSchedule
+
+GRID_CACHE_TIMEOUT = 60 * 60 * 24
+GRID_SCOPES = {
+    'section': 'section_id',
+    'teacher': 'teacher_id',
+    'class': 'section__class_obj_id',
+}
+
+
+def grid_cache_key(academic_term_id, version, scope, object_id):
+    return f'schedules:grid:{academic_term_id}:{version}:{scope}:{object_id}'
+
+
+# نسخة جدول الحصص لكل فصل دراسي: رفعها يُهمل كل الشبكات المخزنة للفصل
+schedule_versions = CacheVersion('schedules:grid_version')
+get_schedule_version = schedule_versions.get
+bump_schedule_version = schedule_versions.bump
+
+
+def build_timetable_grid(academic_term, scope, object_id):
+    """
+    يبني مصفوفة أيام × فترات كاملة لشعبة أو معلم أو صف في فصل دراسي (ثلاثة استعلامات).
+    كل خانة قائمة بالحصص فيها (فارغة إذا لم توجد حصة)، والأسماء في جداول منفصلة
+    (subjects, teachers, sections) حتى لا تتكرر في كل خانة.
+    """
+    rows = ClassSchedule.objects.filter(
+        academic_term=academic_term, **{GRID_SCOPES[scope]: object_id}
+    ).values_list(
+        'id', 'day_of_week_id', 'time_slot_id',
+        'subject_id', 'subject__name',
+        'teacher_id', 'teacher__user__first_name', 'teacher__user__last_name',
+        'section_id', 'section__name',
+    )
+    rows = list(rows)
+    lesson_days = {row[1] for row in rows}
+
+    days = [
+        {'id': day.id, 'name_ar': day.name_ar}
+        for day in DayOfWeek.objects.all()
+        if day.is_school_day or day.id in lesson_days
+    ]
+    slots = [
+        {
+            'id': slot.id, 'slot_number': slot.slot_number, 'name': slot.name,
+            'start_time': slot.start_time.strftime('%H:%M'), 'end_time': slot.end_time.strftime('%H:%M'),
+            'is_break': slot.is_break,
+        }
+        for slot in TimeSlot.objects.all()
+    ]
+    day_index = {day['id']: i for i, day in enumerate(days)}
+    slot_index = {slot['id']: i for i, slot in enumerate(slots)}
+
+    grid = [[[] for _ in slots] for _ in days]
+    subjects, teachers, sections = {}, {}, {}
+    for (lesson_id, day_id, slot_id, subject_id, subject_name,
+         teacher_id, first_name, last_name, section_id, section_name) in rows:
+        grid[day_index[day_id]][slot_index[slot_id]].append({
+            'id': lesson_id, 'subject': subject_id, 'teacher': teacher_id, 'section': section_id,
+        })
+        subjects[subject_id] = subject_name
+        sections[section_id] = section_name
+        if teacher_id is not None:
+            teachers[teacher_id] = f"{first_name} {last_name}".strip()
+
+    return {
+        'academic_term': academic_term.id,
+        'scope': scope,
+        'id': object_id,
+        'days': days,
+        'slots': slots,
+        'grid': grid,
+        'subjects': subjects,
+        'teachers': teachers,
+        'sections': sections,
+    }
+
+
+def get_timetable_grid(academic_term, scope, object_id):
+    """
+    يعيد شبكة الجدول من الكاش بمفتاح (الفصل، نسخة الجدول)، ويبنيها عند عدم وجودها.
+    """
+    version = get_schedule_version(academic_term.id)
+    key = grid_cache_key(academic_term.id, version, scope, object_id)
+    grid = cache.get(key)
+    if grid is None:
+        grid = build_timetable_grid(academic_term, scope, object_id)
+        grid['version'] = version
+        cache.set(key, grid, GRID_CACHE_TIMEOUT)
+    return grid
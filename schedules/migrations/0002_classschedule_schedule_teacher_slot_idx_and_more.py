@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 08:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0004_timeslot_name'),
+        ('classes', '0004_class_next_class'),
+        ('schedules', '0001_initial'),
+        ('subject', '0010_remove_subject_unique_subject_per_class_and_stream_and_more'),
+        ('teachers', '0002_alter_teacheravailability_day_of_week'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='classschedule',
+            index=models.Index(fields=['teacher', 'day_of_week', 'time_slot'], name='schedule_teacher_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classschedule',
+            index=models.Index(fields=['section', 'day_of_week', 'time_slot'], name='schedule_section_slot_idx'),
+        ),
+    ]
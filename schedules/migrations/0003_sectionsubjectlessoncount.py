@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-18 09:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_lesson_counts(apps, schema_editor):
+    ClassSchedule = apps.get_model('schedules', 'ClassSchedule')
+    SectionSubjectLessonCount = apps.get_model('schedules', 'SectionSubjectLessonCount')
+    rows = (
+        ClassSchedule.objects
+        .values('section_id', 'subject_id', 'academic_year_id', 'academic_term_id')
+        .annotate(scheduled_lessons=Count('id'))
+        .order_by()
+    )
+    SectionSubjectLessonCount.objects.bulk_create(
+        (SectionSubjectLessonCount(**row) for row in rows.iterator(chunk_size=2000)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0004_timeslot_name'),
+        ('classes', '0004_class_next_class'),
+        ('schedules', '0002_classschedule_schedule_teacher_slot_idx_and_more'),
+        ('subject', '0010_remove_subject_unique_subject_per_class_and_stream_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SectionSubjectLessonCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scheduled_lessons', models.PositiveIntegerField(default=0, verbose_name='عدد الحصص المضافة')),
+                ('academic_term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_counts', to='academic.academicterm', verbose_name='الفصل الدراسي')),
+                ('academic_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_counts', to='academic.academicyear', verbose_name='العام الدراسي')),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_counts', to='classes.section', verbose_name='القسم')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_counts', to='subject.subject', verbose_name='المادة الدراسية')),
+            ],
+            options={
+                'verbose_name': 'عدّاد حصص مادة',
+                'verbose_name_plural': 'عدّادات حصص المواد',
+                'unique_together': {('section', 'subject', 'academic_year', 'academic_term')},
+            },
+        ),
+        migrations.RunPython(populate_lesson_counts, migrations.RunPython.noop),
+    ]
@@ -146,6 +146,12 @@ class ClassSchedule(AutoCreateAndAutoUpdateTimeStampedModel):
         unique_together = [
             ['subject', 'section', 'academic_year', 'academic_term', 'day_of_week', 'time_slot']
         ]
+        indexes = [
+            # فحص تضارب المعلم وجدول المعلم الأسبوعي
+            models.Index(fields=['teacher', 'day_of_week', 'time_slot'], name='schedule_teacher_slot_idx'),
+            # فحص تضارب الشعبة وجدول الشعبة الأسبوعي
+            models.Index(fields=['section', 'day_of_week', 'time_slot'], name='schedule_section_slot_idx'),
+        ]
 
     def __str__(self):
         return (
@@ -155,32 +161,48 @@ class ClassSchedule(AutoCreateAndAutoUpdateTimeStampedModel):
 
     def clean(self):
         from django.core.exceptions import ValidationError
-        existing_schedules = ClassSchedule.objects.filter(
-            teacher=self.teacher,
-            academic_year=self.academic_year,
-            academic_term=self.academic_term,
-            day_of_week=self.day_of_week,
-            time_slot=self.time_slot
-        ).exclude(pk=self.pk) 
-
-        if existing_schedules.exists():
+        from schedules.occupancy import TermOccupancy
+
+        # فهرس إشغال واحد للمعلم والقسم بدلاً من استعلامي exists() منفصلين
+        occupancy = TermOccupancy.load(
+            self.academic_year_id, self.academic_term_id,
+            teacher_ids=[self.teacher_id], section_ids=[self.section_id],
+            exclude_id=self.pk, # استبعاد الكائن الحالي في حالة التحديث
+        )
+
+        if self.teacher_id and occupancy.teacher_busy(self.teacher_id, self.day_of_week_id, self.time_slot_id):
             raise ValidationError(
                 _("هذا المعلم لديه حصة أخرى في نفس اليوم والفترة والفصل الدراسي المحدد.")
             )
 
         # التحقق من عدم وجود تداخل في جدول القسم (Section Clash)
         # لا يمكن لنفس القسم أن يكون لديه حصتين في نفس اليوم والفترة في نفس العام/الفصل الدراسي
-        existing_schedules_for_section = ClassSchedule.objects.filter(
-            section=self.section,
-            academic_year=self.academic_year,
-            academic_term=self.academic_term,
-            day_of_week=self.day_of_week,
-            time_slot=self.time_slot
-        ).exclude(pk=self.pk) # استبعاد الكائن الحالي في حالة التحديث
-
-        if existing_schedules_for_section.exists():
+        if occupancy.section_busy(self.section_id, self.day_of_week_id, self.time_slot_id):
             raise ValidationError(
                 _("هذا القسم لديه حصة أخرى في نفس اليوم والفترة والفصل الدراسي المحدد.")
             )
 
         super().clean()
+
+
+class SectionSubjectLessonCount(models.Model):
+    """
+    عدّاد الحصص المعتمدة لكل مادة في كل شعبة ضمن فصل دراسي.
+    يُحدَّث تدريجياً عند إضافة الحصص أو حذفها (انظر schedules/counters.py)،
+    فتُحسب الحصص المتبقية دون عدّ جدول الحصص في كل طلب.
+    """
+    section = models.ForeignKey(Section, on_delete=models.CASCADE, related_name='lesson_counts', verbose_name=_("القسم"))
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='lesson_counts', verbose_name=_("المادة الدراسية"))
+    academic_year = models.ForeignKey(AcademicYear, on_delete=models.CASCADE, related_name='lesson_counts', verbose_name=_("العام الدراسي"))
+    academic_term = models.ForeignKey(AcademicTerm, on_delete=models.CASCADE, related_name='lesson_counts', verbose_name=_("الفصل الدراسي"))
+    scheduled_lessons = models.PositiveIntegerField(default=0, verbose_name=_("عدد الحصص المضافة"))
+
+    class Meta:
+        verbose_name = _("عدّاد حصص مادة")
+        verbose_name_plural = _("عدّادات حصص المواد")
+        unique_together = [
+            ['section', 'subject', 'academic_year', 'academic_term']
+        ]
+
+    def __str__(self):
+        return f"{self.section_id} - {self.subject_id}: {self.scheduled_lessons}"
@@ -0,0 +1,74 @@
+# schedules/occupancy.py
+from django.db.models import Q
+
+from schedules.models import ClassSchedule
+
+
+SECTION_CLASH_MESSAGE = "هذه الشعبة لديها حصة في نفس الوقت واليوم."
+TEACHER_CLASH_MESSAGE = "هذا المعلم لديه حصة في نفس الوقت واليوم."
+
+
+class TermOccupancy:
+    """
+    فهرس إشغال الحصص لفصل دراسي واحد، يُبنى من استعلام واحد ويُحفظ في الذاكرة.
+    لكل معلم ولكل شعبة عدد صحيح (bitset) يمثّل كل بت فيه خانة (يوم، فترة) مشغولة،
+    فيصبح فحص التضارب عملية AND على البتات بدلاً من استعلام exists() لكل حصة.
+    """
+
+    def __init__(self, academic_year_id, academic_term_id):
+        self.academic_year_id = academic_year_id
+        self.academic_term_id = academic_term_id
+        self._teachers = {}
+        self._sections = {}
+        self._positions = {}
+
+    @classmethod
+    def load(cls, academic_year_id, academic_term_id, teacher_ids=(), section_ids=(), exclude_id=None):
+        """
+        يبني الفهرس من حصص الفصل الخاصة بالمعلمين والشعب المعطاة (استعلام واحد).
+        exclude_id: حصة تُستثنى من الإشغال، وتستخدم عند تعديل حصة موجودة.
+        """
+        occupancy = cls(academic_year_id, academic_term_id)
+        teacher_ids = [pk for pk in teacher_ids if pk is not None]
+        section_ids = [pk for pk in section_ids if pk is not None]
+        if not teacher_ids and not section_ids:
+            return occupancy
+
+        owners = Q(teacher_id__in=teacher_ids) | Q(section_id__in=section_ids)
+        rows = ClassSchedule.objects.filter(
+            owners, academic_year_id=academic_year_id, academic_term_id=academic_term_id,
+        )
+        if exclude_id is not None:
+            rows = rows.exclude(pk=exclude_id)
+        for teacher_id, section_id, day_id, slot_id in rows.values_list(
+            'teacher_id', 'section_id', 'day_of_week_id', 'time_slot_id'
+        ):
+            occupancy.occupy(teacher_id, section_id, day_id, slot_id)
+        return occupancy
+
+    def _bit(self, day_id, slot_id):
+        position = self._positions.setdefault((day_id, slot_id), len(self._positions))
+        return 1 << position
+
+    def teacher_busy(self, teacher_id, day_id, slot_id):
+        return bool(self._teachers.get(teacher_id, 0) & self._bit(day_id, slot_id))
+
+    def section_busy(self, section_id, day_id, slot_id):
+        return bool(self._sections.get(section_id, 0) & self._bit(day_id, slot_id))
+
+    def conflicts(self, teacher_id, section_id, day_id, slot_id):
+        """
+        يعيد قائمة رسائل التضارب للحصة المقترحة (فارغة إذا كانت الخانة متاحة).
+        """
+        messages = []
+        if self.section_busy(section_id, day_id, slot_id):
+            messages.append(SECTION_CLASH_MESSAGE)
+        if teacher_id is not None and self.teacher_busy(teacher_id, day_id, slot_id):
+            messages.append(TEACHER_CLASH_MESSAGE)
+        return messages
+
+    def occupy(self, teacher_id, section_id, day_id, slot_id):
+        bit = self._bit(day_id, slot_id)
+        if teacher_id is not None:
+            self._teachers[teacher_id] = self._teachers.get(teacher_id, 0) | bit
+        self._sections[section_id] = self._sections.get(section_id, 0) | bit
@@ -0,0 +1,66 @@
+# schedules/scope.py
+from django.core.cache import cache
+
+from academic.context import get_current_term
+from schedules.grid import get_schedule_version
+from schedules.models import ClassSchedule
+
+SCOPE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _scope_cache_key(academic_term_id, version, teacher_id):
+    return f'schedules:teacher_scope:{academic_term_id}:{version}:{teacher_id}'
+
+
+class TeacherScope:
+    """
+    ما يدرسه المعلم في فصل دراسي: الشعب والصفوف والمواد والمسارات وأزواج (الشعبة، المادة).
+    يُبنى من استعلام واحد على ClassSchedule ويُخزن في الكاش بنسخة جدول الفصل،
+    فيُبطل تلقائياً مع أي تعديل على الحصص (انظر schedules/grid.py).
+    """
+
+    def __init__(self, teacher_id, academic_term_id, rows=()):
+        self.teacher_id = teacher_id
+        self.academic_term_id = academic_term_id
+        self.section_subjects = frozenset((section_id, subject_id) for section_id, _, subject_id, _ in rows)
+        self.section_classes = {section_id: class_id for section_id, class_id, _, _ in rows}
+        self.section_ids = frozenset(self.section_classes)
+        self.class_ids = frozenset(self.section_classes.values())
+        self.subject_ids = frozenset(subject_id for _, _, subject_id, _ in rows)
+        self.stream_types = frozenset(stream_type for _, _, _, stream_type in rows)
+
+    @classmethod
+    def load(cls, teacher_id, academic_term_id):
+        rows = ClassSchedule.objects.filter(
+            teacher_id=teacher_id, academic_term_id=academic_term_id,
+        ).values_list('section_id', 'section__class_obj_id', 'subject_id', 'section__stream_type').distinct()
+        return cls(teacher_id, academic_term_id, list(rows))
+
+    def teaches(self, section_id, subject_id=None):
+        if subject_id is None:
+            return section_id in self.section_ids
+        return (section_id, subject_id) in self.section_subjects
+
+    def section_ids_for_subject(self, subject_id):
+        return frozenset(section_id for section_id, pair_subject_id in self.section_subjects if pair_subject_id == subject_id)
+
+    def subject_ids_for_section(self, section_id):
+        return frozenset(subject_id for pair_section_id, subject_id in self.section_subjects if pair_section_id == section_id)
+
+    def class_ids_for_sections(self, section_ids):
+        return frozenset(self.section_classes[section_id] for section_id in section_ids)
+
+
+def get_teacher_scope(teacher_id, academic_term_id=None):
+    """
+    يعيد TeacherScope للمعلم في الفصل المعطى (الحالي افتراضياً) من الكاش أو يبنيه.
+    يرفع DoesNotExist إذا لم يوجد فصل حالي.
+    """
+    if academic_term_id is None:
+        academic_term_id = get_current_term().pk
+    key = _scope_cache_key(academic_term_id, get_schedule_version(academic_term_id), teacher_id)
+    scope = cache.get(key)
+    if scope is None:
+        scope = TeacherScope.load(teacher_id, academic_term_id)
+        cache.set(key, scope, SCOPE_CACHE_TIMEOUT)
+    return scope
@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from academic.models import AcademicYear, AcademicTerm, DayOfWeek, TimeSlot
+from academic.context import get_current_year, get_current_term
 from classes.models import Class, Section
 from subject.models import Subject, SectionSubjectRequirement, TeacherSubject
 from teachers.models import Teacher, TeacherAvailability
 from schedules.models import ClassSchedule, ProposedClassSchedule # تأكد من استيراد هذه الموديلات من تطبيق schedules الخاص بك
+from schedules.occupancy import TermOccupancy
 
 
 # Serializer للمادة الدراسية مع حساب الحصص المضافة والمطلوبة
@@ -12,6 +14,8 @@ class SubjectWithLessonCountSerializer(serializers.ModelSerializer):
     total_lessons_required = serializers.SerializerMethodField()
     icon_url = serializers.SerializerMethodField()
 
+    select_related_fields = ('icon',)
+
     class Meta:
         model = Subject
         fields = [
@@ -22,32 +26,12 @@ class SubjectWithLessonCountSerializer(serializers.ModelSerializer):
         ]
 
     def get_added_lessons(self, obj):
-        # يحسب عدد الحصص المضافة لهذه المادة في سياق الصف والشعبة
-        school_class_id = self.context.get('class_id') # تم تغيير الاسم ليتناسب مع Class Model
-        section_id = self.context.get('section_id')
-
-        if school_class_id and section_id:
-            count = ClassSchedule.objects.filter(
-                section_id=section_id,
-                subject=obj
-            ).count()
-            return count
-        return 0
+        # عدد الحصص المضافة لهذه المادة في الشعبة، محسوب مسبقاً في الـ view من عدّادات الحصص
+        return getattr(obj, 'scheduled_lessons', 0)
 
     def get_total_lessons_required(self, obj):
-        # يجلب عدد الحصص المطلوبة من SectionSubjectRequirement
-        section_id = self.context.get('section_id')
-        if section_id:
-            try:
-                requirement = SectionSubjectRequirement.objects.get(
-                    section_id=section_id,
-                    subject=obj
-                )
-                return requirement.weekly_lessons_required
-            except SectionSubjectRequirement.DoesNotExist:
-                # إذا لم يتم تحديد متطلب خاص للشعبة، نعود للقيمة الافتراضية في المادة
-                return obj.default_weekly_lessons
-        return obj.default_weekly_lessons 
+        # متطلب الشعبة إن وُجد وإلا القيمة الافتراضية في المادة (محسوب مسبقاً في الـ view)
+        return getattr(obj, 'required_lessons', obj.default_weekly_lessons)
 
     def get_icon_url(self, obj):
         """
@@ -60,12 +44,15 @@ class SubjectWithLessonCountSerializer(serializers.ModelSerializer):
 
 
 class SubjectRemainingLessonsSerializer(serializers.ModelSerializer):
-    """Serializer مبسّط لعرض كل مادة وعدد الحصص المتبقية لها في شعبة معينة للفصل/العام الحاليين."""
+    """Serializer مبسّط لعرض كل مادة وعدد الحصص المتبقية لها في شعبة معينة للفصل/العام الحاليين.
+    الأعداد تُحسب مسبقاً في الـ view من عدّادات الحصص (انظر schedules/counters.py)."""
     added_lessons = serializers.SerializerMethodField()
     total_lessons_required = serializers.SerializerMethodField()
     remaining_lessons = serializers.SerializerMethodField()
     icon_url = serializers.SerializerMethodField()
 
+    select_related_fields = ('icon',)
+
     class Meta:
         model = Subject
         fields = [
@@ -73,47 +60,16 @@ class SubjectRemainingLessonsSerializer(serializers.ModelSerializer):
             'added_lessons', 'total_lessons_required', 'remaining_lessons'
         ]
 
-    def _get_current_year_and_term(self):
-        try:
-            current_year = AcademicYear.objects.get(is_current=True)
-            current_term = AcademicTerm.objects.get(is_current=True, academic_year=current_year)
-            return current_year, current_term
-        except (AcademicYear.DoesNotExist, AcademicTerm.DoesNotExist):
-            return None, None
-
-    def _get_section(self):
-        section_id = self.context.get('section_id')
-        if not section_id:
-            return None
-        try:
-            return Section.objects.get(id=section_id)
-        except Section.DoesNotExist:
-            return None
-
     def get_icon_url(self, obj):
         if obj.icon and obj.icon.icon_file and 'request' in self.context:
             return self.context['request'].build_absolute_uri(obj.icon.icon_file.url)
         return None
 
     def get_total_lessons_required(self, obj):
-        section = self._get_section()
-        if not section:
-            return obj.default_weekly_lessons
-        try:
-            req = SectionSubjectRequirement.objects.get(section=section, subject=obj)
-            return req.weekly_lessons_required
-        except SectionSubjectRequirement.DoesNotExist:
-            return obj.default_weekly_lessons
+        return getattr(obj, 'required_lessons', obj.default_weekly_lessons)
 
     def get_added_lessons(self, obj):
-        section = self._get_section()
-        if not section:
-            return 0
-        current_year, current_term = self._get_current_year_and_term()
-        filters = {'section': section, 'subject': obj}
-        if current_year and current_term:
-            filters.update({'academic_year': current_year, 'academic_term': current_term})
-        return ClassSchedule.objects.filter(**filters).count()
+        return getattr(obj, 'scheduled_lessons', 0)
 
     def get_remaining_lessons(self, obj):
         required = self.get_total_lessons_required(obj)
@@ -156,6 +112,11 @@ class ClassScheduleSerializer(serializers.ModelSerializer):
             return obj.teacher.user.get_full_name()
         return None
 
+    select_related_fields = (
+        'subject', 'section', 'teacher__user', 'academic_year', 'academic_term',
+        'day_of_week', 'time_slot',
+    )
+
     class Meta:
         model = ClassSchedule
         fields = [
@@ -177,17 +138,44 @@ class ClassScheduleSerializer(serializers.ModelSerializer):
         if not TeacherSubject.objects.filter(teacher=teacher, subject=subject).exists():
             raise serializers.ValidationError("هذا المعلم لا يدرّس هذه المادة.")
 
-        # --- إضافة منطق التحقق من التضارب هنا ---
+        # --- التحقق من تضارب الشعبة والمعلم ضمن الفصل الدراسي عبر فهرس الإشغال (استعلام واحد) ---
         section = data.get('section')
         day_of_week = data.get('day_of_week')
         time_slot = data.get('time_slot')
-        # 1. التحقق من تضارب الشعبة
-        if ClassSchedule.objects.filter(section=section, day_of_week=day_of_week, time_slot=time_slot).exists():
-            raise serializers.ValidationError("هذه الشعبة لديها حصة في نفس الوقت واليوم.")
-
-        # 2. التحقق من تضارب المعلم
-        if ClassSchedule.objects.filter(teacher=teacher, day_of_week=day_of_week, time_slot=time_slot).exists():
-            raise serializers.ValidationError("هذا المعلم لديه حصة في نفس الوقت واليوم.")
+        academic_year = data.get('academic_year') or get_current_year()
+        academic_term = data.get('academic_term') or get_current_term()
+        occupancy = TermOccupancy.load(
+            academic_year.pk, academic_term.pk,
+            teacher_ids=[teacher.pk], section_ids=[section.pk],
+            exclude_id=getattr(self.instance, 'pk', None),
+        )
+        conflicts = occupancy.conflicts(teacher.pk, section.pk, day_of_week.pk, time_slot.pk)
+        if conflicts:
+            raise serializers.ValidationError(conflicts[0])
 
         return data
 
+
+
+# Serializer لعرض الحصص المقترحة الناتجة عن مولّد الجداول للمراجعة
+class ProposedClassScheduleSerializer(serializers.ModelSerializer):
+    subject_name = serializers.SlugRelatedField(source='subject', slug_field='name', read_only=True)
+    section_name = serializers.SlugRelatedField(source='section', slug_field='name', read_only=True)
+    teacher_name = serializers.SerializerMethodField()
+    day_of_week_display = serializers.CharField(source='get_day_of_week_display', read_only=True)
+
+    def get_teacher_name(self, obj):
+        if obj.teacher and obj.teacher.user:
+            return obj.teacher.user.get_full_name()
+        return None
+
+    select_related_fields = ('subject', 'section', 'teacher__user')
+
+    class Meta:
+        model = ProposedClassSchedule
+        fields = [
+            'id', 'subject', 'subject_name', 'section', 'section_name',
+            'teacher', 'teacher_name', 'academic_year', 'academic_term',
+            'day_of_week', 'day_of_week_display', 'period', 'status',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,37 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .counters import adjust_lesson_counts, lesson_key
+from .grid import bump_schedule_version
+from .models import ClassSchedule
+
+
+def _loaded(instance, *attnames):
+    # القراءة من __dict__ مباشرة حتى لا تُحمّل الحقول المؤجلة (only/defer) باستعلام إضافي
+    return tuple(instance.__dict__.get(attname) for attname in attnames)
+
+
+@receiver(post_init, sender=ClassSchedule)
+def remember_schedule_origin(sender, instance, **kwargs):
+    # حفظ المفتاح الأصلي لمعرفة العدّاد السابق إذا تغيّرت الشعبة أو المادة أو الفصل
+    instance._counter_origin = _loaded(instance, 'section_id', 'subject_id', 'academic_year_id', 'academic_term_id')
+
+
+@receiver(post_save, sender=ClassSchedule)
+def update_counter_on_schedule_save(sender, instance, created=False, raw=False, **kwargs):
+    old_key, new_key = instance._counter_origin, lesson_key(instance)
+    instance._counter_origin = new_key
+    if raw:
+        return
+    # أي تعديل على الحصة (حتى تغيير الوقت فقط) يُبطل شبكات الجدول المخزنة للفصل القديم والجديد
+    bump_schedule_version({old_key[3], new_key[3]})
+    if created:
+        adjust_lesson_counts({new_key: 1})
+    elif old_key != new_key:
+        adjust_lesson_counts({old_key: -1, new_key: 1})
+
+
+@receiver(post_delete, sender=ClassSchedule)
+def update_counter_on_schedule_delete(sender, instance, **kwargs):
+    adjust_lesson_counts({instance._counter_origin: -1})
+    bump_schedule_version({instance._counter_origin[3]})
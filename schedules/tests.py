@@ -1,3 +1,221 @@
+import datetime
+import time
+from collections import Counter
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from academic.models import DayOfWeek, TimeSlot
+from accounts.models import User
+from classes.models import Class
+from Schoolo.testing import SchoolTestDataMixin
+from subject.models import SectionSubjectRequirement, Subject, TeacherSubject
+from teachers.models import Teacher, TeacherAvailability
+from .generator import TimetableGenerator, save_proposals
+from .models import ClassSchedule, ProposedClassSchedule
+
+
+class ClassScheduleListQueryCountTests(SchoolTestDataMixin, TestCase):
+    """
+    عدد استعلامات قائمة الحصص يجب أن يبقى ثابتاً مهما كان عدد الحصص المعروضة.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.subject = Subject.objects.create(
+            class_obj=cls.class_obj, name='Math', academic_year=cls.year, academic_term=cls.term,
+        )
+        cls.days = list(DayOfWeek.objects.all()[:5])
+        cls.slots = [
+            TimeSlot.objects.create(
+                slot_number=i, name=f'P{i}', start_time=datetime.time(8 + i), end_time=datetime.time(9 + i),
+            )
+            for i in range(1, 4)
+        ]
+
+    def _add_lessons(self, count):
+        start = ClassSchedule.objects.count()
+        for i in range(start, start + count):
+            teacher = Teacher.objects.create(user=User.objects.create_teacher_user(f'07{i:08d}', 'pass'))
+            ClassSchedule.objects.create(
+                subject=self.subject, section=self.section, teacher=teacher,
+                academic_year=self.year, academic_term=self.term,
+                day_of_week=self.days[i % len(self.days)], time_slot=self.slots[i // len(self.days)],
+            )
+
+    def test_query_count_is_constant(self):
+        self.assertConstantListQueries(reverse('schedule-list'), self._add_lessons)
+
+    def _grid(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('schedule-grid'), {'section_id': self.section.id})
+        self.assertEqual(response.status_code, 200)
+        lessons = sum(len(cell) for day in response.data['grid'] for cell in day)
+        return lessons, len(queries)
+
+    def test_grid_is_cached_until_schedule_changes(self):
+        self._add_lessons(3)
+        self.assertEqual(self._grid()[0], 3)
+        self.assertEqual(self._grid(), (3, 0))
+
+        self._add_lessons(1)
+        self.assertEqual(self._grid()[0], 4)
+        ClassSchedule.objects.first().delete()
+        self.assertEqual(self._grid()[0], 3)
+
+    def test_grid_rejects_invalid_term_id(self):
+        url = reverse('schedule-grid')
+        response = self.client.get(url, {'section_id': self.section.id, 'academic_term_id': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(url, {'section_id': self.section.id, 'academic_term_id': self.term.id})
+        self.assertEqual(response.status_code, 200)
+
+
+class TimetableGeneratorTests(SchoolTestDataMixin, TestCase):
+    """
+    الحصص المولّدة لا تتضارب على الشعبة أو المعلم، وتلتزم بأيام توفر المعلم وبالأيام الدراسية
+    والفترات غير الاستراحة، وتحسب حساب الحصص المعتمدة مسبقاً.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # أربعة أيام دراسية (الجمعة عطلة) وخمس فترات دراسية مع استراحة بينها
+        DayOfWeek.objects.filter(pk=5).update(is_school_day=False)
+        cls.slots = [
+            TimeSlot.objects.create(
+                slot_number=i, name=f'P{i}', start_time=datetime.time(8 + i), end_time=datetime.time(9 + i),
+                is_break=i == 3,
+            )
+            for i in range(1, 7)
+        ]
+        cls.section_b = cls.create_section('B')
+        cls.sections = [cls.section, cls.section_b]
+        cls.math, cls.science, cls.art = [
+            Subject.objects.create(
+                class_obj=cls.class_obj, name=name, academic_year=cls.year, academic_term=cls.term,
+                default_weekly_lessons=lessons,
+            )
+            for name, lessons in [('Math', 6), ('Science', 4), ('Art', 2)]
+        ]
+        SectionSubjectRequirement.objects.create(section=cls.section_b, subject=cls.art, weekly_lessons_required=3)
+        cls.math_teacher, cls.science_teacher, cls.art_teacher = [
+            Teacher.objects.create(user=User.objects.create_teacher_user(f'070000000{i}')) for i in range(3)
+        ]
+        for teacher, subject in [(cls.math_teacher, cls.math), (cls.science_teacher, cls.science), (cls.art_teacher, cls.art)]:
+            TeacherSubject.objects.create(teacher=teacher, subject=subject, weekly_hours=10)
+        # معلم العلوم متاح يومي الاثنين والثلاثاء فقط
+        for day_id in [1, 2]:
+            TeacherAvailability.objects.create(teacher=cls.science_teacher, day_of_week_id=day_id)
+
+    def _generate(self, section_ids=None):
+        return TimetableGenerator(self.year, self.term, section_ids=section_ids).generate()
+
+    def assertNoClashes(self, lessons):
+        self.assertEqual(len({(l.section_id, l.day_id, l.slot_id) for l in lessons}), len(lessons))
+        self.assertEqual(len({(l.teacher_id, l.day_id, l.slot_id) for l in lessons}), len(lessons))
+
+    def test_lessons_respect_clashes_availability_and_school_days(self):
+        result = self._generate()
+        self.assertEqual(result.unplaced, [])
+        self.assertNoClashes(result.lessons)
+
+        counts = Counter((lesson.section_id, lesson.subject_id) for lesson in result.lessons)
+        self.assertEqual(counts, {
+            (self.section.pk, self.math.pk): 6, (self.section.pk, self.science.pk): 4, (self.section.pk, self.art.pk): 2,
+            (self.section_b.pk, self.math.pk): 6, (self.section_b.pk, self.science.pk): 4, (self.section_b.pk, self.art.pk): 3,
+        })
+        school_days = set(DayOfWeek.objects.filter(is_school_day=True).values_list('pk', flat=True))
+        teaching_slots = {slot.pk for slot in self.slots if not slot.is_break}
+        self.assertTrue(all(lesson.day_id in school_days and lesson.slot_id in teaching_slots for lesson in result.lessons))
+        self.assertEqual(
+            {lesson.day_id for lesson in result.lessons if lesson.teacher_id == self.science_teacher.pk}, {1, 2},
+        )
+
+    def test_existing_lessons_are_accounted_for(self):
+        day = DayOfWeek.objects.get(pk=1)
+        ClassSchedule.objects.create(
+            subject=self.math, section=self.section, teacher=self.math_teacher,
+            academic_year=self.year, academic_term=self.term, day_of_week=day, time_slot=self.slots[0],
+        )
+
+        result = self._generate(section_ids=[self.section_b.pk])
+        self.assertEqual(result.unplaced, [])
+        self.assertEqual({lesson.section_id for lesson in result.lessons}, {self.section_b.pk})
+        # المعلم مشغول في الشعبة الأخرى بهذه الخانة
+        self.assertNotIn((self.math_teacher.pk, day.pk, self.slots[0].pk), {
+            (lesson.teacher_id, lesson.day_id, lesson.slot_id) for lesson in result.lessons
+        })
+
+        result = self._generate(section_ids=[self.section.pk])
+        math_lessons = [lesson for lesson in result.lessons if lesson.subject_id == self.math.pk]
+        self.assertEqual(len(math_lessons), 5)
+        self.assertNotIn((day.pk, self.slots[0].pk), {(lesson.day_id, lesson.slot_id) for lesson in result.lessons})
+
+    def test_save_proposals_replaces_only_unaccepted(self):
+        other_section = self.create_section('C')
+
+        def propose(section, day, status):
+            return ProposedClassSchedule.objects.create(
+                subject=self.art, section=section, teacher=self.art_teacher, academic_year=self.year,
+                academic_term=self.term, day_of_week=day, period='1', status=status,
+            )
+
+        accepted = propose(self.section, 'Saturday', 'accepted')
+        propose(self.section, 'Sunday', 'proposed')
+        propose(self.section_b, 'Sunday', 'rejected')
+        untouched = propose(other_section, 'Sunday', 'proposed')
+
+        result = self._generate(section_ids=[section.pk for section in self.sections])
+        save_proposals(result, self.year, self.term, [section.pk for section in self.sections])
+
+        self.assertEqual(ProposedClassSchedule.objects.filter(pk__in=[accepted.pk, untouched.pk]).count(), 2)
+        replaced = ProposedClassSchedule.objects.filter(section__in=self.sections).exclude(pk=accepted.pk)
+        self.assertEqual(replaced.count(), len(result.lessons))
+        self.assertFalse(replaced.exclude(status='proposed').exists())
+        self.assertFalse(replaced.filter(day_of_week__in=['Friday', 'Saturday', 'Sunday']).exists())
+
+
+class TimetableGeneratorScaleTests(SchoolTestDataMixin, TestCase):
+    """
+    توليد جدول فصل كامل بستين شعبة يجب أن يبقى سريعاً ودون تضارب.
+    """
+
+    SECTIONS_PER_CLASS = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i in range(1, 7):
+            TimeSlot.objects.create(
+                slot_number=i, name=f'P{i}', start_time=datetime.time(7 + i), end_time=datetime.time(8 + i),
+            )
+        phone = 0
+        for class_number in range(6):
+            class_obj = Class.objects.create(name=f'G{class_number}')
+            for section_number in range(cls.SECTIONS_PER_CLASS):
+                cls.create_section(str(section_number), class_obj)
+            # 25 حصة أسبوعياً لكل شعبة من 30 خانة، ومعلمان لكل مادة
+            for name, lessons in [('Math', 6), ('Arabic', 6), ('Science', 5), ('English', 4), ('History', 2), ('Art', 2)]:
+                subject = Subject.objects.create(
+                    class_obj=class_obj, name=name, academic_year=cls.year, academic_term=cls.term,
+                    default_weekly_lessons=lessons,
+                )
+                for _ in range(max(2, lessons * cls.SECTIONS_PER_CLASS // 20)):
+                    teacher = Teacher.objects.create(user=User.objects.create_teacher_user(f'06{phone:08d}'))
+                    TeacherSubject.objects.create(teacher=teacher, subject=subject, weekly_hours=20)
+                    phone += 1
+
+    def test_sixty_sections_generate_quickly(self):
+        started = time.perf_counter()
+        result = TimetableGenerator(self.year, self.term).generate()
+        elapsed = time.perf_counter() - started
 
-# Create your tests here.
+        self.assertEqual(result.unplaced, [])
+        self.assertEqual(len(result.lessons), 60 * 25)
+        self.assertEqual(len({(l.section_id, l.day_id, l.slot_id) for l in result.lessons}), len(result.lessons))
+        self.assertEqual(len({(l.teacher_id, l.day_id, l.slot_id) for l in result.lessons}), len(result.lessons))
+        self.assertLess(elapsed, 5)
@@ -24,6 +24,15 @@ urlpatterns = [
 
     path('schedules/list/', ClassScheduleListView.as_view(), name='schedule-list'),
 
+    # المسار: /api/schedules/grid/?section_id= أو teacher_id= أو class_id=
+    # لعرض الجدول الأسبوعي كمصفوفة أيام × فترات (من الكاش)
+    path('schedules/grid/', TimetableGridView.as_view(), name='schedule-grid'),
+
+    # المسار: /api/schedules/generate/
+    # لتوليد جدول مقترح لكل الشعب في الفصل الحالي، ومراجعته عبر /api/schedules/proposed/
+    path('schedules/generate/', TimetableGenerateView.as_view(), name='schedule-generate'),
+    path('schedules/proposed/', ProposedClassScheduleListView.as_view(), name='proposed-schedule-list'),
+
     # المسار الوحيد: /api/sections/<section_id>/schedules/bulk_add/
     # لإضافة عدة حصص لشعبة واحدة دفعة واحدة (section من الـ URL)
     path('sections/<int:section_id>/schedules/bulk_add/', ClassScheduleBulkCreateView.as_view(), name='class-schedule-bulk-create-by-section'),
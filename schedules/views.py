@@ -1,3 +1,5 @@
+from collections import Counter
+
 from django.db import models
 from rest_framework import generics, status
 from rest_framework.response import Response
@@ -5,11 +7,12 @@ from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from django.db.models import Count
 from academic.models import AcademicYear, AcademicTerm, DayOfWeek, TimeSlot
+from academic.context import get_current_year, get_current_term
 from classes.models import Class, Section
 from students.models import Student
 from subject.models import Subject, SectionSubjectRequirement, TeacherSubject
-from teachers.models import Teacher
-from schedules.models import ClassSchedule
+from teachers.models import Teacher, TeacherAvailability
+from schedules.models import ClassSchedule, ProposedClassSchedule
 from accounts.models import User
 from rest_framework import permissions
 from django.core.exceptions import ValidationError
@@ -17,6 +20,11 @@ from accounts.permissions import *
 from django.db.models import Q
 from django.db import transaction
 from rest_framework.exceptions import ValidationError as DRFValidationError
+from Schoolo.mixins import SerializerQueryProfileMixin
+from schedules.occupancy import TermOccupancy
+from schedules.counters import adjust_lesson_counts, annotate_lesson_counts, lesson_key
+from schedules.generator import TimetableGenerator, save_proposals
+from schedules.grid import GRID_SCOPES, bump_schedule_version, get_timetable_grid
 
 
 # استيراد الـ Serializers
@@ -24,28 +32,31 @@ from .serializers import (
     SubjectWithLessonCountSerializer,
     ClassScheduleSerializer,
     SubjectRemainingLessonsSerializer,
+    ProposedClassScheduleSerializer,
 )
 
 
 def _calculate_remaining_lessons(section: Section, subject: Subject, academic_year: AcademicYear, academic_term: AcademicTerm) -> int:
-    """احسب عدد الحصص المتبقية المطلوبة لهذه المادة في هذه الشعبة ضمن العام والفصل الحاليين."""
-    try:
-        requirement = SectionSubjectRequirement.objects.get(section=section, subject=subject)
-        required = requirement.weekly_lessons_required
-    except SectionSubjectRequirement.DoesNotExist:
-        required = subject.default_weekly_lessons
-
-    added = ClassSchedule.objects.filter(
-        section=section,
-        subject=subject,
-        academic_year=academic_year,
-        academic_term=academic_term,
-    ).count()
-    remaining = required - added
+    """احسب عدد الحصص المتبقية المطلوبة لهذه المادة في هذه الشعبة ضمن العام والفصل الحاليين (استعلام واحد من العدّادات)."""
+    counts = annotate_lesson_counts(
+        Subject.objects.filter(pk=subject.pk), section.pk, academic_year.pk, academic_term.pk,
+    ).values('scheduled_lessons', 'required_lessons').first()
+    if counts is None:
+        return 0
+    remaining = counts['required_lessons'] - counts['scheduled_lessons']
     return remaining if remaining > 0 else 0
 
 
-class SectionSubjectsListView(generics.ListAPIView):
+def _annotate_current_lesson_counts(subjects, section_id):
+    # إضافة أعداد الحصص للفصل الحالي، أو لكل الفصول إذا لم يوجد فصل حالي
+    try:
+        academic_year_id, academic_term_id = get_current_year().id, get_current_term().id
+    except (AcademicYear.DoesNotExist, AcademicTerm.DoesNotExist):
+        academic_year_id = academic_term_id = None
+    return annotate_lesson_counts(subjects, section_id, academic_year_id, academic_term_id)
+
+
+class SectionSubjectsListView(SerializerQueryProfileMixin, generics.ListAPIView):
     """
     يعرض قائمة بالمواد الموجودة في شعبة معينة مع عدد الحصص المضافة والمطلوبة.
     Path: /api/classes/{class_id}/sections/{section_id}/subjects/
@@ -64,7 +75,7 @@ class SectionSubjectsListView(generics.ListAPIView):
             models.Q(section=section)
         ).distinct() 
 
-        return queryset
+        return _annotate_current_lesson_counts(queryset, section.id)
     # def get_queryset(self):
     #     user = self.request.user
     #     class_id = self.kwargs['class_id']
@@ -105,7 +116,7 @@ class SectionSubjectsListView(generics.ListAPIView):
         return context
 
 
-class SectionSubjectsRemainingListView(generics.ListAPIView):
+class SectionSubjectsRemainingListView(SerializerQueryProfileMixin, generics.ListAPIView):
     """
     يعرض قائمة مبسطة بكل المواد في شعبة محددة مع عدد الحصص المتبقية لكل مادة.
     Path: /api/sections/<section_id>/subjects/
@@ -119,7 +130,7 @@ class SectionSubjectsRemainingListView(generics.ListAPIView):
             models.Q(class_obj=section.class_obj) |
             models.Q(section=section)
         ).distinct()
-        return queryset
+        return _annotate_current_lesson_counts(queryset, section.id)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -138,15 +149,12 @@ class ClassScheduleCreateView(generics.CreateAPIView):
     def create(self, request, *args, **kwargs):
 
         try:
-            current_academic_year = AcademicYear.objects.get(is_current=True)
+            current_academic_year = get_current_year()
         except AcademicYear.DoesNotExist:
             return Response({"detail": "لا يوجد سنة دراسية نشطة حالياً."}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            current_academic_term = AcademicTerm.objects.get(
-                is_current=True, 
-                academic_year=current_academic_year
-            )
+            current_academic_term = get_current_term()
         except AcademicTerm.DoesNotExist:
             return Response({"detail": "لا يوجد فصل دراسي نشط حالياً."}, status=status.HTTP_400_BAD_REQUEST)
         
@@ -185,7 +193,7 @@ class ClassScheduleCreateView(generics.CreateAPIView):
         return Response(response_data, status=status.HTTP_201_CREATED, headers=headers)
 
 
-class ClassScheduleDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ClassScheduleDetailView(SerializerQueryProfileMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     لعرض، تعديل، أو حذف حصة معينة في الجدول.
     Path: /api/schedules/{id}/
@@ -198,15 +206,12 @@ class ClassScheduleDetailView(generics.RetrieveUpdateDestroyAPIView):
     def update(self, request, *args, **kwargs):
 
         try:
-            current_academic_year = AcademicYear.objects.get(is_current=True)
+            current_academic_year = get_current_year()
         except AcademicYear.DoesNotExist:
             return Response({"detail": "لا يوجد سنة دراسية نشطة حالياً."}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            current_academic_term = AcademicTerm.objects.get(
-                is_current=True, 
-                academic_year=current_academic_year
-            )
+            current_academic_term = get_current_term()
         except AcademicTerm.DoesNotExist:
             return Response({"detail": "لا يوجد فصل دراسي نشط حالياً."}, status=status.HTTP_400_BAD_REQUEST)
         
@@ -234,11 +239,12 @@ class ClassScheduleDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Response(response_data, status=status.HTTP_201_CREATED, headers=headers)
 
 
-class ClassScheduleListView(generics.ListAPIView):
+class ClassScheduleListView(SerializerQueryProfileMixin, generics.ListAPIView):
     """
     لعرض قائمة بجميع الحصص مع إمكانية التصفية بناءً على المستخدم ودوره.
     يمكن للمدراء عرض كل الحصص، بينما يرى المعلمون حصصهم فقط، والطلاب يرون حصص شعبهم.
     """
+    cursor_ordering = ('day_of_week_id', 'time_slot_id', 'id')
     serializer_class = ClassScheduleSerializer
     permission_classes = [permissions.IsAuthenticated] # التأكد من أن المستخدم موثق
 
@@ -323,15 +329,12 @@ class ClassScheduleBulkCreateView(APIView):
     def post(self, request, *args, **kwargs):
         # الحصول على العام والفصل الحاليين
         try:
-            current_academic_year = AcademicYear.objects.get(is_current=True)
+            current_academic_year = get_current_year()
         except AcademicYear.DoesNotExist:
             return Response({"detail": "لا يوجد سنة دراسية نشطة حالياً."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            current_academic_term = AcademicTerm.objects.get(
-                is_current=True,
-                academic_year=current_academic_year
-            )
+            current_academic_term = get_current_term()
         except AcademicTerm.DoesNotExist:
             return Response({"detail": "لا يوجد فصل دراسي نشط حالياً."}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -370,54 +373,223 @@ class ClassScheduleBulkCreateView(APIView):
                 return Response({"detail": f"المعلم مكرر في نفس اليوم والفترة داخل نفس الطلب عند السجل رقم {idx}."}, status=status.HTTP_400_BAD_REQUEST)
             teacher_slot_keys.add(key_teacher)
 
-        created_objects = []
-        response_items = []
+        items = [
+            {
+                'subject': int(item.get('subject')),
+                'teacher': int(item.get('teacher')),
+                'day_of_week': int(item.get('day_of_week')),
+                'time_slot': int(item.get('time_slot')),
+            }
+            for item in schedules
+        ]
+        subject_ids = {item['subject'] for item in items}
+        teacher_ids = {item['teacher'] for item in items}
+
+        # تحميل كل ما يلزم للتحقق دفعة واحدة بدلاً من استعلامات لكل حصة
+        subjects = Subject.objects.in_bulk(subject_ids)
+        teachers = Teacher.objects.select_related('user').prefetch_related(
+            models.Prefetch(
+                'availability',
+                queryset=TeacherAvailability.objects.select_related('day_of_week').order_by('day_of_week'),
+            )
+        ).in_bulk(teacher_ids)
+        days = DayOfWeek.objects.in_bulk({item['day_of_week'] for item in items})
+        slots = TimeSlot.objects.in_bulk({item['time_slot'] for item in items})
+        teaching_pairs = set(TeacherSubject.objects.filter(
+            teacher_id__in=teacher_ids, subject_id__in=subject_ids,
+        ).values_list('teacher_id', 'subject_id'))
+        occupancy = TermOccupancy.load(
+            current_academic_year.id, current_academic_term.id,
+            teacher_ids=teacher_ids, section_ids=[section.id],
+        )
+
         errors = []
+        new_objects = []
+        for idx, item in enumerate(items):
+            item_errors = {}
+            for field, lookup in (('subject', subjects), ('teacher', teachers), ('day_of_week', days), ('time_slot', slots)):
+                if item[field] not in lookup:
+                    item_errors[field] = [f'Invalid pk "{item[field]}" - object does not exist.']
+            if not item_errors:
+                if (item['teacher'], item['subject']) not in teaching_pairs:
+                    item_errors['non_field_errors'] = ["هذا المعلم لا يدرّس هذه المادة."]
+                else:
+                    conflicts = occupancy.conflicts(item['teacher'], section.id, item['day_of_week'], item['time_slot'])
+                    if conflicts:
+                        item_errors['non_field_errors'] = conflicts[:1]
+            if item_errors:
+                errors.append({"index": idx, "errors": item_errors})
+                continue
+
+            new_objects.append(ClassSchedule(
+                subject=subjects[item['subject']],
+                section=section,
+                teacher=teachers[item['teacher']],
+                academic_year=current_academic_year,
+                academic_term=current_academic_term,
+                day_of_week=days[item['day_of_week']],
+                time_slot=slots[item['time_slot']],
+            ))
+
+        if errors:
+            # أي خطأ -> لا يُنشأ أي سجل
+            raise DRFValidationError({"detail": "فشل إنشاء بعض السجلات.", "errors": errors})
 
-        # عملية واحدة ذرّية
         with transaction.atomic():
-            for idx, item in enumerate(schedules):
-                item_data = {
-                    'subject': item.get('subject'),
-                    'section': section.id,
-                    'teacher': item.get('teacher'),
-                    'academic_year': current_academic_year.id,
-                    'academic_term': current_academic_term.id,
-                    'day_of_week': item.get('day_of_week'),
-                    'time_slot': item.get('time_slot'),
-                }
-
-                serializer = ClassScheduleSerializer(data=item_data)
-                if not serializer.is_valid():
-                    errors.append({"index": idx, "errors": serializer.errors})
-                    continue
-
-                obj = serializer.save()
-                created_objects.append(obj)
-
-                # إعداد بيانات الإرجاع مع تفضيلات المعلم للأيام
-                # نحصل على أيام التفضيلات مرتبة لعرضها
-                try:
-                    teacher_obj = Teacher.objects.get(pk=item_data['teacher'])
-                    preferred_days_objects = teacher_obj.availability.all().order_by('day_of_week')
-                    teacher_preferred_days = [d.day_of_week.name_ar for d in preferred_days_objects]
-                except Teacher.DoesNotExist:
-                    teacher_preferred_days = []
-
-                item_response = ClassScheduleSerializer(obj).data
-                item_response['teacher_preferred_days'] = teacher_preferred_days
-                # المتبقي بعد إضافة هذا السجل
-                item_response['remaining_lessons'] = _calculate_remaining_lessons(
-                    section=section,
-                    subject=obj.subject,
-                    academic_year=obj.academic_year,
-                    academic_term=obj.academic_term,
+            created_objects = ClassSchedule.objects.bulk_create(new_objects)
+            if any(obj.pk is None for obj in created_objects):
+                # MySQL لا يعيد المعرفات من bulk_create، فنقرؤها باستعلام واحد حسب خانة الشعبة
+                created_ids = dict(
+                    ((day_id, slot_id), pk)
+                    for pk, day_id, slot_id in ClassSchedule.objects.filter(
+                        section=section,
+                        academic_year=current_academic_year,
+                        academic_term=current_academic_term,
+                        day_of_week_id__in=days,
+                        time_slot_id__in=slots,
+                    ).values_list('id', 'day_of_week_id', 'time_slot_id')
                 )
-                response_items.append(item_response)
+                for obj in created_objects:
+                    obj.pk = created_ids.get((obj.day_of_week_id, obj.time_slot_id))
+            # bulk_create لا يرسل signals، فتُحدّث عدّادات الحصص هنا
+            adjust_lesson_counts(Counter(lesson_key(obj) for obj in created_objects))
+            bump_schedule_version({current_academic_term.id})
+
+        # الحصص المتبقية لكل مادة بعد كل إضافة، من العدّادات باستعلام واحد
+        batch_counts = Counter(obj.subject_id for obj in created_objects)
+        required_lessons, added_before = {}, {}
+        for subject_id, scheduled, required in annotate_lesson_counts(
+            Subject.objects.filter(id__in=subject_ids), section.id,
+            current_academic_year.id, current_academic_term.id,
+        ).values_list('id', 'scheduled_lessons', 'required_lessons'):
+            required_lessons[subject_id] = required
+            added_before[subject_id] = scheduled - batch_counts[subject_id]
 
-            if errors:
-                # أي خطأ -> نرمي DRF ValidationError لضمان التراجع عن كل الإنشاءات
-                raise DRFValidationError({"detail": "فشل إنشاء بعض السجلات.", "errors": errors})
+        response_items = []
+        for obj in created_objects:
+            added_before[obj.subject_id] += 1
+            item_response = ClassScheduleSerializer(obj).data
+            item_response['teacher_preferred_days'] = [
+                availability.day_of_week.name_ar for availability in obj.teacher.availability.all()
+            ]
+            item_response['remaining_lessons'] = max(required_lessons[obj.subject_id] - added_before[obj.subject_id], 0)
+            response_items.append(item_response)
 
         return Response(response_items, status=status.HTTP_201_CREATED)
         
+
+
+class TimetableGenerateView(APIView):
+    """
+    توليد جدول الحصص تلقائياً لجميع الشعب النشطة (أو لشعب محددة) في الفصل الحالي،
+    وحفظ النتيجة في الجداول المقترحة للمراجعة دون المساس بالجدول المعتمد.
+    Path: /api/schedules/generate/
+
+    Body مثال (كل الحقول اختيارية):
+    {"section_ids": [1, 2, 3]}
+    """
+    permission_classes = [IsAdminOrSuperuser]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            current_academic_year = get_current_year()
+            current_academic_term = get_current_term()
+        except (AcademicYear.DoesNotExist, AcademicTerm.DoesNotExist):
+            return Response({"detail": "لا يوجد عام أو فصل دراسي نشط حالياً."}, status=status.HTTP_400_BAD_REQUEST)
+
+        section_ids = request.data.get('section_ids')
+        if section_ids is not None:
+            try:
+                section_ids = [int(section_id) for section_id in section_ids]
+            except (TypeError, ValueError):
+                return Response({"detail": "قيم section_ids غير صحيحة."}, status=status.HTTP_400_BAD_REQUEST)
+
+        generator = TimetableGenerator(current_academic_year, current_academic_term, section_ids=section_ids)
+        result = generator.generate()
+        proposals = save_proposals(result, current_academic_year, current_academic_term, list(generator.section_index))
+
+        return Response({
+            "detail": "تم توليد الجدول المقترح.",
+            "sections_count": len(generator.section_index),
+            "proposed_lessons": len(proposals),
+            "unplaced": result.unplaced,
+            "repairs": result.repairs,
+        }, status=status.HTTP_201_CREATED)
+
+
+class ProposedClassScheduleListView(SerializerQueryProfileMixin, generics.ListAPIView):
+    """
+    عرض الحصص المقترحة للفصل الحالي لمراجعتها، مع التصفية بالشعبة أو المعلم أو الحالة.
+    Path: /api/schedules/proposed/
+    """
+    cursor_ordering = ('section_id', 'id')
+    serializer_class = ProposedClassScheduleSerializer
+    permission_classes = [IsAdminOrSuperuser]
+
+    def get_queryset(self):
+        try:
+            current_academic_term = get_current_term()
+        except AcademicTerm.DoesNotExist:
+            return ProposedClassSchedule.objects.none()
+
+        queryset = ProposedClassSchedule.objects.filter(academic_term=current_academic_term)
+        for param, field in (('section_id', 'section_id'), ('teacher_id', 'teacher_id'), ('status', 'status')):
+            value = self.request.query_params.get(param)
+            if value:
+                queryset = queryset.filter(**{field: value})
+        return queryset
+
+
+class TimetableGridView(APIView):
+    """
+    شبكة الجدول الأسبوعي (أيام × فترات) لشعبة أو معلم أو صف كامل في استجابة واحدة،
+    تُقدّم من الكاش بمفتاح (الفصل، نسخة الجدول) وتُبطل عند أي تعديل على الحصص.
+    Path: /api/schedules/grid/?section_id=1  أو  ?teacher_id=5  أو  ?class_id=2
+    (اختياري: academic_term_id، والافتراضي الفصل الحالي)
+
+    المدراء يرون أي شبكة، المعلم يرى شبكته فقط، والطالب يرى شبكة شعبته فقط.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _is_allowed(self, user, scope, object_id):
+        if user.is_superuser or user.is_admin():
+            return True
+        if user.is_teacher() and scope == 'teacher':
+            return object_id == user.pk
+        if user.is_student() and scope == 'section':
+            return Student.objects.filter(user=user, section_id=object_id).exists()
+        return False
+
+    def get(self, request, *args, **kwargs):
+        requested = [
+            (scope, request.query_params.get(f'{scope}_id'))
+            for scope in GRID_SCOPES if request.query_params.get(f'{scope}_id')
+        ]
+        if len(requested) != 1:
+            return Response(
+                {"detail": "يجب تحديد واحد فقط من section_id أو teacher_id أو class_id."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        scope, object_id = requested[0]
+        try:
+            object_id = int(object_id)
+        except ValueError:
+            return Response({"detail": f"قيمة {scope}_id غير صحيحة."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not self._is_allowed(request.user, scope, object_id):
+            return Response({"detail": "ليس لديك صلاحية لعرض هذا الجدول."}, status=status.HTTP_403_FORBIDDEN)
+
+        academic_term_id = request.query_params.get('academic_term_id')
+        if academic_term_id:
+            try:
+                academic_term_id = int(academic_term_id)
+            except ValueError:
+                return Response({"detail": "قيمة academic_term_id غير صحيحة."}, status=status.HTTP_400_BAD_REQUEST)
+            academic_term = get_object_or_404(AcademicTerm, pk=academic_term_id)
+        else:
+            try:
+                academic_term = get_current_term()
+            except (AcademicYear.DoesNotExist, AcademicTerm.DoesNotExist):
+                return Response({"detail": "لا يوجد عام أو فصل دراسي نشط حالياً."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(get_timetable_grid(academic_term, scope, object_id))
@@ -0,0 +1,64 @@
+# students/counters.py
+from collections import Counter
+
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from classes.models import Section
+from .models import Student
+
+
+def section_count_deltas(moves):
+    """
+    يحوّل قائمة انتقالات (الشعبة القديمة، الشعبة الجديدة) إلى تغيّر عدد الطلاب لكل شعبة.
+    None تعني بلا شعبة (طالب جديد أو محذوف أو متخرج)، والانتقال لنفس الشعبة لا يغيّر شيئاً.
+    """
+    deltas = Counter()
+    for old_section_id, new_section_id in moves:
+        if old_section_id == new_section_id:
+            continue
+        if old_section_id is not None:
+            deltas[old_section_id] -= 1
+        if new_section_id is not None:
+            deltas[new_section_id] += 1
+    return deltas
+
+
+def adjust_section_counts(deltas):
+    """
+    يطبّق تغيّرات students_count بتحديث ذري عبر F() دون قراءة الشعبة أو حفظها كاملة.
+    الشعب التي لها نفس التغيّر تُحدّث باستعلام UPDATE واحد، فتصلح للعمليات المجمّعة
+    (الترفيع، القبول الجماعي، الاستيراد) بعد bulk_update/bulk_create التي لا ترسل signals.
+    """
+    by_delta = {}
+    for section_id, delta in deltas.items():
+        if delta and section_id is not None:
+            by_delta.setdefault(delta, []).append(section_id)
+    for delta, section_ids in by_delta.items():
+        if delta > 0:
+            students_count = F('students_count') + delta
+        else:
+            # العمود بلا إشارة في MySQL، فلا يُطرح إلا إذا بقيت النتيجة موجبة
+            students_count = Case(
+                When(students_count__gte=-delta, then=F('students_count') + delta), default=Value(0),
+            )
+        Section.objects.filter(pk__in=section_ids).update(students_count=students_count)
+
+
+def recount_section_students(section_ids=None):
+    """
+    يعيد حساب students_count من جدول الطلاب باستعلام UPDATE واحد (لكل الشعب إذا لم تُحدد).
+    يستخدمه أمر المطابقة reconcile_section_counts لتصحيح أي انحراف في العدّادات.
+    """
+    sections = Section.objects.all()
+    if section_ids is not None:
+        section_ids = {pk for pk in section_ids if pk is not None}
+        if not section_ids:
+            return 0
+        sections = sections.filter(pk__in=section_ids)
+    students = Student.objects.filter(section_id=OuterRef('pk')).order_by().values('section_id').annotate(
+        total=Count('pk')
+    ).values('total')
+    return sections.update(
+        students_count=Coalesce(Subquery(students, output_field=IntegerField()), Value(0)),
+    )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from classes.models import Section
+from students.counters import recount_section_students
+
+
+class Command(BaseCommand):
+    help = "مطابقة عدد الطلاب المخزن في الشعب (students_count) مع العدد الفعلي وتصحيح الفروقات."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="عرض الشعب المختلفة فقط دون تصحيحها.",
+        )
+
+    def handle(self, *args, **options):
+        mismatched = [
+            (section_id, name, stored, actual)
+            for section_id, name, stored, actual in Section.objects.annotate(
+                actual=Count('students')
+            ).values_list('id', 'name', 'students_count', 'actual')
+            if stored != actual
+        ]
+        for section_id, name, stored, actual in mismatched:
+            self.stdout.write(f"الشعبة {name} (#{section_id}): المخزن {stored}، الفعلي {actual}")
+
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS("جميع أعداد الشعب مطابقة."))
+            return
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{len(mismatched)} شعبة غير مطابقة (لم يتم التصحيح)."))
+            return
+
+        recount_section_students([section_id for section_id, *_ in mismatched])
+        self.stdout.write(self.style.SUCCESS(f"تم تصحيح {len(mismatched)} شعبة."))
@@ -3,6 +3,7 @@ from django.utils.translation import gettext_lazy as _
 from accounts.models import User, AutoCreateAndAutoUpdateTimeStampedModel 
 from classes.models import Section,Class
 from academic.models import AcademicYear
+from academic.context import get_current_year
 
 class Student(AutoCreateAndAutoUpdateTimeStampedModel):
     GENDER_CHOICES = [
@@ -55,7 +56,7 @@ class Student(AutoCreateAndAutoUpdateTimeStampedModel):
         if not self.enrollment_number:
             try:
                
-                current_academic_year = AcademicYear.objects.get(is_current=True)
+                current_academic_year = get_current_year()
                 year_prefix = str(current_academic_year.name).split('-')[0] 
                 last_student = Student.objects.filter(
                     enrollment_number__startswith=f'{year_prefix}-'
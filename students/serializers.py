@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from .models import Student 
 from classes.models import Class, Section 
+from classes.allocation import SectionAllocator
+from academic.context import get_current_year
+from academic.models import AcademicYear
 from django.contrib.auth.models import Group
 from accounts.models import User
 from django.contrib.auth import get_user_model
@@ -62,6 +65,8 @@ class StudentAcceptanceSerializer(serializers.ModelSerializer):
     student_class_details = ClassListSerializer(source='student_class', read_only=True)
     section_details = SectionSerializer(source='section', read_only=True)
     user_is_active = serializers.BooleanField(source='user.is_active')
+    # عند القبول بدون شعبة: true يختار للطالب أقل شعب صفه ازدحاماً، وإلا يجب تحديد الشعبة
+    auto_allocate = serializers.BooleanField(write_only=True, required=False)
 
     class Meta:
         model = Student
@@ -69,7 +74,8 @@ class StudentAcceptanceSerializer(serializers.ModelSerializer):
             'user_id', 'phone_number', 'first_name', 'last_name',
             'father_name', 'gender', 'address', 'parent_phone', 
             'date_of_birth', 'image', 'student_class', 'student_class_details',
-            'register_status', 'section', 'section_details', 'user_is_active','student_status'
+            'register_status', 'section', 'section_details', 'user_is_active','student_status',
+            'auto_allocate',
         ]
         read_only_fields = [
             'user_id', 'phone_number', 'first_name', 'last_name',
@@ -81,18 +87,28 @@ class StudentAcceptanceSerializer(serializers.ModelSerializer):
         student = self.instance
         new_status = data.get('register_status')
         new_section = data.get('section')
+        auto_allocate = data.pop('auto_allocate', False)
 
         if new_status == 'Accepted':
             data['user_is_active'] = True
             if not new_section:
-                raise serializers.ValidationError(
-                    {"section": "يجب تحديد الشعبة عند قبول الطالب"}
-                )
-            
+                if not auto_allocate:
+                    raise serializers.ValidationError(
+                        {"section": "يجب تحديد الشعبة، أو إرسال auto_allocate=true لاختيارها تلقائياً."}
+                    )
+                # يُختار للطالب أقل شعب صفه ازدحاماً في العام الحالي
+                data['section'] = self._allocate_section(student)
+                return data
+
             if new_section.class_obj != student.student_class:
                 raise serializers.ValidationError(
                     {"section": "الشعبة المحددة لا تنتمي للصف الذي اختاره الطالب"}
                 )
+
+            if not SectionAllocator.for_sections([new_section]).has_room(new_section):
+                raise serializers.ValidationError(
+                    {"section": "الشعبة المحددة وصلت إلى سعتها القصوى."}
+                )
             
         elif new_status == 'Rejected':
             data['section'] = None
@@ -100,6 +116,19 @@ class StudentAcceptanceSerializer(serializers.ModelSerializer):
 
         return data
 
+    def _allocate_section(self, student):
+        try:
+            current_year = get_current_year()
+        except AcademicYear.DoesNotExist:
+            raise serializers.ValidationError({"section": "لا يوجد عام دراسي حالي لاختيار الشعبة."})
+        allocator = SectionAllocator.for_classes([student.student_class_id], current_year, balance_gender=True)
+        section = allocator.take(student.student_class_id, gender=student.gender)
+        if section is None:
+            raise serializers.ValidationError(
+                {"section": "لا توجد شعبة نشطة بها مكان شاغر في صف الطالب، يجب تحديد الشعبة."}
+            )
+        return section
+
     def update(self, instance, validated_data):
         user_data = validated_data.pop('user', {})
         user_is_active_value = validated_data.pop('user_is_active', None)
@@ -169,7 +198,7 @@ class ManagerStudentCreationSerializer(serializers.ModelSerializer):
             )
 
         # التحقق من سعة الشعبة
-        if section and section.students.count() >= section.capacity:
+        if section and not SectionAllocator.for_sections([section]).has_room(section):
             raise serializers.ValidationError(
                 {"section": "الشعبة المحددة وصلت إلى سعتها القصوى."}
             )
@@ -265,7 +294,7 @@ class ManagerStudentUpdateSerializer(serializers.ModelSerializer):
             )
         
         if section and section != self.instance.section:
-            if section.students.count() >= section.capacity:
+            if not SectionAllocator.for_sections([section]).has_room(section):
                 raise serializers.ValidationError(
                     {"section": "الشعبة المحددة وصلت إلى سعتها القصوى."}
                 )
@@ -1,20 +1,28 @@
 # students/signals/handlers.py
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
+from ..counters import adjust_section_counts, section_count_deltas
 from ..models import Student
-from classes.models import Section
+
+
+@receiver(post_init, sender=Student)
+def remember_student_section(sender, instance, **kwargs):
+    # حفظ الشعبة الأصلية لمعرفة الشعبة القديمة عند نقل الطالب
+    # القراءة من __dict__ مباشرة حتى لا يُحمّل الحقل المؤجل (only/defer) باستعلام إضافي
+    instance._section_origin = instance.__dict__.get('section_id')
+
 
 @receiver(post_save, sender=Student)
-def update_section_count_on_save(sender, instance, created, **kwargs):
-    # تحديث عدد الطلاب عند إضافة أو تعديل طالب
-    # if the student section is not null
-    if instance.section:
-        instance.section.students_count = instance.section.students.count()
-        instance.section.save()
+def update_section_count_on_save(sender, instance, created, raw=False, **kwargs):
+    # تحديث عدد الطلاب فقط عند تغيّر الشعبة (إضافة طالب أو نقله)، وليس عند تعديل بياناته الأخرى
+    old_section_id = None if created else instance._section_origin
+    instance._section_origin = instance.section_id
+    if raw:
+        return
+    adjust_section_counts(section_count_deltas([(old_section_id, instance.section_id)]))
+
 
 @receiver(post_delete, sender=Student)
 def update_section_count_on_delete(sender, instance, **kwargs):
     # تحديث عدد الطلاب عند حذف طالب
-    if instance.section:
-        instance.section.students_count = instance.section.students.count()
-        instance.section.save()
\ No newline at end of file
+    adjust_section_counts(section_count_deltas([(instance._section_origin, None)]))
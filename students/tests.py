@@ -1,3 +1,88 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import User
+from classes.models import Section
+from Schoolo.testing import SchoolTestDataMixin
+from .models import Student
+
+
+class SectionStudentsCountTests(SchoolTestDataMixin, TestCase):
+    """
+    students_count يتغيّر فقط مع انتقالات الشعبة (إضافة، نقل، حذف)، وأمر المطابقة يصحح أي انحراف.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.section_a, cls.section_b = cls.section, cls.create_section('B')
+
+    def _counts(self):
+        return tuple(
+            Section.objects.filter(pk=section.pk).values_list('students_count', flat=True).get()
+            for section in (self.section_a, self.section_b)
+        )
+
+    def test_counts_follow_section_transitions(self):
+        first, second = self.create_student(1, self.section_a), self.create_student(2, self.section_a)
+        self.assertEqual(self._counts(), (2, 0))
+
+        first.address = 'b'
+        first.save()
+        self.assertEqual(self._counts(), (2, 0))
+
+        first = Student.objects.get(pk=first.pk)
+        first.section = self.section_b
+        first.save()
+        self.assertEqual(self._counts(), (1, 1))
+
+        second.delete()
+        self.assertEqual(self._counts(), (0, 1))
+
+    def test_reconcile_command_fixes_drift(self):
+        self.create_student(1, self.section_a)
+        Section.objects.filter(pk=self.section_a.pk).update(students_count=7)
+        Section.objects.filter(pk=self.section_b.pk).update(students_count=3)
+
+        call_command('reconcile_section_counts', '--dry-run', stdout=StringIO())
+        self.assertEqual(self._counts(), (7, 3))
+        call_command('reconcile_section_counts', stdout=StringIO())
+        self.assertEqual(self._counts(), (1, 0))
+
+
+class StudentApprovalTests(SchoolTestDataMixin, TestCase):
+    """
+    قبول الطالب بدون شعبة يتطلب auto_allocate صريحاً، والقبول الجماعي يقبل المعرفات كنصوص أرقام ويرفض غيرها.
+    """
+
+    def _pending_student(self, index):
+        return Student.objects.create(
+            user=User.objects.create_student_user(f'08{index:08d}'), student_class=self.class_obj,
+            father_name='F', gender='Male', address='A', parent_phone='1', register_status='pending',
+        )
+
+    def test_accepting_without_section_requires_auto_allocate(self):
+        student = self._pending_student(1)
+        url = reverse('student-accept-reject', args=[student.pk])
+
+        response = self.client.patch(url, {'register_status': 'Accepted'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('section', response.data)
+
+        response = self.client.patch(url, {'register_status': 'Accepted', 'auto_allocate': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Student.objects.get(pk=student.pk).section_id, self.section.pk)
+
+    def test_bulk_approve_normalizes_ids(self):
+        student = self._pending_student(1)
+        url = reverse('student-bulk-approve')
+
+        self.assertEqual(self.client.post(url, {'student_ids': [str(student.pk), 'x']}, format='json').status_code, 400)
 
-# Create your tests here.
+        response = self.client.post(url, {'student_ids': [str(student.pk), 999999]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['accepted'], [{'student_id': student.pk, 'section_id': self.section.pk}])
+        self.assertEqual(response.data['skipped'], [999999])
@@ -6,6 +6,7 @@ urlpatterns = [
     # path('loginsuperuser/', obtain_auth_token, name='api_login'),
     path('pending-students/', PendingStudentList.as_view(), name='pending_student'), 
     path('<int:user_id>/student-status/', ApproveStudentAPIView.as_view(), name='student-accept-reject'),
+    path('bulk-approve/', BulkApproveStudentsAPIView.as_view(), name='student-bulk-approve'),
     path('add-student/', ManagerAddStudentAPIView.as_view(), name='manager-add-student'),
     path('students-list/',StudentListAPIView.as_view(), name='section-students-list'),
     path('profile/update/', StudentProfileUpdateView.as_view(), name='student-profile-update'),
@@ -3,9 +3,10 @@
 from django.shortcuts import get_object_or_404
 from rest_framework import generics ,status
 from academic.models import AcademicTerm, AcademicYear
+from academic.context import get_current_year
 from accounts.permissions import *
 from rest_framework.permissions import AllowAny
-from schedules.models import ClassSchedule
+from schedules.scope import get_teacher_scope
 from teachers.models import Teacher
 from .models import Student 
 from .serializers import *
@@ -54,6 +55,11 @@ from rest_framework.exceptions import  ValidationError
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.db import transaction
+from django.utils import timezone
+from classes.allocation import SectionAllocator
+from .counters import adjust_section_counts, section_count_deltas
 
 User = get_user_model()
 
@@ -83,6 +89,60 @@ class ApproveStudentAPIView(generics.UpdateAPIView):
         student = serializer.save()
         return Response(serializer.data, status=status.HTTP_200_OK)
     
+class BulkApproveStudentsAPIView(APIView):
+    """
+    قبول مجموعة من طلبات التسجيل المعلقة دفعة واحدة، مع توزيع الطلاب على شعب صفوفهم
+    في العام الحالي بـ SectionAllocator (الأقل ازدحاماً مع موازنة الجنس).
+    Body: {"student_ids": [1, 2, 3]}
+    """
+    permission_classes = [IsAdminOrSuperuser]
+
+    def post(self, request, *args, **kwargs):
+        student_ids = request.data.get('student_ids')
+        if not student_ids or not isinstance(student_ids, list):
+            return Response({"detail": "يجب توفير قائمة بمعرفات الطلاب (student_ids)."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            student_ids = [int(student_id) for student_id in student_ids]
+        except (TypeError, ValueError):
+            return Response({"detail": "معرفات الطلاب يجب أن تكون أرقاماً صحيحة."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            current_year = get_current_year()
+        except AcademicYear.DoesNotExist:
+            return Response({"detail": "لا يوجد عام دراسي حالي."}, status=status.HTTP_400_BAD_REQUEST)
+
+        students = list(Student.objects.filter(user_id__in=student_ids, register_status='pending', student_class__isnull=False))
+        allocator = SectionAllocator.for_classes(
+            {student.student_class_id for student in students}, current_year, balance_gender=True,
+        )
+        by_class = {}
+        for student in students:
+            by_class.setdefault(student.student_class_id, []).append(student)
+        assigned = {}
+        for class_id, group in by_class.items():
+            assigned.update(allocator.allocate(group, class_id))
+
+        accepted = [student for student in students if assigned.get(student.pk)]
+        now = timezone.now()
+        for student in accepted:
+            student.section = assigned[student.pk]
+            student.register_status = 'Accepted'
+            student.updated_at = now
+        with transaction.atomic():
+            Student.objects.bulk_update(accepted, ['section', 'register_status', 'updated_at'], batch_size=500)
+            User.objects.filter(pk__in=[student.pk for student in accepted]).update(is_active=True)
+            # bulk_update لا يرسل signals، فتُحدّث أعداد الشعب دفعة واحدة من الشعبة الأصلية لكل طالب
+            adjust_section_counts(section_count_deltas(
+                (student._section_origin, student.section_id) for student in accepted
+            ))
+
+        found = {student.pk for student in students}
+        return Response({
+            "accepted": [{"student_id": student.pk, "section_id": student.section_id} for student in accepted],
+            "unassigned": [student.pk for student in students if not assigned.get(student.pk)],
+            "skipped": [student_id for student_id in student_ids if student_id not in found],
+        }, status=status.HTTP_200_OK)
+
+
 class ManagerAddStudentAPIView(generics.CreateAPIView):
     serializer_class = ManagerStudentCreationSerializer
     permission_classes = [IsAdminOrSuperuser]
@@ -111,6 +171,7 @@ class IsManagerOrTeacher(permissions.BasePermission):
 
 
 class StudentListAPIView(generics.ListAPIView):
+    cursor_ordering = ('-created_at', '-pk')
     serializer_class = StudentListSerializer
     permission_classes = [IsManagerOrTeacher]
 
@@ -132,17 +193,9 @@ class StudentListAPIView(generics.ListAPIView):
                 queryset = queryset.filter(student__class_id=class_id_param)            
         elif user.is_teacher():
             try:
-                teacher_instance = Teacher.objects.get(user=user)
-                current_academic_year = AcademicYear.objects.get(is_current=True)
-                current_academic_term = AcademicTerm.objects.get(is_current=True, academic_year=current_academic_year)
-                
-                # جلب الشعب التي يدرسها الأستاذ في العام والفصل الدراسي الحالي
-                sections_taught_ids = ClassSchedule.objects.filter(
-                    teacher=teacher_instance,
-                    academic_year=current_academic_year,
-                    academic_term=current_academic_term
-                ).values_list('section_id', flat=True).distinct()
-                
+                # الشعب التي يدرسها الأستاذ في الفصل الدراسي الحالي (من الكاش)
+                sections_taught_ids = get_teacher_scope(user.pk).section_ids
+
                 if section_id_param:
                     if int(section_id_param) in sections_taught_ids:
                         queryset = queryset.filter(section_id=section_id_param)
@@ -1,4 +1,6 @@
 # subject/views.py
+from collections import Counter
+
 from rest_framework import viewsets, status , generics
 from rest_framework.response import Response
 from rest_framework.decorators import action
@@ -6,7 +8,8 @@ from rest_framework import permissions
 from django.utils.translation import gettext_lazy as _
 
 from academic.models import AcademicTerm, AcademicYear
-from schedules.models import ClassSchedule
+from academic.context import get_current_year, get_current_term
+from schedules.scope import get_teacher_scope
 from .models import Subject, SectionSubjectRequirement
 from .serializers import *
 from classes.models import Class, Section
@@ -109,11 +112,8 @@ class SubjectViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         try:
-            current_academic_year = AcademicYear.objects.get(is_current=True)
-            current_academic_term = AcademicTerm.objects.get(
-                is_current=True, 
-                academic_year=current_academic_year
-            )
+            current_academic_year = get_current_year()
+            current_academic_term = get_current_term()
         except (AcademicYear.DoesNotExist, AcademicTerm.DoesNotExist):
             raise NotFound("لا يوجد عام أو فصل دراسي حالي محدد.")
         
@@ -205,6 +205,8 @@ class SubjectIconListView(generics.ListAPIView):
     """
     عرض قائمة بجميع أيقونات المواد الدراسية.
     """
+    # جدول مرجعي صغير ثابت الحجم، يُعاد كاملاً دون ترقيم
+    pagination_class = None
     queryset = SubjectIcon.objects.all()
     serializer_class = SubjectIconSerializer
     permission_classes = [IsAdminOrSuperuser]
@@ -226,46 +228,33 @@ class TeacherTaughtItemsView(ListAPIView):
         else:
             raise NotFound("نوع العنصر غير صالح. استخدم 'sections' أو 'classes'.")
 
-    def get_queryset(self):
-        user = self.request.user
-        
-        # 1. التحقق من وجود المعلم
-        try:
-            teacher_instance = user.teacher_profile  # أو user.teacher، حسب النموذج الخاص بك
-        except Teacher.DoesNotExist:
-            raise NotFound("المعلم غير موجود.")
+    def _scope(self):
+        # ما يدرسه المعلم في الفصل الحالي (من الكاش)، يُحسب مرة واحدة لكل طلب
+        if not hasattr(self, '_teacher_scope'):
+            try:
+                self._teacher_scope = get_teacher_scope(self.request.user.pk)
+            except (AcademicYear.DoesNotExist, AcademicTerm.DoesNotExist):
+                raise NotFound("لا يوجد عام أو فصل دراسي حالي محدد.")
+        return self._teacher_scope
 
-        # 2. الحصول على العام والفصل الدراسي الحالي
-        try:
-            current_academic_year = AcademicYear.objects.get(is_current=True)
-            current_academic_term = AcademicTerm.objects.get(
-                is_current=True, 
-                academic_year=current_academic_year
-            )
-        except (AcademicYear.DoesNotExist, AcademicTerm.DoesNotExist):
-            raise NotFound("لا يوجد عام أو فصل دراسي حالي محدد.")
-        
-        queryset_base = ClassSchedule.objects.filter(
-            teacher=teacher_instance,
-            academic_year=current_academic_year,
-            academic_term=current_academic_term
-        )
-        
+    def _taught_section_ids(self):
+        scope = self._scope()
         subject_id = self.request.query_params.get('subject_id')
         if subject_id:
-            if not queryset_base.filter(subject_id=subject_id).exists():
-                return ClassSchedule.objects.none() 
-            queryset_base = queryset_base.filter(subject_id=subject_id)
-        
-        sections_taught_ids = queryset_base.values_list('section_id', flat=True).distinct()
-        
+            try:
+                return scope.section_ids_for_subject(int(subject_id))
+            except ValueError:
+                return frozenset()
+        return scope.section_ids
+
+    def get_queryset(self):
+        sections_taught_ids = self._taught_section_ids()
         item_type = self.kwargs.get('item_type')
 
         if item_type == 'sections':
-            return Section.objects.filter(id__in=sections_taught_ids)
+            return Section.objects.filter(id__in=sections_taught_ids).select_related('class_obj')
         elif item_type == 'classes':
-            class_ids = Section.objects.filter(id__in=sections_taught_ids).values_list('class_obj_id', flat=True).distinct()
-            return Class.objects.filter(id__in=class_ids)
+            return Class.objects.filter(id__in=self._scope().class_ids_for_sections(sections_taught_ids))
 
     def list(self, request, *args, **kwargs):
         try:
@@ -287,10 +276,12 @@ class TeacherTaughtItemsView(ListAPIView):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # 4. بناء سياق السيريالايزر وتمرير كائن المعلم
+        # 4. بناء سياق السيريالايزر وتمرير كائن المعلم وعدد الشعب التي يدرسها في كل صف
+        section_classes = self._scope().section_classes
         serializer_context = {
             'request': request,
-            'teacher_instance': teacher_instance
+            'teacher_instance': teacher_instance,
+            'taught_sections_per_class': Counter(section_classes[pk] for pk in self._taught_section_ids()),
         }
         
         # 5. استخدام السياق عند تهيئة السيريالايزر
@@ -326,18 +317,14 @@ class SectionSubjectsListView(ListAPIView):
 
         if user.is_teacher():
             try:
-                teacher_instance = user.teacher_profile
-                taught_subjects = Subject.objects.filter(
-                    taught_by_teachers__teacher=teacher_instance,
-                    subject_requirements__section_id=section_id
-                ).distinct()
-                
-                return SectionSubjectRequirement.objects.filter(
-                    section_id=section_id, 
-                    subject__in=taught_subjects.values_list('id', flat=True)
-                )
-
-            except Teacher.DoesNotExist:
-                raise NotFound("المعلم غير موجود.")
+                # المواد التي يدرسها المعلم في هذه الشعبة خلال الفصل الحالي (من الكاش)
+                taught_subject_ids = get_teacher_scope(user.pk).subject_ids_for_section(int(section_id))
+            except (AcademicYear.DoesNotExist, AcademicTerm.DoesNotExist):
+                raise NotFound("لا يوجد عام أو فصل دراسي حالي محدد.")
+
+            return SectionSubjectRequirement.objects.filter(
+                section_id=section_id,
+                subject_id__in=taught_subject_ids
+            )
 
         raise PermissionDenied("ليس لديك صلاحية الوصول.")
\ No newline at end of file
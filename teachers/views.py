@@ -60,6 +60,8 @@ class TeacherAvailabilityListAPIView(generics.ListAPIView):
     
     
 class TeacherListView(generics.ListAPIView):
+    # الترتيب بالاسم عبر OrderingFilter لا يتوافق مع الترقيم بالمؤشر
+    pagination_class = None
     permission_classes = [CustomPermission] 
     queryset = Teacher.objects.all()
     filterset_class = TeacherFilter